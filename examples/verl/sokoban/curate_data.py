@@ -1,8 +1,11 @@
 import pandas as pd
 import os
 import json
+import asyncio
 from tqdm import tqdm
 from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+from verl_agent_env.envs.sokoban.solver import solve
+from verl_agent_env.envs.sokoban.level_hash import LevelDedupIndex, canonical_level_hash
 
 import ray
 
@@ -11,33 +14,63 @@ ray.init(num_cpus=75)
 # create agent env data
 num_train = 10000
 num_test = 100
+# Rooms solved in fewer pushes are too easy to train on, and rooms the solver cannot solve within
+# its budget are dropped before they cost any rollout tokens
+min_pushes = 2
+max_solver_nodes = 100000
+# Give up on finding more distinct puzzles after this many seeds per row, small rooms run out of them
+max_seeds_per_row = 20
 
 @ray.remote
-def create_env_data(seed, offset=0):
+def create_env_data(seed):
+    # A seeded reset always plays the same room (see room_cache.py), so the rows only carry seeds.
+    # Seeds whose room is unsolvable or trivial give no row.
     env = SokobanEnv()
-    env.reset(seed=seed + offset)
-    room_setup = env.serialize_room()
+    asyncio.run(env.reset(seed=seed))
+    solution = solve(env.room_fixed, env.room_state, max_nodes=max_solver_nodes)
+    if solution["status"] != "solved" or solution["num_pushes"] < min_pushes:
+        return None
     return {
         "env_name": 'verl_env/sokoban-v0',
-        "seed": seed + offset,
-        "env_kwargs": json.dumps({'room_setup': room_setup})
+        "seed": seed,
+        # Same for mirrored, rotated and otherwise identical puzzles, see level_hash.py
+        "level_hash": canonical_level_hash(env.room_fixed, env.room_state),
+        # Push-optimal solution length, to bucket levels by difficulty
+        "difficulty": solution["num_pushes"],
+        "solution_num_moves": solution["num_moves"],
+        "env_kwargs": json.dumps({})
     }
 
-# Parallelize train data creation
-print("Creating training data...")
-train_futures = [create_env_data.remote(i) for i in range(num_train)]
-train_data = []
-for batch in tqdm(range(0, len(train_futures), 100)):
-    batch_results = ray.get(train_futures[batch:batch+100])
-    train_data.extend(batch_results)
-train_df = pd.DataFrame(train_data)
+def collect_rows(num_rows, first_seed, dedup_index):
+    """
+    Evaluate seeds from first_seed on until num_rows puzzles not in dedup_index are found, or
+    max_seeds_per_row seeds per row were tried. Returns the rows and the next unused seed.
+    """
+    rows = []
+    seed = first_seed
+    with tqdm(total=num_rows) as progress:
+        while len(rows) < num_rows and seed - first_seed < max_seeds_per_row * num_rows:
+            seeds = range(seed, seed + num_rows - len(rows))
+            seed += len(seeds)
+            for row in ray.get([create_env_data.remote(row_seed) for row_seed in seeds]):
+                if row is None or len(rows) == num_rows or not dedup_index.add(row["level_hash"]):
+                    continue
+                rows.append(row)
+                progress.update(1)
+    if len(rows) < num_rows:
+        print(f"Only found {len(rows)} distinct puzzles out of {num_rows}")
+    return rows, seed
 
-# Parallelize test data creation
+# The test set goes first, so that no training puzzle repeats a test puzzle
+dedup_index = LevelDedupIndex()
 print("Creating test data...")
-test_futures = [create_env_data.remote(i, offset=num_train) for i in range(num_test)]
-test_data = ray.get(test_futures)
+test_data, next_seed = collect_rows(num_test, 0, dedup_index)
 test_df = pd.DataFrame(test_data)
 
+print("Creating training data...")
+train_data, _ = collect_rows(num_train, next_seed, dedup_index)
+train_df = pd.DataFrame(train_data)
+
 os.makedirs('data', exist_ok=True)
 
 train_df.to_parquet('data/train.parquet')
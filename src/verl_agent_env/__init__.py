@@ -7,6 +7,7 @@ from verl_agent_env.envs.frozen_lake import FrozenLakeEnv
 from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
 from verl_agent_env.envs.single_turn_chat import SingleTurnChatEnv
 from verl_agent_env.envs.mcp.mcp_chat import MCPChatEnv
+from verl_agent_env.envs.echo import EchoEnv
 
 __version__ = "0.1.0"
 
@@ -16,6 +17,7 @@ ALL_VERL_ENVS = {
     "verl_env/sokoban-v0": SokobanEnv,
     "verl_env/single_turn_chat-v0": SingleTurnChatEnv,
     "verl_env/mcp_chat-v0": MCPChatEnv,
+    "verl_env/echo-v0": EchoEnv,
 }
 
 # check if src/verl_agent_env/amzn_env/__init__.py exists
@@ -1,14 +1,30 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, WebSocket
 from pydantic import BaseModel
 from typing import List, Optional, Any, Dict
-from verl_agent_env.interface import initialize_environment, close_environment, action_space_json_schema, get_task_prompt, tools_json_schema_openai, take_step, reset_environment, allow_parallel_tool_call
+from verl_agent_env.interface import initialize_environment, initialize_environments, close_environment, close_environments, action_space_json_schema, get_task_prompt, tools_json_schema_openai, take_step, take_steps, reset_environment, allow_parallel_tool_call, environments, run_eviction_sweeper, run_loop_lag_monitor, get_stats
+from verl_agent_env.serialization import encode_response
+from verl_agent_env.websocket_session import WEBSOCKET_PATH, serve_websocket
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Close environments that clients forgot to close, see interface.configure_eviction
+    sweeper = asyncio.create_task(run_eviction_sweeper())
+    lag_monitor = asyncio.create_task(run_loop_lag_monitor())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        lag_monitor.cancel()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 class InitializeRequest(BaseModel):
     env_name: str
     seed: Optional[int] = None
     env_kwargs: Optional[Dict[str, Any]] = None
+    job_id: Optional[str] = None
 
 class EnvironmentResponse(BaseModel):
     message: str
@@ -16,6 +32,36 @@ class EnvironmentResponse(BaseModel):
     observation: Any = None
     info: Dict[str, Any] = None
 
+class BatchInitializeRequest(BaseModel):
+    requests: List[InitializeRequest]
+    job_id: Optional[str] = None
+    include_task_prompt: bool = False
+    include_tools_schema: bool = False
+
+class BatchInitializeResult(BaseModel):
+    message: Optional[str] = None
+    env_id: Optional[str] = None
+    observation: Any = None
+    info: Optional[Dict[str, Any]] = None
+    task_prompt: Optional[str] = None
+    tools_schema: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+class BatchInitializeResponse(BaseModel):
+    results: List[BatchInitializeResult]
+
+class BatchCloseRequest(BaseModel):
+    env_ids: Optional[List[str]] = None
+    job_id: Optional[str] = None
+
+class BatchCloseResult(BaseModel):
+    env_id: str
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchCloseResponse(BaseModel):
+    results: List[BatchCloseResult]
+
 class ActionSpaceResponse(BaseModel):
     action_space: Dict[str, Any]
 
@@ -38,6 +84,25 @@ class StepResponse(BaseModel):
     truncated: bool
     info: Dict[str, Any]
 
+class BatchStepItem(BaseModel):
+    env_id: str
+    action: Any
+
+class BatchStepRequest(BaseModel):
+    steps: List[BatchStepItem]
+
+class BatchStepResult(BaseModel):
+    env_id: str
+    observation: Any = None
+    reward: Optional[float] = None
+    done: Optional[bool] = None
+    truncated: Optional[bool] = None
+    info: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class BatchStepResponse(BaseModel):
+    results: List[BatchStepResult]
+
 class ResetRequest(BaseModel):
     seed: Optional[int] = None
     options: Optional[Dict[str, Any]] = None
@@ -47,13 +112,37 @@ class ResetEnvironmentResponse(BaseModel):
     info: Dict[str, Any] = None
 
 @app.post("/api/environment/initialize", response_model=EnvironmentResponse)
-async def initialize_env(request: InitializeRequest):
-    return await initialize_environment(request.env_name, request.seed, request.env_kwargs)
+async def initialize_env(request: InitializeRequest, accept: Optional[str] = Header(None)):
+    result = await initialize_environment(request.env_name, request.seed, request.env_kwargs, request.job_id)
+    return encode_response(result, accept) or result
+
+@app.post("/api/environment/batch-initialize", response_model=BatchInitializeResponse)
+async def initialize_envs(request: BatchInitializeRequest, accept: Optional[str] = Header(None)):
+    requests = [
+        {
+            "env_name": item.env_name,
+            "seed": item.seed,
+            "env_kwargs": item.env_kwargs,
+            "job_id": item.job_id if item.job_id is not None else request.job_id
+        }
+        for item in request.requests
+    ]
+    results = await initialize_environments(
+        requests,
+        include_task_prompt=request.include_task_prompt,
+        include_tools_schema=request.include_tools_schema
+    )
+    return encode_response({"results": results}, accept) or {"results": results}
 
 @app.post("/api/environment/{env_id}/close", response_model=EnvironmentResponse)
 async def close_env(env_id: str):
     return await close_environment(env_id)
 
+@app.post("/api/environment/batch-close", response_model=BatchCloseResponse)
+async def close_envs(request: BatchCloseRequest):
+    results = await close_environments(request.env_ids, request.job_id)
+    return {"results": results}
+
 @app.get("/api/environment/{env_id}/action-space", response_model=ActionSpaceResponse)
 async def get_action_space(env_id: str):
     try:
@@ -87,17 +176,76 @@ async def get_openai_tools_schema(env_id: str):
         return {"message": str(e)}
 
 @app.post("/api/environment/{env_id}/step", response_model=StepResponse)
-async def take_step_endpoint(env_id: str, request: StepRequest):
+async def take_step_endpoint(env_id: str, request: StepRequest, accept: Optional[str] = Header(None)):
     try:
         result = await take_step(env_id, request.action)
-        return result
+        return encode_response(result, accept) or result
     except KeyError as e:
         return {"message": str(e)}
 
+@app.post("/api/environment/batch-step", response_model=BatchStepResponse)
+async def take_steps_endpoint(request: BatchStepRequest, accept: Optional[str] = Header(None)):
+    results = await take_steps([(item.env_id, item.action) for item in request.steps])
+    return encode_response({"results": results}, accept) or {"results": results}
+
 @app.post("/api/environment/{env_id}/reset", response_model=ResetEnvironmentResponse)
-async def reset_env(env_id: str, request: ResetRequest):
-    return await reset_environment(env_id, request.seed, request.options)
+async def reset_env(env_id: str, request: ResetRequest, accept: Optional[str] = Header(None)):
+    result = await reset_environment(env_id, request.seed, request.options)
+    return encode_response(result, accept) or result
+
+@app.get("/api/stats")
+async def get_stats_endpoint():
+    return get_stats()
 
 @app.get("/")
 async def health_check():
-    return {"status": "running"}
\ No newline at end of file
+    return {"status": "running", "num_environments": len(environments)}
+
+async def run_websocket_operation(message: dict):
+    """
+    Run one operation received over the WebSocket transport, see `verl_agent_env.websocket_session`.
+    """
+    op = message.get("op")
+    if op == "initialize":
+        return await initialize_environment(message["env_name"], message.get("seed"), message.get("env_kwargs"), message.get("job_id"))
+    if op == "batch_initialize":
+        job_id = message.get("job_id")
+        requests = [
+            {
+                "env_name": item["env_name"],
+                "seed": item.get("seed"),
+                "env_kwargs": item.get("env_kwargs"),
+                "job_id": item.get("job_id", job_id) or job_id
+            }
+            for item in message["requests"]
+        ]
+        results = await initialize_environments(
+            requests,
+            include_task_prompt=message.get("include_task_prompt", False),
+            include_tools_schema=message.get("include_tools_schema", False)
+        )
+        return {"results": results}
+    if op == "reset":
+        return await reset_environment(message["env_id"], message.get("seed"), message.get("options"))
+    if op == "step":
+        return await take_step(message["env_id"], message["action"])
+    if op == "batch_step":
+        return {"results": await take_steps([(item["env_id"], item.get("action")) for item in message["steps"]])}
+    if op == "close":
+        return await close_environment(message["env_id"])
+    if op == "batch_close":
+        return {"results": await close_environments(message.get("env_ids"), message.get("job_id"))}
+    if op == "action_space":
+        return {"action_space": action_space_json_schema(message["env_id"])}
+    if op == "task_prompt":
+        return {"task_prompt": get_task_prompt(message["env_id"])}
+    if op == "allow_parallel_tool_call":
+        return {"allow_parallel_tool_call": allow_parallel_tool_call(message["env_id"])}
+    if op == "tools_schema_openai":
+        return {"tools_schema": tools_json_schema_openai(message["env_id"])}
+    raise ValueError(f"Unknown operation '{op}'")
+
+@app.websocket(WEBSOCKET_PATH)
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    await serve_websocket(websocket, run_websocket_operation)
@@ -0,0 +1,404 @@
+"""
+Load test of the environment service.
+
+Drives N concurrent synthetic episodes of each chosen environment with scripted tool calls, and
+reports the throughput, the latency percentiles of every endpoint, and the event loop lag of the
+client and of the server. The server is started locally unless --url is given. Use the
+`verl_env/echo-v0` environment to measure the serving overhead apart from environment logic.
+
+    python -m verl_agent_env.benchmark --env verl_env/echo-v0 --concurrency 1000 --steps 20
+    python -m verl_agent_env.benchmark --server sharded --num-shards 8 --transport ws --concurrency 10000
+    python -m verl_agent_env.benchmark --url http://10.0.0.1:8000 --env verl_env/sokoban-v0 --json results.json
+    python -m verl_agent_env.benchmark --baseline results.json --max-regression 0.1
+
+Throughput counts the steps of all episodes over the wall time of the whole run, including the
+initialize, reset and close calls.
+"""
+
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import numpy as np
+import requests
+from verl_agent_env.serialization import FAST_JSON_MEDIA_TYPE, loads
+from verl_agent_env.websocket_session import WebSocketClient
+
+# Tool calls cycled through by the scripted episodes, by environment name
+SCRIPTED_TOOL_CALLS = {
+    "verl_env/echo-v0": [("echo", {"text": "hello"})],
+    "verl_env/countdown-v0": [("test_equation", {"equation": "1 + 2"})],
+    "verl_env/frozen_lake-v1": [("move_right", {}), ("move_down", {}), ("move_left", {}), ("move_up", {})],
+    "verl_env/sokoban-v0": [("move_up", {}), ("move_right", {}), ("move_down", {}), ("move_left", {})],
+}
+
+DEFAULT_ENV_KWARGS = {
+    "verl_env/frozen_lake-v1": {"map_size": 4},
+    "verl_env/sokoban-v0": {"dim_room": [6, 6], "num_boxes": 1},
+}
+
+ACCEPT_HEADERS = {
+    "json": "application/json",
+    "fast": FAST_JSON_MEDIA_TYPE,
+    "msgpack": "application/msgpack",
+}
+
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def scripted_action(env_name: str, step: int, call_id: str) -> dict:
+    """
+    Return the scripted action of the given step of an episode.
+    """
+    tool_calls = SCRIPTED_TOOL_CALLS[env_name]
+    name, arguments = tool_calls[step % len(tool_calls)]
+    return {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}]
+    }
+
+
+class LatencyRecorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+
+    async def timed(self, endpoint: str, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, dict]:
+        summary = {}
+        for endpoint, latencies in self.latencies.items():
+            latencies_ms = 1000 * np.asarray(latencies)
+            summary[endpoint] = {"count": len(latencies), "mean_ms": float(latencies_ms.mean())}
+            for percentile in LATENCY_PERCENTILES:
+                summary[endpoint][f"p{percentile}_ms"] = float(np.percentile(latencies_ms, percentile))
+        return summary
+
+
+class HTTPTransport:
+    """
+    Calls the HTTP endpoints, one request per operation.
+    """
+
+    def __init__(self, base_url: str, accept: str = "application/json", max_connections: int = 1000) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.accept = accept
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def connect(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=None)
+        )
+
+    async def close(self):
+        await self._session.close()
+
+    async def _post(self, path: str, payload: Optional[dict] = None) -> Any:
+        async with self._session.post(f"{self.base_url}{path}", json=payload, headers={"accept": self.accept}) as response:
+            response.raise_for_status()
+            return loads(await response.read(), response.headers.get("content-type"))
+
+    async def call(self, op: str, **fields) -> Any:
+        if op == "initialize":
+            return await self._post("/api/environment/initialize", fields)
+        if op == "batch_initialize":
+            return await self._post("/api/environment/batch-initialize", fields)
+        if op == "batch_step":
+            return await self._post("/api/environment/batch-step", fields)
+        if op == "batch_close":
+            return await self._post("/api/environment/batch-close", fields)
+        env_id = fields.pop("env_id")
+        if op == "step":
+            return await self._post(f"/api/environment/{env_id}/step", fields)
+        if op == "reset":
+            return await self._post(f"/api/environment/{env_id}/reset", fields)
+        if op == "close":
+            return await self._post(f"/api/environment/{env_id}/close")
+        raise ValueError(f"Unsupported operation '{op}'")
+
+
+class WebSocketTransport:
+    """
+    Multiplexes every operation over one WebSocket connection, see `verl_agent_env.websocket_session`.
+    """
+
+    def __init__(self, base_url: str) -> None:
+        self.client = WebSocketClient(base_url)
+
+    async def connect(self):
+        await self.client.connect()
+
+    async def close(self):
+        await self.client.close()
+
+    async def call(self, op: str, **fields) -> Any:
+        return await self.client.request(op, **fields)
+
+
+async def _monitor_loop_lag(samples: List[float], interval: float = 0.05):
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.monotonic() - start - interval))
+
+
+async def _run_episode(transport, recorder: LatencyRecorder, env_name: str, env_kwargs: dict, num_steps: int, episode: int) -> int:
+    result = await recorder.timed("initialize", transport.call("initialize", env_name=env_name, env_kwargs=env_kwargs))
+    env_id = result["env_id"]
+    try:
+        for step in range(num_steps):
+            action = scripted_action(env_name, step, f"call_{episode}_{step}")
+            result = await recorder.timed("step", transport.call("step", env_id=env_id, action=action))
+            if result["done"] or result["truncated"]:
+                await recorder.timed("reset", transport.call("reset", env_id=env_id))
+    finally:
+        await recorder.timed("close", transport.call("close", env_id=env_id))
+    return num_steps
+
+
+async def _run_batched_episodes(transport, recorder: LatencyRecorder, env_name: str, env_kwargs: dict, num_steps: int, concurrency: int) -> int:
+    results = await recorder.timed("batch-initialize", transport.call(
+        "batch_initialize", requests=[{"env_name": env_name, "env_kwargs": env_kwargs}] * concurrency
+    ))
+    env_ids = [result["env_id"] for result in results["results"] if result.get("env_id")]
+    num_taken = 0
+    try:
+        for step in range(num_steps):
+            steps = [
+                {"env_id": env_id, "action": scripted_action(env_name, step, f"call_{i}_{step}")}
+                for i, env_id in enumerate(env_ids)
+            ]
+            results = await recorder.timed("batch-step", transport.call("batch_step", steps=steps))
+            num_taken += sum(result.get("error") is None for result in results["results"])
+            finished = [result["env_id"] for result in results["results"] if result.get("done") or result.get("truncated")]
+            await asyncio.gather(*[
+                recorder.timed("reset", transport.call("reset", env_id=env_id)) for env_id in finished
+            ])
+    finally:
+        await recorder.timed("batch-close", transport.call("batch_close", env_ids=env_ids))
+    return num_taken
+
+
+async def run_benchmark(url: str,
+                        env_name: str = "verl_env/echo-v0",
+                        env_kwargs: Optional[dict] = None,
+                        concurrency: int = 100,
+                        num_steps: int = 20,
+                        transport: str = "http",
+                        accept: str = "json",
+                        max_connections: int = 1000) -> dict:
+    """
+    Run `concurrency` concurrent scripted episodes of `num_steps` steps against a server.
+
+    Args:
+        url (str): The base URL of the server.
+        env_name (str): The environment to benchmark, one of SCRIPTED_TOOL_CALLS.
+        env_kwargs (Optional[dict]): The environment keyword arguments, defaults to DEFAULT_ENV_KWARGS.
+        concurrency (int): The number of concurrent episodes.
+        num_steps (int): The number of steps of every episode. Finished episodes are reset.
+        transport (str): "http" for one request per call, "batch" for one batch request per turn
+            of all episodes, or "ws" for all calls over one WebSocket.
+        accept (str): The response encoding of the HTTP transports, "json", "fast" or "msgpack".
+        max_connections (int): The maximum number of concurrent HTTP connections.
+
+    Returns:
+        dict: The throughput, the latency percentiles per endpoint, the event loop lags and the errors.
+    """
+    if env_name not in SCRIPTED_TOOL_CALLS:
+        raise ValueError(f"No scripted actions for '{env_name}', expected one of {sorted(SCRIPTED_TOOL_CALLS)}")
+    if env_kwargs is None:
+        env_kwargs = DEFAULT_ENV_KWARGS.get(env_name, {})
+    if transport == "ws":
+        client = WebSocketTransport(url)
+    else:
+        client = HTTPTransport(url, ACCEPT_HEADERS[accept], max_connections)
+    recorder = LatencyRecorder()
+    lag_samples: List[float] = []
+
+    await client.connect()
+    lag_monitor = asyncio.create_task(_monitor_loop_lag(lag_samples))
+    start = time.perf_counter()
+    try:
+        if transport == "batch":
+            outcomes = [await _run_batched_episodes(client, recorder, env_name, env_kwargs, num_steps, concurrency)]
+        else:
+            outcomes = await asyncio.gather(
+                *[_run_episode(client, recorder, env_name, env_kwargs, num_steps, i) for i in range(concurrency)],
+                return_exceptions=True
+            )
+        elapsed = time.perf_counter() - start
+    finally:
+        lag_monitor.cancel()
+        await client.close()
+
+    errors = [repr(outcome) for outcome in outcomes if isinstance(outcome, Exception)]
+    num_steps_taken = sum(outcome for outcome in outcomes if not isinstance(outcome, Exception))
+    lags_ms = 1000 * np.asarray(lag_samples or [0.0])
+    return {
+        "env_name": env_name,
+        "transport": transport,
+        "accept": accept,
+        "concurrency": concurrency,
+        "num_steps": num_steps_taken,
+        "elapsed_seconds": elapsed,
+        "steps_per_second": num_steps_taken / elapsed if elapsed > 0 else 0.0,
+        "latency": recorder.summary(),
+        "client_event_loop_lag_ms": {
+            "p50": float(np.percentile(lags_ms, 50)),
+            "p99": float(np.percentile(lags_ms, 99)),
+            "max": float(lags_ms.max()),
+        },
+        "num_errors": len(errors),
+        "errors": errors[:10],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server: str = "app", num_shards: int = 1, port: Optional[int] = None, startup_timeout: float = 60.0):
+    """
+    Start a local server in a subprocess and wait until it answers.
+
+    Returns:
+        Tuple[subprocess.Popen, str]: The server process and its base URL.
+    """
+    port = port or _free_port()
+    if server == "sharded":
+        command = [sys.executable, "-m", "verl_agent_env.sharded_app", "--num-shards", str(num_shards), "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "verl_agent_env.app:app", "--port", str(port), "--log-level", "warning"]
+    process = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{url}/", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Server did not start within {startup_timeout} seconds: {' '.join(command)}")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def server_stats(url: str) -> Optional[dict]:
+    try:
+        return requests.get(f"{url.rstrip('/')}/api/stats", timeout=10).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def print_report(result: dict):
+    print(f"[BENCHMARK] {result['env_name']}  transport={result['transport']}  accept={result['accept']}  concurrency={result['concurrency']}")
+    print(f"  throughput: {result['steps_per_second']:.1f} steps/s ({result['num_steps']} steps in {result['elapsed_seconds']:.2f} s), errors: {result['num_errors']}")
+    print(f"  {'endpoint':<18}{'count':>8}{'mean ms':>10}" + "".join(f"{f'p{p} ms':>10}" for p in LATENCY_PERCENTILES))
+    for endpoint, latency in result["latency"].items():
+        print(f"  {endpoint:<18}{latency['count']:>8}{latency['mean_ms']:>10.2f}" + "".join(f"{latency[f'p{p}_ms']:>10.2f}" for p in LATENCY_PERCENTILES))
+    lag = result["client_event_loop_lag_ms"]
+    print(f"  client event loop lag: p50 {lag['p50']:.2f} ms, p99 {lag['p99']:.2f} ms, max {lag['max']:.2f} ms")
+    if result.get("server_stats") is not None:
+        print(f"  server stats: {json.dumps(result['server_stats'])}")
+    for error in result["errors"]:
+        print(f"  error: {error}")
+
+
+def find_regressions(results: List[dict], baseline: List[dict], max_regression: float) -> List[str]:
+    """
+    Compare the throughput of every benchmark with the matching baseline benchmark.
+
+    Returns:
+        List[str]: A description of every benchmark slower than the baseline by more than `max_regression`.
+    """
+    def key(result):
+        return (result["env_name"], result["transport"], result["accept"], result["concurrency"])
+
+    baseline_by_key = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(key(result))
+        if reference is None:
+            continue
+        if result["steps_per_second"] < (1 - max_regression) * reference["steps_per_second"]:
+            regressions.append(
+                f"{key(result)}: {result['steps_per_second']:.1f} steps/s vs {reference['steps_per_second']:.1f} steps/s in the baseline"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the environment service with scripted episodes.")
+    parser.add_argument("--url", default=None, help="Base URL of a running server. Defaults to starting one locally.")
+    parser.add_argument("--server", choices=["app", "sharded"], default="app", help="The server to start locally.")
+    parser.add_argument("--num-shards", type=int, default=4, help="Number of worker processes of the sharded server.")
+    parser.add_argument("--env", action="append", default=None, help=f"Environment to benchmark, repeatable. One of {sorted(SCRIPTED_TOOL_CALLS)}.")
+    parser.add_argument("--env-kwargs", type=json.loads, default=None, help="Environment keyword arguments as JSON.")
+    parser.add_argument("--concurrency", type=int, action="append", default=None, help="Number of concurrent episodes, repeatable.")
+    parser.add_argument("--steps", type=int, default=20, help="Number of steps of every episode.")
+    parser.add_argument("--transport", choices=["http", "batch", "ws"], default="http")
+    parser.add_argument("--accept", choices=list(ACCEPT_HEADERS), default="json", help="Response encoding of the HTTP transports.")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare the throughput with.")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Tolerated relative throughput drop against the baseline.")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args.server, args.num_shards)
+    try:
+        results = []
+        for env_name in args.env or ["verl_env/echo-v0"]:
+            for concurrency in args.concurrency or [100]:
+                result = asyncio.run(run_benchmark(
+                    url,
+                    env_name=env_name,
+                    env_kwargs=args.env_kwargs,
+                    concurrency=concurrency,
+                    num_steps=args.steps,
+                    transport=args.transport,
+                    accept=args.accept,
+                    max_connections=args.max_connections
+                ))
+                result["server_stats"] = server_stats(url)
+                print_report(result)
+                results.append(result)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    if args.json_path is not None:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"[BENCHMARK] Throughput regression: {regression}")
+        sys.exit(1 if regressions else 0)
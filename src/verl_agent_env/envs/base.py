@@ -110,6 +110,35 @@ class LLMAgentEnv(Env):
         """
         pass
 
+    def get_state(self) -> dict:
+        """
+        Return the full episode state of the environment as a compact JSON-serializable dictionary,
+        so that an environment constructed with the same keyword arguments can continue the episode
+        after `set_state`. This is what lets environment state live in an external state store.
+        """
+        raise NotImplementedError("get_state method is not implemented")
+
+    def set_state(self, state: dict):
+        """
+        Restore the episode state returned by `get_state`.
+        """
+        raise NotImplementedError("set_state method is not implemented")
+
+    def _get_np_random_state(self) -> Optional[dict]:
+        """
+        Return the state of the environment's random number generator, if it has been created.
+        """
+        if self._np_random is None:
+            return None
+        return self._np_random.bit_generator.state
+
+    def _set_np_random_state(self, state: Optional[dict]):
+        """
+        Restore the random number generator state returned by `_get_np_random_state`.
+        """
+        if state is not None:
+            self.np_random.bit_generator.state = state
+
     @property
     def task_prompt(self) -> str:
         """
@@ -5,6 +5,7 @@ Implementation adapted from https://github.com/Jiayi-Pan/TinyZero/blob/main/exam
 
 import json
 from typing import List, Optional, Tuple
+import numpy as np
 from verl_agent_env.envs.base import LLMAgentEnv
 
 
@@ -194,6 +195,24 @@ class CountdownEnv(LLMAgentEnv):
             
             return self._get_obs(), 0.0, False, False, self._get_info()
     
+    def get_state(self) -> dict:
+        """Return the episode state: the numbers, the target and the attempts so far."""
+        return {
+            "numbers": [int(number) for number in self._numbers],
+            "target_num": self._target_num,
+            "target_equation": self._target_equation,
+            "attempts": self._attempts,
+            "np_random": self._get_np_random_state(),
+        }
+
+    def set_state(self, state: dict):
+        """Restore the episode state returned by `get_state`."""
+        self._numbers = np.array(state["numbers"])
+        self._target_num = state["target_num"]
+        self._target_equation = state["target_equation"]
+        self._attempts = state["attempts"]
+        self._set_np_random_state(state["np_random"])
+
     @property
     def task_prompt(self) -> str:
         """Returns the task prompt describing what the agent needs to do."""
@@ -0,0 +1,92 @@
+"""
+Trivial environment that echoes its tool calls back, so that the cost of serving an environment
+(transport, routing, serialization) can be measured apart from environment logic.
+"""
+
+import asyncio
+from typing import Optional
+from verl_agent_env.envs.base import LLMAgentEnv
+
+
+class EchoEnv(LLMAgentEnv):
+    def __init__(self, episode_length: int = 10, payload_size: int = 0) -> None:
+        """Initialize the echo environment.
+
+        Args:
+            episode_length (int): Number of steps after which the episode is truncated.
+            payload_size (int): Number of extra characters appended to every observation, to measure
+                how the serving cost scales with the observation size.
+        """
+        super().__init__()
+        self.episode_length = episode_length
+        self.payload_size = payload_size
+        self.allow_parallel_tool_call = True
+
+        self._action_space_json_schema = [
+            {
+                "name": "echo",
+                "description": "Echo the given text back",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "text": {
+                            "type": "string",
+                            "description": "The text to echo back"
+                        }
+                    },
+                    "required": ["text"]
+                }
+            }
+        ]
+        self._num_steps = 0
+        self._payload = "x" * payload_size
+
+    def _get_info(self) -> dict:
+        return {"num_steps": self._num_steps}
+
+    async def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        await super().reset(seed=seed)
+        self._num_steps = 0
+        return ({"role": "user", "content": "Call the echo tool." + self._payload},), self._get_info()
+
+    async def step(self, action):
+        self._num_steps += 1
+        observation = [
+            {
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": tool_call["function"].get("arguments", "") + self._payload
+            }
+            for tool_call in action.get("tool_calls") or []
+        ]
+        truncated = self._num_steps >= self.episode_length
+        return observation, 0.0, False, truncated, self._get_info()
+
+    def get_state(self) -> dict:
+        return {"num_steps": self._num_steps}
+
+    def set_state(self, state: dict):
+        self._num_steps = state["num_steps"]
+
+    @property
+    def task_prompt(self) -> str:
+        return "Call the echo tool with any text."
+
+    @property
+    def action_space_json_schema(self):
+        return self._action_space_json_schema
+
+
+if __name__ == "__main__":
+    async def main():
+        env = EchoEnv(episode_length=2)
+        print(await env.reset())
+        action = {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "echo", "arguments": "{\"text\": \"hello\"}"}}]
+        }
+        print(await env.step(action))
+        print(await env.step(action))
+
+    asyncio.run(main())
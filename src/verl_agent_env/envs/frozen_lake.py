@@ -1,13 +1,107 @@
 """
 Adapted from https://gymnasium.farama.org/environments/toy_text/frozen_lake/
+
+The game runs on a native NumPy core instead of a `gym.make("FrozenLake-v1")` per reset: the map is
+a (nrow, ncol) array of letters, and `transition_table` precomputes the next state of every
+(state, action) pair as a compact (nS, 4, k) integer array, with k = 3 slip outcomes on slippery
+maps and k = 1 otherwise. Observations, rewards, truncation after 100 steps and seeding are the same
+as with the gymnasium environment, down to the random numbers drawn, so a seed plays the same
+episode as before.
+
+`step_frozen_lake_envs` steps many environments at once by gathering from their stacked tables,
+which is how `interface` serves batch steps of many Frozen Lake environments.
 """
 
 import asyncio
-from typing import Optional, Tuple
-import gymnasium as gym
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
 from gymnasium.envs.toy_text.frozen_lake import generate_random_map
+from gymnasium.utils import seeding
 from verl_agent_env.envs.base import LLMAgentEnv
 
+# Row and column change of the actions left (0), down (1), right (2) and up (3)
+ACTION_ROW_CHANGE = np.array([0, 1, 0, -1], dtype=np.int64)
+ACTION_COL_CHANGE = np.array([-1, 0, 1, 0], dtype=np.int64)
+# On slippery maps the player moves in the intended direction with this probability, and
+# perpendicular to it in either direction otherwise
+SUCCESS_RATE = 1.0 / 3.0
+# Cumulative probabilities of moving in directions (a - 1) % 4, a and (a + 1) % 4 for action a,
+# summed like gymnasium's categorical_sample so that the same random number picks the same direction
+SLIP_CUMULATIVE_PROBABILITIES = np.cumsum([(1 - SUCCESS_RATE) / 2, SUCCESS_RATE, (1 - SUCCESS_RATE) / 2])
+# Number of steps after which an episode is truncated, as registered for FrozenLake-v1
+MAX_EPISODE_STEPS = 100
+
+
+def transition_table(desc: np.ndarray, is_slippery: bool) -> np.ndarray:
+    """
+    Return the next state of every state and action of a map.
+
+    Args:
+        desc (np.ndarray): (nrow, ncol) map of b"S", b"F", b"H" and b"G" letters.
+        is_slippery (bool): Whether moves can slip perpendicular to the intended direction.
+
+    Returns:
+        np.ndarray: (nS, 4, k) next states, states numbered row by row. Entry [s, a, i] is where
+            action a leads from s if the slip outcome is i, see SLIP_CUMULATIVE_PROBABILITIES, with
+            k = 3 if slippery and k = 1 otherwise. Holes and the goal lead to themselves.
+    """
+    nrow, ncol = desc.shape
+    rows, cols = np.divmod(np.arange(nrow * ncol), ncol)
+    directions = np.arange(4)[:, None] + (np.array([-1, 0, 1]) if is_slippery else np.array([0]))
+    directions %= 4
+    next_rows = np.clip(rows[:, None, None] + ACTION_ROW_CHANGE[directions], 0, nrow - 1)
+    next_cols = np.clip(cols[:, None, None] + ACTION_COL_CHANGE[directions], 0, ncol - 1)
+    next_states = next_rows * ncol + next_cols
+    terminal = np.isin(desc.ravel(), [b"G", b"H"])
+    next_states[terminal] = np.arange(nrow * ncol)[terminal, None, None]
+    return next_states.astype(np.int32)
+
+
+def _sample_outcome(np_random: np.random.Generator, num_outcomes: int) -> int:
+    """
+    Draw the slip outcome of a step. Like gymnasium, a number is drawn even when there is only one
+    outcome, so that the random state advances the same way on all maps.
+    """
+    u = np_random.random()
+    if num_outcomes == 1:
+        return 0
+    return int(np.argmax(SLIP_CUMULATIVE_PROBABILITIES > u))
+
+
+def format_observation(map_rows: List[str], s: int, tool_call_id: Optional[str]) -> Tuple[dict, ...]:
+    """
+    Return the observation message showing the player at state s on a map.
+
+    Args:
+        map_rows (List[str]): Rows of the map, with the start shown as a frozen cell.
+        s (int): State of the player, i.e. row * ncol + col.
+        tool_call_id (Optional[str]): ID of the tool call that led here, None after a reset.
+    """
+    row, col = divmod(int(s), len(map_rows[0]))
+    rows = list(map_rows)
+    rows[row] = rows[row][:col] + "P" + rows[row][col + 1:]
+    obs = f"You are at position {row},{col} in the world.\n"
+    obs += "The current map of the world is: \n"
+    obs += "\n".join(rows)
+    
+    if tool_call_id is not None:
+        return (
+            {
+                "role": "tool",
+                "tool_call_id": tool_call_id,
+                "content": obs
+            },
+        )
+    else:
+        return (
+            {
+                "role": "user",
+                "content": obs
+            },
+        )
+
 
 class FrozenLakeEnv(LLMAgentEnv):
     """
@@ -20,8 +114,15 @@ class FrozenLakeEnv(LLMAgentEnv):
         super().__init__()
         self.map_size = map_size
         self.frozen_prob = frozen_prob
-        self.frozen_lake_env = None
         self._is_slippery = is_slippery
+        # The map as a (nrow, ncol) array of letters, None before the first reset
+        self.desc = None
+        self._next_states = None
+        # Rows of the map as shown to the player, with the start as a frozen cell
+        self._map_rows = None
+        self.s = 0
+        self.lastaction = None
+        self.elapsed_steps = 0
         
         self._action_space_json_schema = [
             {
@@ -71,68 +172,109 @@ class FrozenLakeEnv(LLMAgentEnv):
         self._last_tool_call_id = None
         
     
+    def _load_map(self, desc: List[str]):
+        """Set up the map and its transition table."""
+        self.desc = np.asarray(desc, dtype="c")
+        self._next_states = transition_table(self.desc, self._is_slippery)
+        self._map_rows = ["".join(row).replace("S", "F") for row in desc]
+
     def _get_obs(self) -> Tuple[dict, ...]:
         """Generate a string representation of the current state of the environment.
 
         Returns:
             Tuple[dict, ...]: A tuple containing a dictionary with the tool response and results.
         """
-        desc = self.frozen_lake_env.unwrapped.desc.tolist()
-        desc = [[c.decode("utf-8") for c in line] for line in desc]
-        # replace "S" with "F"
-        for i, row in enumerate(desc):
-            for j, col in enumerate(row):
-                if col == "S":
-                    desc[i][j] = "F"
-        row, col = self.frozen_lake_env.unwrapped.s // self.frozen_lake_env.unwrapped.ncol, self.frozen_lake_env.unwrapped.s % self.frozen_lake_env.unwrapped.ncol
-        desc[row][col] = "P"
-        obs = f"You are at position {row},{col} in the world.\n"
-        obs += "The current map of the world is: \n"
-        obs += "\n".join(["".join(row) for row in desc])
-        
-        if self._last_tool_call_id is not None:
-            return (
-                {
-                    "role": "tool",
-                    "tool_call_id": self._last_tool_call_id,
-                    "content": obs
-                },
-            )
-        else:
-            return (
-                {
-                    "role": "user",
-                    "content": obs
-                },
-            )
+        return format_observation(self._map_rows, self.s, self._last_tool_call_id)
     
     def _get_info(self) -> dict:
         return {}
-    
-    async def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
-        await super().reset(seed=seed)
-        desc = generate_random_map(size=self.map_size, p=self.frozen_prob, seed=seed)
-        self.frozen_lake_env = gym.make("FrozenLake-v1", desc=desc, map_name=None, is_slippery=self._is_slippery, render_mode="ansi")
-        self.frozen_lake_env.reset(seed=seed)
-        self._last_tool_call_id = None
-        return self._get_obs(), self._get_info()
-    
-    async def step(self, action):
+
+    def _parse_action(self, action) -> Optional[int]:
+        """
+        Return the action ID of an action message, or None if it has no tool call, which ends the episode.
+        """
         action = action['tool_calls']
         if len(action) == 0:
-            return [], 0.0, True, False, self._get_info()
+            return None
         
         assert len(action) == 1, "Only one action is allowed"
         action = action[0]
         assert action["type"] == "function", "Only function call is allowed"
         self._last_tool_call_id = action["id"]
         action = action["function"]
-        action_id = self._tool_name_action_id_map[action["name"]]
-        obs, reward, terminated, truncated, info = self.frozen_lake_env.step(action_id)
-        
+        return self._tool_name_action_id_map[action["name"]]
+
+    def _move(self, action_id: int, outcome: int) -> Tuple[float, bool, bool]:
+        """
+        Move the player with the given slip outcome.
+
+        Returns:
+            Tuple[float, bool, bool]: The reward, and whether the episode terminated or was truncated.
+        """
+        # Holes and the goal lead to themselves without reward, like in gymnasium
+        source_letter = self.desc.flat[self.s]
+        self.s = int(self._next_states[self.s, action_id, outcome])
+        self.lastaction = action_id
+        self.elapsed_steps += 1
+        letter = self.desc.flat[self.s]
+        reward = int(letter == b"G" and source_letter not in b"GH")
+        terminated = bool(letter in b"GH")
+        truncated = self.elapsed_steps >= MAX_EPISODE_STEPS
+        return reward, terminated, truncated
+
+    async def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        await super().reset(seed=seed)
+        if seed is not None:
+            self._np_random, self._np_random_seed = seeding.np_random(seed)
+        self._load_map(generate_random_map(size=self.map_size, p=self.frozen_prob, seed=seed))
+        # The start is drawn from the initial state distribution, which only holds the S cell,
+        # but the draw still advances the random state
+        self.np_random.random()
+        self.s = int(np.flatnonzero(self.desc.ravel() == b"S")[0])
+        self.lastaction = None
+        self.elapsed_steps = 0
+        self._last_tool_call_id = None
+        return self._get_obs(), self._get_info()
+    
+    async def step(self, action):
+        action_id = self._parse_action(action)
+        if action_id is None:
+            return [], 0.0, True, False, self._get_info()
+        outcome = _sample_outcome(self.np_random, self._next_states.shape[2])
+        reward, terminated, truncated = self._move(action_id, outcome)
         return self._get_obs(), reward, terminated, truncated, self._get_info()
         
     
+    def get_state(self) -> dict:
+        """
+        Return the episode state: the map, the player position, the number of steps taken
+        (episodes are truncated after 100 steps), and the random state used by slippery moves.
+        """
+        if self.desc is None:
+            return {"desc": None}
+        return {
+            "desc": [row.tobytes().decode("utf-8") for row in self.desc],
+            "s": int(self.s),
+            "lastaction": None if self.lastaction is None else int(self.lastaction),
+            "elapsed_steps": self.elapsed_steps,
+            "np_random": self._get_np_random_state(),
+            "last_tool_call_id": self._last_tool_call_id,
+        }
+
+    def set_state(self, state: dict):
+        """Restore the episode state returned by `get_state`."""
+        if state["desc"] is None:
+            self.desc = None
+            self._next_states = None
+            self._map_rows = None
+            return
+        self._load_map(state["desc"])
+        self.s = state["s"]
+        self.lastaction = state["lastaction"]
+        self.elapsed_steps = state["elapsed_steps"]
+        self._set_np_random_state(state["np_random"])
+        self._last_tool_call_id = state["last_tool_call_id"]
+
     @property
     def task_prompt(self) -> str:
         # The game starts with the player at location [0,0] of the frozen lake grid world with the goal located at far extent of the world e.g. [3,3] for the 4x4 environment.
@@ -173,7 +315,69 @@ class FrozenLakeEnv(LLMAgentEnv):
     @property
     def action_space_json_schema(self):
         return self._action_space_json_schema
-    
+
+
+def step_frozen_lake_envs(envs: List[FrozenLakeEnv], actions: List[dict]) -> List[object]:
+    """
+    Take one step in each of several `FrozenLakeEnv` instances, with the same outcome as awaiting
+    `env.step(action)` on each of them. The next states of maps of the same size and slipperiness
+    are gathered from their stacked transition tables at once.
+
+    Args:
+        envs (List[FrozenLakeEnv]): Distinct, reset environments.
+        actions (List[dict]): One action message per environment.
+
+    Returns:
+        List[object]: Per environment, the (observation, reward, terminated, truncated, info) tuple
+            of `FrozenLakeEnv.step`, or the exception the step raised.
+    """
+    outcomes: List[object] = [None] * len(envs)
+    action_ids: List[Optional[int]] = [None] * len(envs)
+    groups = {}
+    for index, (env, action) in enumerate(zip(envs, actions)):
+        try:
+            action_ids[index] = env._parse_action(action)
+        except Exception as e:
+            outcomes[index] = e
+            continue
+        if action_ids[index] is None:
+            outcomes[index] = ([], 0.0, True, False, env._get_info())
+            continue
+        groups.setdefault(env._next_states.shape, []).append(index)
+
+    for (_, _, num_outcomes), indices in groups.items():
+        group_envs = [envs[index] for index in indices]
+        batch = np.arange(len(indices))
+        next_states = np.stack([env._next_states for env in group_envs])
+        letters = np.stack([env.desc.ravel() for env in group_envs])
+        states = np.array([env.s for env in group_envs], dtype=np.int64)
+        action_array = np.array([action_ids[index] for index in indices], dtype=np.int64)
+        # Every environment draws from its own generator, exactly as in a single step
+        draws = np.array([env.np_random.random() for env in group_envs])
+        if num_outcomes == 1:
+            slip_outcomes = np.zeros(len(indices), dtype=np.int64)
+        else:
+            slip_outcomes = np.argmax(SLIP_CUMULATIVE_PROBABILITIES[None, :] > draws[:, None], axis=1)
+
+        new_states = next_states[batch, states, action_array, slip_outcomes]
+        source_terminal = np.isin(letters[batch, states], [b"G", b"H"])
+        new_letters = letters[batch, new_states]
+        rewards = ((new_letters == b"G") & ~source_terminal).tolist()
+        terminated = np.isin(new_letters, [b"G", b"H"]).tolist()
+
+        for position, (index, env) in enumerate(zip(indices, group_envs)):
+            env.s = int(new_states[position])
+            env.lastaction = action_ids[index]
+            env.elapsed_steps += 1
+            outcomes[index] = (
+                env._get_obs(),
+                int(rewards[position]),
+                terminated[position],
+                env.elapsed_steps >= MAX_EPISODE_STEPS,
+                env._get_info()
+            )
+    return outcomes
+
 if __name__ == "__main__":
     async def main():
         env = FrozenLakeEnv()
@@ -204,4 +408,20 @@ if __name__ == "__main__":
             "tool_calls": [{"id": "call_123", "type": "function", "function": {"name": "move_down", "arguments": "{}"}}]
         }
         print(await env.step(action))
+
+        # Benchmark resets and batched steps of slippery 8x8 maps
+        num_envs = 256
+        envs = [FrozenLakeEnv(is_slippery=True) for _ in range(num_envs)]
+        start = time.perf_counter()
+        for seed, env in enumerate(envs):
+            await env.reset(seed=seed)
+        print(f"[FROZEN_LAKE] {(time.perf_counter() - start) / num_envs * 1e6:.0f} us per reset")
+        action = {"tool_calls": [{"id": "call_123", "type": "function", "function": {"name": "move_down", "arguments": "{}"}}]}
+        start = time.perf_counter()
+        for env in envs:
+            await env.step(action)
+        print(f"[FROZEN_LAKE] {(time.perf_counter() - start) / num_envs * 1e6:.1f} us per single step")
+        start = time.perf_counter()
+        step_frozen_lake_envs(envs, [action] * num_envs)
+        print(f"[FROZEN_LAKE] {(time.perf_counter() - start) / num_envs * 1e6:.1f} us per batched step")
     asyncio.run(main())
\ No newline at end of file
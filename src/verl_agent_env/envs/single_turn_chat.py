@@ -28,6 +28,16 @@ class SingleTurnChatEnv(LLMAgentEnv):
         return [], reward, True, True, self._get_info()
         
     
+    def get_state(self) -> dict:
+        return {
+            "chat_history": self.chat_history,
+            "task_prompt": self._task_prompt,
+        }
+
+    def set_state(self, state: dict):
+        self.chat_history = state["chat_history"]
+        self._task_prompt = state["task_prompt"]
+
     @property
     def task_prompt(self) -> str:
         return self._task_prompt
@@ -0,0 +1,372 @@
+"""
+Bitboard representation of Sokoban rooms, for large rooms.
+
+The grid representation touches single cells per move, but reachability, win checks and state
+hashing scan the whole room, which grows with its area. A `Bitboard` keeps the floors, targets and
+boxes as Python ints with one bit per cell, at bit `row * stride + col` with `stride = width + 1`.
+The extra column is never floor, so shifting a board one cell left or right never wraps into the
+next row unnoticed. Flood fills, win checks and hashing then take a few big integer operations per
+step, each handling 64 cells per machine word.
+
+    board = Bitboard.from_room(env.room_fixed, env.room_state)
+    moved_player, moved_box = board.push(0)  # up, see CHANGE_COORDINATES
+    board.is_solved(), board.distance(board.cell(1, 2))
+
+`SokobanEnv(engine="bitboard")` steps with it, and `reverse_playing_bitboard` is the reverse play
+of room generation on bitboards, see `generate_room(engine="bitboard")`.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from verl_agent_env.envs.sokoban.room_utils import ACTION_LOOKUP, CHANGE_COORDINATES
+
+
+def pack_mask(mask: np.ndarray) -> int:
+    """
+    Pack a boolean (height, width) mask into a bitboard.
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 1), dtype=bool)
+    padded[:, :width] = mask
+    return int.from_bytes(np.packbits(padded.ravel(), bitorder="little").tobytes(), "little")
+
+
+def unpack_mask(bits: int, height: int, width: int) -> np.ndarray:
+    """
+    Unpack a bitboard into a boolean (height, width) mask.
+    """
+    stride = width + 1
+    num_bytes = (height * stride + 7) // 8
+    packed = np.frombuffer(bits.to_bytes(num_bytes, "little"), dtype=np.uint8)
+    cells = np.unpackbits(packed, count=height * stride, bitorder="little").astype(bool)
+    return cells.reshape(height, stride)[:, :width]
+
+
+class Bitboard:
+    """
+    Sokoban room state as bitboards of floors, targets and boxes, plus the player's bit index.
+    """
+
+    __slots__ = ("height", "width", "stride", "offsets", "floor", "targets", "boxes", "player")
+
+    def __init__(self, height: int, width: int, floor: int, targets: int, boxes: int, player: int):
+        self.height = height
+        self.width = width
+        self.stride = width + 1
+        # Bit offset of every direction of CHANGE_COORDINATES
+        self.offsets = [row_change * self.stride + col_change for row_change, col_change in CHANGE_COORDINATES.values()]
+        self.floor = floor
+        self.targets = targets
+        self.boxes = boxes
+        self.player = player
+
+    @classmethod
+    def from_room(cls, room_fixed: np.ndarray, room_state: np.ndarray) -> "Bitboard":
+        room_fixed = np.asarray(room_fixed)
+        room_state = np.asarray(room_state)
+        height, width = room_fixed.shape
+        player_row, player_col = np.argwhere(room_state == 5)[0]
+        return cls(
+            height,
+            width,
+            pack_mask(room_fixed != 0),
+            pack_mask(room_fixed == 2),
+            pack_mask((room_state == 3) | (room_state == 4)),
+            int(player_row) * (width + 1) + int(player_col),
+        )
+
+    def copy(self) -> "Bitboard":
+        return Bitboard(self.height, self.width, self.floor, self.targets, self.boxes, self.player)
+
+    def cell(self, row: int, col: int) -> int:
+        """
+        Return the bit index of a cell.
+        """
+        return row * self.stride + col
+
+    def position(self, cell: int) -> Tuple[int, int]:
+        """
+        Return the (row, col) of a bit index.
+        """
+        return divmod(cell, self.stride)
+
+    def room_state(self) -> np.ndarray:
+        """
+        Return the room state in the grid representation.
+        """
+        room_state = np.where(unpack_mask(self.floor, self.height, self.width), 1, 0).astype(np.int8)
+        room_state[unpack_mask(self.targets, self.height, self.width)] = 2
+        boxes = unpack_mask(self.boxes, self.height, self.width)
+        room_state[boxes] = 4
+        room_state[boxes & (room_state == 2)] = 3
+        room_state[self.position(self.player)] = 5
+        return room_state
+
+    def move(self, direction: int) -> bool:
+        """
+        Move the player one cell, if the cell is a floor without a box.
+        """
+        next_cell = self.player + self.offsets[direction]
+        if next_cell < 0 or not (self.floor >> next_cell) & 1 or (self.boxes >> next_cell) & 1:
+            return False
+        self.player = next_cell
+        return True
+
+    def push(self, direction: int) -> Tuple[bool, bool]:
+        """
+        Push the adjacent box in a direction, or move if there is no box that can be pushed, like
+        the push actions of `SokobanEnv`.
+
+        Returns:
+            Tuple[bool, bool]: Whether the player and whether a box moved.
+        """
+        offset = self.offsets[direction]
+        box_cell = self.player + offset
+        next_cell = box_cell + offset
+        if box_cell >= 0 and next_cell >= 0 and (self.boxes >> box_cell) & 1 \
+                and (self.floor >> next_cell) & 1 and not (self.boxes >> next_cell) & 1:
+            self.boxes ^= (1 << box_cell) | (1 << next_cell)
+            self.player = box_cell
+            return True, True
+        return self.move(direction), False
+
+    def uncovered_targets(self) -> int:
+        return bin(self.targets & ~self.boxes).count("1")
+
+    def is_solved(self) -> bool:
+        return not self.targets & ~self.boxes
+
+    def reachable(self) -> int:
+        """
+        Return the board of the cells the player can walk to without pushing.
+        """
+        free = self.floor & ~self.boxes
+        reached = 1 << self.player
+        while True:
+            grown = (reached | (reached << 1) | (reached >> 1) | (reached << self.stride) | (reached >> self.stride)) & free
+            if grown == reached:
+                return reached
+            reached = grown
+
+    def distance(self, cell: int) -> Optional[int]:
+        """
+        Return the walking distance of the player to a cell without pushing, or None if it cannot
+        reach it. Every breadth first layer is one flood fill step.
+        """
+        if cell < 0:
+            return None
+        free = self.floor & ~self.boxes
+        goal = 1 << cell
+        reached = 1 << self.player
+        distance = 0
+        while not reached & goal:
+            grown = (reached | (reached << 1) | (reached >> 1) | (reached << self.stride) | (reached >> self.stride)) & free
+            if grown == reached:
+                return None
+            reached = grown
+            distance += 1
+        return distance
+
+    def key(self) -> Tuple[int, int]:
+        """
+        Return a hashable key of the position, with the player normalized to the lowest cell it
+        can reach, so that positions that only differ by walking share a key.
+        """
+        reachable = self.reachable()
+        return self.boxes, (reachable & -reachable).bit_length() - 1
+
+
+def reverse_playing_bitboard(room_state, room_structure, search_depth=100, ttl=300, max_explored_states=300000):
+    """
+    `room_utils.reverse_playing` on bitboards: the same depth first search over the same reverse
+    actions, which returns the same room, score and box mapping. States are identified exactly by
+    their boards of pulled boxes, unmoved boxes and the player instead of Zobrist hashes.
+
+    :param room_state:
+    :param room_structure:
+    :param search_depth: Unused, kept for compatibility.
+    :param ttl:
+    :param max_explored_states:
+    :return: The best room state, its score and its box mapping from box targets to box positions.
+    """
+    room_state = np.asarray(room_state)
+    room_structure = np.asarray(room_structure)
+    height, width = room_structure.shape
+    board = Bitboard.from_room(room_structure, room_state)
+    stride = board.stride
+    # Floors without a box or the player
+    free = board.floor & ~board.boxes & ~(1 << board.player)
+    # Boxes not pulled yet start on their targets (4 in the grid), pulled boxes are marked 3
+    unmoved = board.boxes
+    pulled = 0
+    player = board.player
+    targets_bits = board.targets
+
+    targets = [board.cell(row, col) for row, col in np.argwhere(room_structure == 2).tolist()]
+    num_boxes = len(targets)
+    box_positions = list(targets)
+    box_at = {target: box for box, target in enumerate(targets)}
+    displacement = 0
+    # Targets without a box or the player, see reverse_playing
+    empty_targets = bin(targets_bits & free).count("1")
+
+    offsets = [board.offsets[action % 4] for action in ACTION_LOOKUP]
+    num_actions = len(offsets)
+
+    explored_states = set()
+    best_room_score = -1
+    best_state = None
+
+    ttl -= 1
+    if ttl <= 0 or max_explored_states <= 0:
+        return None, best_room_score, {}
+    frames = [[0, ttl, 0, None]]
+    box_swaps = 0
+    while True:
+        if box_swaps is not None:
+            room_score = box_swaps * displacement
+            if empty_targets != num_boxes:
+                room_score = 0
+            if room_score > best_room_score:
+                best_room_score = room_score
+                best_state = (free, unmoved, pulled, player, list(box_positions))
+            explored_states.add((pulled, unmoved, player))
+            box_swaps = None
+        if not frames:
+            break
+
+        frame = frames[-1]
+        action = frame[0]
+        if action == num_actions:
+            frames.pop()
+            undo = frame[3]
+            if undo is not None:
+                player, free, unmoved, pulled, empty_targets, displacement, moved_box, moved_box_cell = undo
+                if moved_box >= 0:
+                    del box_at[box_positions[moved_box]]
+                    box_at[moved_box_cell] = moved_box
+                    box_positions[moved_box] = moved_box_cell
+            continue
+        frame[0] = action + 1
+
+        offset = offsets[action]
+        next_position = player + offset
+        if not (free >> next_position) & 1:
+            continue
+        child_ttl = frame[1] - 1
+        if child_ttl <= 0 or len(explored_states) >= max_explored_states:
+            continue
+
+        undo = (player, free, unmoved, pulled, empty_targets, displacement, -1, -1)
+        player_bit = 1 << player
+        next_bit = 1 << next_position
+        free ^= player_bit | next_bit
+        if targets_bits & player_bit:
+            empty_targets += 1
+        if targets_bits & next_bit:
+            empty_targets -= 1
+
+        child_swaps = frame[2]
+        if action < 4:
+            box_cell = player - offset
+            box_bit = 1 << box_cell
+            if (pulled | unmoved) & box_bit:
+                unmoved &= ~box_bit
+                pulled = (pulled & ~box_bit) | player_bit
+                free = (free | box_bit) & ~player_bit
+                if targets_bits & player_bit:
+                    empty_targets -= 1
+                if targets_bits & box_bit:
+                    empty_targets += 1
+                box = box_at.get(box_cell, -1)
+                if box >= 0:
+                    undo = undo[:6] + (box, box_cell)
+                    target_row, target_col = divmod(targets[box], stride)
+                    player_row, player_col = divmod(player, stride)
+                    box_row, box_col = divmod(box_cell, stride)
+                    displacement += (abs(player_row - target_row) + abs(player_col - target_col)
+                                     - abs(box_row - target_row) - abs(box_col - target_col))
+                    del box_at[box_cell]
+                    box_at[player] = box
+                    box_positions[box] = player
+                    child_swaps += 1
+        player = next_position
+
+        if (pulled, unmoved, player) in explored_states:
+            frames.append([num_actions, child_ttl, child_swaps, undo])
+        else:
+            frames.append([0, child_ttl, child_swaps, undo])
+            box_swaps = child_swaps
+
+    _, best_unmoved, best_pulled, best_player, best_box_positions = best_state
+    best_room = np.array(room_structure, dtype=room_state.dtype)
+    best_room[unpack_mask(best_unmoved, height, width)] = 4
+    best_room[unpack_mask(best_pulled, height, width)] = 3
+    best_room[divmod(best_player, stride)] = 5
+    best_box_mapping = {
+        divmod(target, stride): divmod(position, stride)
+        for target, position in zip(targets, best_box_positions)
+    }
+    return best_room, best_room_score, best_box_mapping
+
+
+if __name__ == "__main__":
+    import time
+    import asyncio
+    import argparse
+
+    from verl_agent_env.envs.sokoban.room_utils import generate_rooms, reverse_playing
+    from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+    parser = argparse.ArgumentParser(description="Benchmark the bitboard engine against the grid engine")
+    parser.add_argument("--dims", type=int, nargs="+", default=[10, 20, 30, 40], help="Room sizes, square")
+    parser.add_argument("--num-boxes", type=int, default=4)
+    parser.add_argument("--num-rooms", type=int, default=3)
+    parser.add_argument("--num-steps", type=int, default=2000, help="Random actions played per room")
+    args = parser.parse_args()
+
+    def timed(function, *function_args):
+        start = time.perf_counter()
+        result = function(*function_args)
+        return result, time.perf_counter() - start
+
+    for dim in args.dims:
+        rng = np.random.default_rng(dim)
+        rooms = generate_rooms(args.num_rooms, dim=(dim, dim), num_steps=int(3.4 * dim), num_boxes=args.num_boxes, rng=rng)
+        timings = {"reverse play": [0.0, 0.0], "walking distance": [0.0, 0.0], "env step": [0.0, 0.0]}
+        for room_fixed, room_state, box_mapping in rooms:
+            # Reverse play of the solved room, from the boxes on their targets
+            start_state = room_fixed.copy()
+            start_state[room_fixed == 2] = 4
+            start_state[room_state == 5] = 5
+            _, grid_time = timed(reverse_playing, start_state.copy(), room_fixed)
+            _, board_time = timed(reverse_playing_bitboard, start_state.copy(), room_fixed)
+            timings["reverse play"][0] += grid_time
+            timings["reverse play"][1] += board_time
+
+            actions = rng.integers(1, 9, size=args.num_steps)
+            for index, engine in enumerate(("grid", "bitboard")):
+                env = SokobanEnv(dim_room=(dim, dim), num_boxes=args.num_boxes, engine=engine, max_steps=10 ** 9,
+                                 room_setup={"room_fixed": room_fixed.tolist(), "room_state": room_state.tolist(),
+                                             "box_mapping": {str(k): list(v) for k, v in box_mapping.items()}})
+                asyncio.run(env.reset())
+                floors = [tuple(cell) for cell in np.argwhere(room_fixed != 0).tolist()]
+                start = time.perf_counter()
+                for cell in floors:
+                    # The grid engine caches the map of the player position, as push_box mode does between pushes
+                    env._reachable = None
+                    env._walking_distance(cell)
+                timings["walking distance"][index] += (time.perf_counter() - start) / len(floors)
+                start = time.perf_counter()
+                for action in actions:
+                    if action < 5:
+                        env._push(int(action))
+                    else:
+                        env._move(int(action))
+                timings["env step"][index] += time.perf_counter() - start
+
+        print(f"[SOKOBAN] {dim}x{dim} rooms with {args.num_boxes} boxes:")
+        for name, (grid_time, board_time) in timings.items():
+            print(f"[SOKOBAN]   {name:16s} grid {1000 * grid_time / len(rooms):9.3f} ms  "
+                  f"bitboard {1000 * board_time / len(rooms):9.3f} ms  speedup {grid_time / board_time:5.2f}x")
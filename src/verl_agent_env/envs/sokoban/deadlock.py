@@ -0,0 +1,151 @@
+"""
+Deadlock detection for Sokoban rooms.
+
+A deadlock is a position from which the boxes can no longer all reach targets, whatever the player
+does. Detecting them lets the solver prune its search.
+
+    - Dead squares: floor cells from which a box can never be pushed to any target, e.g. corners
+      without a target. They only depend on the walls and targets, so they are computed once per room.
+    - 2x2 blocks: four cells in a square that are all walls or boxes, with a box that is not on a
+      target. None of these boxes can move again.
+    - Freeze deadlocks: a box that can move along neither axis, because each axis is blocked by a
+      wall, by dead squares on both sides, or by a box that is itself frozen, while one of the
+      frozen boxes is off target. This covers the 2x2 blocks and chains of boxes along walls.
+
+Box deadlocks only depend on the neighborhood of the last pushed box, so `SokobanEnv` checks them
+after every push in constant time.
+"""
+
+from typing import FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from verl_agent_env.envs.sokoban.room_utils import CHANGE_COORDINATES
+
+
+def neighbor_table(height: int, width: int) -> List[List[int]]:
+    """
+    Return, for every direction of CHANGE_COORDINATES, the flat index of the neighbor of every cell,
+    or -1 where the neighbor is outside the grid.
+    """
+    table = []
+    for direction in range(4):
+        row_change, col_change = CHANGE_COORDINATES[direction]
+        neighbors = []
+        for row in range(height):
+            for col in range(width):
+                next_row, next_col = row + row_change, col + col_change
+                inside = 0 <= next_row < height and 0 <= next_col < width
+                neighbors.append(next_row * width + next_col if inside else -1)
+        table.append(neighbors)
+    return table
+
+
+def _dead_cells(walls: List[bool], targets: List[int], neighbors: List[List[int]]) -> List[bool]:
+    """
+    Flat version of `dead_squares`: a box can reach a target from a cell if the box can be pulled
+    from a target to that cell, i.e. the cell and the one behind it are free.
+    """
+    dead = [True] * len(walls)
+    stack = list(targets)
+    for target in targets:
+        dead[target] = False
+    while stack:
+        cell = stack.pop()
+        for direction in range(4):
+            # Pulling the box from `cell` one step in `direction`, the player walks ahead of it
+            box = neighbors[direction][cell]
+            if box < 0 or walls[box] or not dead[box]:
+                continue
+            player = neighbors[direction][box]
+            if player < 0 or walls[player]:
+                continue
+            dead[box] = False
+            stack.append(box)
+    return dead
+
+
+def dead_squares(room_fixed: np.ndarray) -> np.ndarray:
+    """
+    Return a boolean mask of the floor cells from which a box can never be pushed onto any target.
+    Walls are not marked. Cells outside the grid count as walls.
+    """
+    height, width = room_fixed.shape
+    walls = (np.asarray(room_fixed) == 0).ravel().tolist()
+    targets = np.flatnonzero(np.asarray(room_fixed) == 2).tolist()
+    dead = _dead_cells(walls, targets, neighbor_table(height, width))
+    return np.array(dead).reshape(height, width) & ~np.asarray(room_fixed == 0)
+
+
+def _in_block(cell: int, walls: List[bool], boxes, targets, neighbors: List[List[int]]) -> bool:
+    """
+    Whether the box on `cell` is part of a 2x2 square of walls and boxes holding a box off target.
+    """
+    up, down, left, right = (neighbors[direction][cell] for direction in range(4))
+    for vertical in (up, down):
+        for horizontal in (left, right):
+            if vertical < 0 or horizontal < 0:
+                # The grid edge counts as wall, so the square is blocked if the other cells are
+                square = [cell, vertical, horizontal]
+            else:
+                diagonal = neighbors[2 if horizontal == left else 3][vertical]
+                square = [cell, vertical, horizontal, diagonal]
+            if all(other < 0 or walls[other] or other in boxes for other in square) and \
+                    any(other >= 0 and other in boxes and other not in targets for other in square):
+                return True
+    return False
+
+
+def is_block_deadlock(room_fixed: np.ndarray, room_state: np.ndarray, row: int, col: int) -> bool:
+    """
+    Whether the box at (row, col) is frozen in a 2x2 block of walls and boxes that holds a box off target.
+    """
+    height, width = room_fixed.shape
+    walls = (np.asarray(room_fixed) == 0).ravel().tolist()
+    boxes = set(np.flatnonzero((room_state == 3) | (room_state == 4)).tolist())
+    targets = set(np.flatnonzero(room_fixed == 2).tolist())
+    return _in_block(row * width + col, walls, boxes, targets, neighbor_table(height, width))
+
+
+def is_freeze_deadlock(room_fixed: np.ndarray, room_state: np.ndarray, row: int, col: int, dead: Optional[List[List[bool]]] = None) -> bool:
+    """
+    Whether the box at (row, col) is frozen, alone or together with neighboring boxes, while one of
+    these frozen boxes is off target. Cells outside the grid count as walls.
+
+    Args:
+        room_fixed (np.ndarray): Walls, floors and targets of the room.
+        room_state (np.ndarray): Current state of the room.
+        row (int): Row of the box to check, usually the last pushed one.
+        col (int): Column of the box to check.
+        dead (Optional[List[List[bool]]]): Dead squares of the room, see `dead_squares`, as nested
+            lists. Dead squares on both sides also block an axis.
+    """
+    height, width = room_fixed.shape
+
+    def is_wall(r: int, c: int) -> bool:
+        return not (0 <= r < height and 0 <= c < width) or room_fixed[r, c] == 0
+
+    def is_dead(r: int, c: int) -> bool:
+        return dead is not None and 0 <= r < height and 0 <= c < width and dead[r][c]
+
+    def frozen_boxes(r: int, c: int, walled: FrozenSet[Tuple[int, int]]) -> Optional[set]:
+        # Return the boxes frozen together with the box at (r, c), or None if it can still move.
+        # Boxes being checked further up count as walls, which breaks cycles.
+        walled = walled | {(r, c)}
+        frozen = {(r, c)}
+        for (r1, c1), (r2, c2) in (((r - 1, c), (r + 1, c)), ((r, c - 1), (r, c + 1))):
+            if is_wall(r1, c1) or is_wall(r2, c2) or (r1, c1) in walled or (r2, c2) in walled:
+                continue
+            if is_dead(r1, c1) and is_dead(r2, c2):
+                continue
+            for r3, c3 in ((r1, c1), (r2, c2)):
+                if room_state[r3, c3] in (3, 4):
+                    neighbors = frozen_boxes(r3, c3, walled)
+                    if neighbors is not None:
+                        frozen |= neighbors
+                        break
+            else:
+                return None
+        return frozen
+
+    frozen = frozen_boxes(row, col, frozenset())
+    return frozen is not None and any(room_fixed[r, c] != 2 for r, c in frozen)
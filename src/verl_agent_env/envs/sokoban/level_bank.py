@@ -0,0 +1,333 @@
+"""
+Binary bank of pre-generated Sokoban levels, memory-mapped with NumPy.
+
+Generating a room takes from milliseconds to seconds, and a `room_setup` passed in the init request
+is nested JSON that has to be parsed on every reset. A level bank stores many levels as fixed-size
+records in one file, so loading a level is a slice of a memory map, and sampling a level of a given
+size, box count and difficulty range is a binary search in a sorted index.
+
+File layout (little endian):
+    header (64 bytes): magic b"SOKOBANK", format version (uint32), max_height, max_width and
+        max_boxes (uint16 each) of the records, zero padding.
+    records: `record_dtype(max_height, max_width, max_boxes)`, one per level: height, width and
+        num_boxes (uint8), difficulty (uint32), room_fixed and room_state (max_height x max_width
+        uint8, padded with walls), and the box mapping as (target row, target col, box row, box col)
+        rows (max_boxes x 4 uint8).
+
+Build a bank with:
+
+    python -m verl_agent_env.envs.sokoban.level_bank --output levels.bank --num-levels 100000 \
+        --dim 6 6 --num-boxes 1 --workers 16
+
+and reset `SokobanEnv(level_bank="levels.bank")` with `options={"level_index": i}` or
+`options={"difficulty": [low, high]}`.
+"""
+
+import os
+import argparse
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+LEVEL_BANK_MAGIC = b"SOKOBANK"
+LEVEL_BANK_VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("max_height", "<u2"),
+    ("max_width", "<u2"),
+    ("max_boxes", "<u2"),
+])
+
+
+def record_dtype(max_height: int, max_width: int, max_boxes: int) -> np.dtype:
+    """
+    Return the dtype of the level records of a bank.
+    """
+    return np.dtype([
+        ("height", "u1"),
+        ("width", "u1"),
+        ("num_boxes", "u1"),
+        ("difficulty", "<u4"),
+        ("room_fixed", "u1", (max_height, max_width)),
+        ("room_state", "u1", (max_height, max_width)),
+        ("box_mapping", "u1", (max_boxes, 4)),
+    ])
+
+
+def level_key(height, width, num_boxes, difficulty):
+    """
+    Sort key of a level: its size, then its box count, then its difficulty. Works on arrays too.
+    """
+    return (
+        (np.asarray(height, dtype=np.int64) << 48)
+        | (np.asarray(width, dtype=np.int64) << 40)
+        | (np.asarray(num_boxes, dtype=np.int64) << 32)
+        | np.asarray(difficulty, dtype=np.int64)
+    )
+
+
+def box_displacement(box_mapping: Dict[tuple, tuple]) -> int:
+    """
+    Sum of the Manhattan distances between the boxes and their targets, a cheap difficulty measure.
+    """
+    return int(sum(abs(target[0] - box[0]) + abs(target[1] - box[1]) for target, box in box_mapping.items()))
+
+
+def _read_header(path: str) -> np.void:
+    with open(path, "rb") as f:
+        data = f.read(HEADER_SIZE)
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a level bank: the file is too short")
+    header = np.frombuffer(data[:HEADER_DTYPE.itemsize], dtype=HEADER_DTYPE)[0]
+    if header["magic"] != LEVEL_BANK_MAGIC:
+        raise ValueError(f"{path} is not a level bank: bad magic {header['magic']!r}")
+    if header["version"] != LEVEL_BANK_VERSION:
+        raise ValueError(f"Unsupported level bank version {header['version']} in {path}")
+    return header
+
+
+class LevelBankWriter:
+    """
+    Appends levels to a level bank file, creating it if needed.
+
+    Example:
+        with LevelBankWriter("levels.bank", max_height=10, max_width=10, max_boxes=4) as writer:
+            writer.add(room_fixed, room_state, box_mapping, difficulty=12)
+    """
+
+    def __init__(self, path: str, max_height: int, max_width: int, max_boxes: int) -> None:
+        """
+        Args:
+            path (str): The bank file. An existing bank must have the same record size.
+            max_height (int): Maximum room height of the records, at most 255.
+            max_width (int): Maximum room width of the records, at most 255.
+            max_boxes (int): Maximum number of boxes of the records, at most 255.
+
+        Raises:
+            ValueError: If the existing file is not a level bank with the same record size.
+        """
+        if max(max_height, max_width, max_boxes) > 255:
+            raise ValueError("Level bank records hold at most 255 rows, columns and boxes")
+        self.path = path
+        self.dtype = record_dtype(max_height, max_width, max_boxes)
+        self.max_height, self.max_width, self.max_boxes = max_height, max_width, max_boxes
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            header = _read_header(path)
+            if (header["max_height"], header["max_width"], header["max_boxes"]) != (max_height, max_width, max_boxes):
+                raise ValueError(
+                    f"{path} holds records of {header['max_height']}x{header['max_width']} rooms with up to "
+                    f"{header['max_boxes']} boxes, not {max_height}x{max_width} with up to {max_boxes}"
+                )
+            self._file = open(path, "ab")
+        else:
+            self._file = open(path, "wb")
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header[0] = (LEVEL_BANK_MAGIC, LEVEL_BANK_VERSION, max_height, max_width, max_boxes)
+            self._file.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+        self.num_added = 0
+
+    def add(self, room_fixed: np.ndarray, room_state: np.ndarray, box_mapping: Dict[tuple, tuple], difficulty: int = 0):
+        """
+        Append one level.
+
+        Args:
+            room_fixed (np.ndarray): Walls, floors and targets of the room.
+            room_state (np.ndarray): Start state of the room.
+            box_mapping (Dict[tuple, tuple]): Box target to box position, as returned by `generate_room`.
+            difficulty (int): Non-negative difficulty score used to sample levels by difficulty.
+        """
+        height, width = np.shape(room_fixed)
+        if height > self.max_height or width > self.max_width or len(box_mapping) > self.max_boxes:
+            raise ValueError(
+                f"A {height}x{width} room with {len(box_mapping)} boxes does not fit in records of "
+                f"{self.max_height}x{self.max_width} rooms with up to {self.max_boxes} boxes"
+            )
+        record = np.zeros(1, dtype=self.dtype)[0]
+        record["height"], record["width"], record["num_boxes"] = height, width, len(box_mapping)
+        record["difficulty"] = difficulty
+        record["room_fixed"][:height, :width] = room_fixed
+        record["room_state"][:height, :width] = room_state
+        for row, (target, box) in enumerate(box_mapping.items()):
+            record["box_mapping"][row] = (target[0], target[1], box[0], box[1])
+        self._file.write(record.tobytes())
+        self.num_added += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class LevelBank:
+    """
+    Read-only, memory-mapped view of a level bank file.
+    """
+
+    def __init__(self, path: str) -> None:
+        header = _read_header(path)
+        self.path = path
+        self.max_height = int(header["max_height"])
+        self.max_width = int(header["max_width"])
+        self.max_boxes = int(header["max_boxes"])
+        dtype = record_dtype(self.max_height, self.max_width, self.max_boxes)
+        num_levels = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+        if num_levels > 0:
+            self.records = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(num_levels,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+        self._order = None
+        self._sorted_keys = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def load(self, index: int) -> Tuple[np.ndarray, np.ndarray, Dict[tuple, tuple], int]:
+        """
+        Return the room_fixed, room_state, box mapping and difficulty of a level.
+
+        Raises:
+            IndexError: If there is no level with that index.
+        """
+        if not 0 <= index < len(self.records):
+            raise IndexError(f"Level index {index} is out of range for a bank of {len(self.records)} levels")
+        record = self.records[index]
+        height, width = int(record["height"]), int(record["width"])
+        room_fixed = np.array(record["room_fixed"][:height, :width], dtype=np.int8)
+        room_state = np.array(record["room_state"][:height, :width], dtype=np.int8)
+        box_mapping = {
+            (target_row, target_col): (box_row, box_col)
+            for target_row, target_col, box_row, box_col in record["box_mapping"][:int(record["num_boxes"])].tolist()
+        }
+        return room_fixed, room_state, box_mapping, int(record["difficulty"])
+
+    def _build_index(self):
+        # Sort all levels once by (height, width, num_boxes, difficulty), so that the levels of any
+        # size, box count and difficulty range are one contiguous slice of the order
+        keys = level_key(self.records["height"], self.records["width"], self.records["num_boxes"], self.records["difficulty"])
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+
+    def indices(self, dim: Sequence[int], num_boxes: int, difficulty: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Return the indices of the levels of a room size and box count, optionally within an inclusive
+        difficulty range [low, high] (or of exactly one difficulty, if an int is given).
+        """
+        if self._order is None:
+            self._build_index()
+        low, high = 0, 2 ** 32 - 1
+        if difficulty is not None:
+            low, high = (difficulty, difficulty) if isinstance(difficulty, (int, np.integer)) else difficulty
+            low, high = max(int(low), 0), min(int(high), 2 ** 32 - 1)
+        start = np.searchsorted(self._sorted_keys, level_key(dim[0], dim[1], num_boxes, low), side="left")
+        stop = np.searchsorted(self._sorted_keys, level_key(dim[0], dim[1], num_boxes, high), side="right")
+        return self._order[start:stop]
+
+    def sample(self, rng: np.random.Generator, dim: Sequence[int], num_boxes: int, difficulty: Optional[Iterable[int]] = None) -> int:
+        """
+        Draw the index of a level of a room size and box count, optionally within a difficulty range.
+
+        Raises:
+            ValueError: If the bank has no such level.
+        """
+        candidates = self.indices(dim, num_boxes, difficulty)
+        if len(candidates) == 0:
+            raise ValueError(
+                f"{self.path} has no {dim[0]}x{dim[1]} level with {num_boxes} boxes"
+                + (f" and difficulty in {difficulty}" if difficulty is not None else "")
+            )
+        return int(candidates[rng.integers(len(candidates))])
+
+    def difficulty_counts(self, dim: Sequence[int], num_boxes: int) -> Dict[int, int]:
+        """
+        Return the number of levels of each difficulty for a room size and box count.
+        """
+        values, counts = np.unique(self.records["difficulty"][self.indices(dim, num_boxes)], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+
+_open_banks: Dict[str, LevelBank] = {}
+
+
+def open_level_bank(path: str) -> LevelBank:
+    """
+    Return the `LevelBank` of a file, shared by all environments of the process.
+    """
+    path = os.path.abspath(path)
+    bank = _open_banks.get(path)
+    if bank is None:
+        bank = _open_banks[path] = LevelBank(path)
+    return bank
+
+
+def _generate_levels(args):
+    from verl_agent_env.envs.sokoban.room_utils import generate_rooms
+
+    seed, num_levels, dim, num_boxes, num_gen_steps = args
+    rng = np.random.default_rng(seed)
+    while True:
+        try:
+            rooms = generate_rooms(num_levels, dim=dim, num_steps=num_gen_steps, num_boxes=num_boxes, rng=rng)
+            break
+        except (RuntimeError, RuntimeWarning):
+            continue
+    return [
+        (room_fixed, room_state, {tuple(int(x) for x in target): tuple(int(x) for x in box) for target, box in box_mapping.items()})
+        for room_fixed, room_state, box_mapping in rooms
+    ]
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+    from verl_agent_env.envs.sokoban.level_hash import LevelDedupIndex
+
+    parser = argparse.ArgumentParser(description="Generate Sokoban levels into a level bank")
+    parser.add_argument("--output", required=True, help="Bank file, appended to if it exists")
+    parser.add_argument("--num-levels", type=int, default=1000)
+    parser.add_argument("--dim", type=int, nargs=2, default=[10, 10])
+    parser.add_argument("--num-boxes", type=int, default=4)
+    parser.add_argument("--num-gen-steps", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first chunk of levels, the others follow")
+    parser.add_argument("--max-dim", type=int, nargs=2, default=None, help="Record size, defaults to --dim")
+    parser.add_argument("--max-boxes", type=int, default=None, help="Record box capacity, defaults to --num-boxes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--dedup", action="store_true",
+                        help="Skip levels that repeat a level of the bank up to symmetry, see level_hash.py")
+    args = parser.parse_args()
+
+    dim = tuple(args.dim)
+    num_gen_steps = args.num_gen_steps or int(1.7 * (dim[0] + dim[1]))
+    max_height, max_width = args.max_dim or dim
+    # Every job generates a chunk of levels in bulk, from its own seed
+    chunk_size = 64
+    jobs = [
+        (args.seed + i, min(chunk_size, args.num_levels - start), dim, args.num_boxes, num_gen_steps)
+        for i, start in enumerate(range(0, args.num_levels, chunk_size))
+    ]
+    dedup_index = None
+    if args.dedup:
+        dedup_index = LevelDedupIndex()
+        if os.path.exists(args.output):
+            existing = LevelBank(args.output)
+            for index in range(len(existing)):
+                dedup_index.add_level(*existing.load(index)[:2])
+    num_duplicates = 0
+    with LevelBankWriter(args.output, max_height, max_width, args.max_boxes or args.num_boxes) as writer, \
+            ProcessPoolExecutor(args.workers) as pool:
+        for levels in pool.map(_generate_levels, jobs):
+            for room_fixed, room_state, box_mapping in levels:
+                if dedup_index is not None and not dedup_index.add_level(room_fixed, room_state):
+                    num_duplicates += 1
+                    continue
+                writer.add(room_fixed, room_state, box_mapping, difficulty=box_displacement(box_mapping))
+    if dedup_index is not None:
+        print(f"[SOKOBAN] Skipped {num_duplicates} duplicate levels")
+    bank = LevelBank(args.output)
+    print(f"[SOKOBAN] {args.output} holds {len(bank)} levels")
+    print(f"[SOKOBAN] Levels per difficulty of {dim[0]}x{dim[1]} rooms with {args.num_boxes} boxes: "
+          f"{bank.difficulty_counts(dim, args.num_boxes)}")
@@ -0,0 +1,139 @@
+"""
+Canonical hashing and deduplication of Sokoban levels.
+
+Generated rooms repeat, especially small ones, often as mirrored or rotated copies. Two levels are
+the same puzzle if one maps onto the other under one of the eight symmetries of the grid, and the
+player stands anywhere in the same region it can walk to without pushing. `canonical_level_hash`
+gives all of them the same hash:
+
+    - the room is cropped to the bounding box of its non-wall cells, so extra outer walls do not count,
+    - the player is replaced by its reachable region, represented by its first cell,
+    - the smallest encoding over the eight symmetries is hashed.
+
+`LevelDedupIndex` is a streaming set of these hashes, optionally persisted to a file, to drop
+duplicates during bulk generation and to keep evaluation sets disjoint from training sets.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+# Cell codes of the canonical encoding
+WALL, FLOOR, TARGET, BOX_ON_TARGET, BOX = 0, 1, 2, 3, 4
+
+
+def _reachable_region(free: np.ndarray, player: tuple) -> np.ndarray:
+    """
+    Return the mask of the cells reachable from the player through free cells.
+    """
+    region = np.zeros_like(free)
+    region[player] = True
+    while True:
+        grown = region.copy()
+        grown[1:] |= region[:-1]
+        grown[:-1] |= region[1:]
+        grown[:, 1:] |= region[:, :-1]
+        grown[:, :-1] |= region[:, 1:]
+        grown &= free
+        if (grown == region).all():
+            return region
+        region = grown
+
+
+def canonical_level_hash(room_fixed: np.ndarray, room_state: np.ndarray) -> str:
+    """
+    Return a hash of a level that is the same for all symmetric copies of it and for all player
+    positions within the same reachable region.
+
+    Args:
+        room_fixed (np.ndarray): Walls (0), floors (1) and targets (2) of the room.
+        room_state (np.ndarray): Current state of the room, with boxes (3, 4) and the player (5).
+
+    Returns:
+        str: 32 hexadecimal digits.
+    """
+    room_fixed = np.asarray(room_fixed)
+    room_state = np.asarray(room_state)
+    boxes = (room_state == 3) | (room_state == 4)
+    cells = np.full(room_fixed.shape, FLOOR, dtype=np.uint8)
+    cells[room_fixed == 0] = WALL
+    cells[room_fixed == 2] = TARGET
+    cells[boxes & (room_fixed == 2)] = BOX_ON_TARGET
+    cells[boxes & (room_fixed != 2)] = BOX
+    player = tuple(np.argwhere(room_state == 5)[0])
+    region = _reachable_region((room_fixed != 0) & ~boxes, player)
+
+    rows = np.flatnonzero((room_fixed != 0).any(axis=1))
+    cols = np.flatnonzero((room_fixed != 0).any(axis=0))
+    cells = cells[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    region = region[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+    encodings = []
+    for flip in (False, True):
+        for turns in range(4):
+            cells_view = np.rot90(np.fliplr(cells) if flip else cells, turns)
+            region_view = np.rot90(np.fliplr(region) if flip else region, turns)
+            header = np.array([*cells_view.shape, np.flatnonzero(region_view)[0]], dtype=np.uint32)
+            encodings.append(header.tobytes() + np.ascontiguousarray(cells_view).tobytes())
+    return hashlib.blake2b(min(encodings), digest_size=16).hexdigest()
+
+
+class LevelDedupIndex:
+    """
+    Streaming set of canonical level hashes, see `canonical_level_hash`. With a path, the hashes
+    of earlier runs are loaded from the file and new ones are appended to it, one per line.
+
+        index = LevelDedupIndex("levels.hashes")
+        if index.add_level(env.room_fixed, env.room_state):
+            ...  # a new puzzle
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._hashes = set()
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            if os.path.exists(path):
+                with open(path) as f:
+                    self._hashes.update(line.strip() for line in f if line.strip())
+            self._file = open(path, "a")
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, level_hash: str) -> bool:
+        return level_hash in self._hashes
+
+    def add(self, level_hash: str) -> bool:
+        """
+        Add a level hash. Returns whether it was new.
+        """
+        with self._lock:
+            if level_hash in self._hashes:
+                return False
+            self._hashes.add(level_hash)
+            if self._file is not None:
+                self._file.write(level_hash + "\n")
+                self._file.flush()
+            return True
+
+    def add_level(self, room_fixed: np.ndarray, room_state: np.ndarray) -> bool:
+        """
+        Add a level by its canonical hash. Returns whether it was new.
+        """
+        return self.add(canonical_level_hash(room_fixed, room_state))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "LevelDedupIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
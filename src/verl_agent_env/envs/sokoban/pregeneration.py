@@ -0,0 +1,174 @@
+"""
+Background pre-generation of Sokoban rooms.
+
+Generating a room inline makes `SokobanEnv.reset` slow and heavy-tailed, since a room without a
+solvable layout is thrown away and generated again. With pre-generation enabled, a process pool
+keeps a bounded queue of ready rooms for every room configuration (`dim_room`, `num_boxes`,
+`num_gen_steps`) that environments were reset with, and unseeded resets take a room from the queue.
+A reset only generates inline when the queue of its configuration is empty. Seeded resets use the
+room of their seed instead, see `room_cache.py`.
+
+Enable it with `configure_pregeneration(queue_size, max_workers)`, or with the
+VERL_AGENT_ENV_SOKOBAN_PREGENERATE environment variable set to `queue_size[:max_workers]`.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+from verl_agent_env.envs.sokoban.room_utils import generate_room
+
+# Number of consecutive failed generations after which a configuration is only refilled on demand
+MAX_CONSECUTIVE_FAILURES = 10
+
+pregeneration_config = {
+    # Number of rooms kept ready per room configuration, 0 disables pre-generation
+    "queue_size": 0,
+    # Number of generator processes, defaults to the number of CPUs
+    "max_workers": None,
+}
+pregeneration_stats = {"hits": 0, "misses": 0, "generated": 0, "failures": 0}
+
+# Reentrant, as futures that are already done run their callbacks in the submitting thread
+_lock = threading.RLock()
+_pool: Optional[ProcessPoolExecutor] = None
+_queues: Dict[tuple, Deque[tuple]] = {}
+_in_flight: Dict[tuple, int] = {}
+_consecutive_failures: Dict[tuple, int] = {}
+
+
+def configure_pregeneration(queue_size: int = 0, max_workers: Optional[int] = None):
+    """
+    Configure the pre-generation of Sokoban rooms. Queued rooms of an earlier configuration are dropped.
+
+    Args:
+        queue_size (int): Number of rooms kept ready per room configuration. 0 disables pre-generation.
+        max_workers (Optional[int]): Number of generator processes. Defaults to the number of CPUs.
+    """
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        pregeneration_config["queue_size"] = queue_size
+        pregeneration_config["max_workers"] = max_workers
+        _queues.clear()
+        _in_flight.clear()
+        _consecutive_failures.clear()
+        for key in pregeneration_stats:
+            pregeneration_stats[key] = 0
+
+
+def configure_pregeneration_from_env():
+    """
+    Configure pre-generation from the VERL_AGENT_ENV_SOKOBAN_PREGENERATE environment variable,
+    `queue_size[:max_workers]`, e.g. `256:8`.
+    """
+    spec = os.environ.get("VERL_AGENT_ENV_SOKOBAN_PREGENERATE")
+    if not spec:
+        return
+    queue_size, _, max_workers = spec.partition(":")
+    configure_pregeneration(int(queue_size), int(max_workers) if max_workers else None)
+
+configure_pregeneration_from_env()
+
+
+def _generate(room_config: tuple, seed: int) -> Optional[tuple]:
+    """
+    Generate one room in a worker process. Returns None if `generate_room` failed.
+    """
+    dim_room, num_boxes, num_gen_steps = room_config
+    # Forked workers start with the random state of the server, so every room gets its own seed
+    try:
+        return generate_room(dim=dim_room, num_steps=num_gen_steps, num_boxes=num_boxes, rng=np.random.default_rng(seed))
+    except (RuntimeError, RuntimeWarning):
+        return None
+
+
+def _refill(room_config: tuple):
+    """
+    Submit generation jobs until the queued and in-flight rooms of a configuration fill its queue.
+    Must be called with the lock held.
+    """
+    global _pool
+    if _consecutive_failures.get(room_config, 0) >= MAX_CONSECUTIVE_FAILURES:
+        return
+    queue = _queues.setdefault(room_config, deque())
+    missing = pregeneration_config["queue_size"] - len(queue) - _in_flight.get(room_config, 0)
+    if missing <= 0:
+        return
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pregeneration_config["max_workers"])
+    pool = _pool
+    for _ in range(missing):
+        try:
+            future = pool.submit(_generate, room_config, int.from_bytes(os.urandom(4), "little"))
+        except RuntimeError:
+            # The pool is shutting down
+            return
+        _in_flight[room_config] = _in_flight.get(room_config, 0) + 1
+        future.add_done_callback(lambda future: _on_generated(room_config, pool, future))
+
+
+def _on_generated(room_config: tuple, pool: ProcessPoolExecutor, future: Future):
+    with _lock:
+        if pool is not _pool or future.cancelled():
+            # Left over from an earlier configuration
+            return
+        _in_flight[room_config] -= 1
+        room = future.result() if future.exception() is None else None
+        if room is None:
+            pregeneration_stats["failures"] += 1
+            _consecutive_failures[room_config] = _consecutive_failures.get(room_config, 0) + 1
+        else:
+            pregeneration_stats["generated"] += 1
+            _consecutive_failures[room_config] = 0
+            _queues[room_config].append(room)
+        _refill(room_config)
+
+
+def pop_room(dim_room: Tuple[int, int], num_boxes: int, num_gen_steps: int) -> Optional[tuple]:
+    """
+    Take a pre-generated room of a configuration, and start generating its replacement.
+
+    Returns:
+        Optional[tuple]: The (room_fixed, room_state, box_mapping) of `generate_room`, or None if
+            pre-generation is disabled or the queue of the configuration is empty.
+    """
+    if pregeneration_config["queue_size"] <= 0:
+        return None
+    room_config = (tuple(dim_room), num_boxes, num_gen_steps)
+    with _lock:
+        queue = _queues.get(room_config)
+        room = queue.popleft() if queue else None
+        pregeneration_stats["hits" if room is not None else "misses"] += 1
+        # A pop on demand retries configurations that kept failing
+        _consecutive_failures.pop(room_config, None)
+        _refill(room_config)
+    return room
+
+
+def get_pregeneration_stats() -> dict:
+    """
+    Return the queue depth of every room configuration, the hit rate of resets and the failure rate
+    of background generations.
+    """
+    with _lock:
+        pops = pregeneration_stats["hits"] + pregeneration_stats["misses"]
+        attempts = pregeneration_stats["generated"] + pregeneration_stats["failures"]
+        return {
+            "queue_size": pregeneration_config["queue_size"],
+            "queues": {
+                f"{dim_room[0]}x{dim_room[1]}/{num_boxes}/{num_gen_steps}": {
+                    "depth": len(queue),
+                    "in_flight": _in_flight.get((dim_room, num_boxes, num_gen_steps), 0),
+                }
+                for (dim_room, num_boxes, num_gen_steps), queue in _queues.items()
+            },
+            **pregeneration_stats,
+            "hit_rate": pregeneration_stats["hits"] / pops if pops else None,
+            "failure_rate": pregeneration_stats["failures"] / attempts if attempts else None,
+        }
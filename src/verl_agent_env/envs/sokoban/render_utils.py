@@ -1,147 +1,140 @@
+import functools
+
 import numpy as np
 import pkg_resources
 import imageio
 
 
-def room_to_rgb(room, room_structure=None):
-    """
-    Creates an RGB image of the room.
-    :param room:
-    :param room_structure:
-    :return:
-    """
-    resource_package = __name__
-
-    room = np.array(room)
-    if not room_structure is None:
-        # Change the ID of a player on a target
-        room[(room == 5) & (room_structure == 2)] = 6
-
-    # Load images, representing the corresponding situation
-    box_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'box.png')))
-    box = imageio.imread(box_filename)
-
-    box_on_target_filename = pkg_resources.resource_filename(resource_package,
-                                                             '/'.join(('surface', 'box_on_target.png')))
-    box_on_target = imageio.imread(box_on_target_filename)
-
-    box_target_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'box_target.png')))
-    box_target = imageio.imread(box_target_filename)
-
-    floor_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'floor.png')))
-    floor = imageio.imread(floor_filename)
+# Surface IDs of room values, plus 6 for a player on a target
+SURFACE_NAMES = ('wall', 'floor', 'box_target', 'box_on_target', 'box', 'player', 'player_on_target')
 
-    player_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'player.png')))
-    player = imageio.imread(player_filename)
+# Colors of the surfaces in the tiny world rendering, in the order of SURFACE_NAMES
+TINY_WORLD_COLORS = np.array([
+    [0, 0, 0],
+    [243, 248, 238],
+    [254, 126, 125],
+    [254, 95, 56],
+    [142, 121, 56],
+    [160, 212, 56],
+    [219, 212, 56],
+], dtype=np.uint8)
 
-    player_on_target_filename = pkg_resources.resource_filename(resource_package,
-                                                                '/'.join(('surface', 'player_on_target.png')))
-    player_on_target = imageio.imread(player_on_target_filename)
 
-    wall_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'wall.png')))
-    wall = imageio.imread(wall_filename)
-
-    surfaces = [wall, floor, box_target, box_on_target, box, player, player_on_target]
-
-    # Assemble the new rgb_room, with all loaded images
-    room_rgb = np.zeros(shape=(room.shape[0] * 16, room.shape[1] * 16, 3), dtype=np.uint8)
-    for i in range(room.shape[0]):
-        x_i = i * 16
+@functools.lru_cache(maxsize=None)
+def load_surface(*path: str) -> np.ndarray:
+    """
+    Load a surface image of the package once, e.g. `load_surface('surface', 'box.png')`.
+    The returned array is shared and read-only.
+    """
+    filename = pkg_resources.resource_filename(__name__, '/'.join(path))
+    surface = np.asarray(imageio.imread(filename))
+    surface.setflags(write=False)
+    return surface
 
-        for j in range(room.shape[1]):
-            y_j = j * 16
-            surfaces_id = room[i, j]
 
-            room_rgb[x_i:(x_i + 16), y_j:(y_j + 16), :] = surfaces[surfaces_id]
+@functools.lru_cache(maxsize=None)
+def sprite_atlas() -> np.ndarray:
+    """
+    Return the 16x16 surfaces of SURFACE_NAMES stacked into one read-only (7, 16, 16, 3) atlas.
+    """
+    atlas = np.stack([load_surface('surface', name + '.png') for name in SURFACE_NAMES])
+    atlas.setflags(write=False)
+    return atlas
 
-    return room_rgb
 
+@functools.lru_cache(maxsize=None)
+def tiny_world_atlas(scale: int) -> np.ndarray:
+    """
+    Return the tiny world colors as a (7, scale, scale, 3) atlas of flat tiles.
+    """
+    atlas = np.ascontiguousarray(np.broadcast_to(TINY_WORLD_COLORS[:, None, None, :], (len(SURFACE_NAMES), scale, scale, 3)))
+    atlas.setflags(write=False)
+    return atlas
 
-def room_to_tiny_world_rgb(room, room_structure=None, scale=1):
 
+def surface_ids(room, room_structure=None) -> np.ndarray:
+    """
+    Return the surface IDs of a room, or of a batch of rooms with leading dimensions: the room
+    values, with players on targets changed to 6.
+    """
     room = np.array(room)
     if not room_structure is None:
         # Change the ID of a player on a target
-        room[(room == 5) & (room_structure == 2)] = 6
-
-    wall = [0, 0, 0]
-    floor = [243, 248, 238]
-    box_target = [254, 126, 125]
-    box_on_target = [254, 95, 56]
-    box = [142, 121, 56]
-    player = [160, 212, 56]
-    player_on_target = [219, 212, 56]
-
-    surfaces = [wall, floor, box_target, box_on_target, box, player, player_on_target]
-
-    # Assemble the new rgb_room, with all loaded images
-    room_small_rgb = np.zeros(shape=(room.shape[0]*scale, room.shape[1]*scale, 3), dtype=np.uint8)
-    for i in range(room.shape[0]):
-        x_i = i * scale
-        for j in range(room.shape[1]):
-            y_j = j * scale
-            surfaces_id = int(room[i, j])
-            room_small_rgb[x_i:(x_i+scale), y_j:(y_j+scale), :] = np.array(surfaces[surfaces_id])
+        room[(room == 5) & (np.asarray(room_structure) == 2)] = 6
+    return room
 
-    return room_small_rgb
 
+def tile_rooms(surface_ids, atlas: np.ndarray) -> np.ndarray:
+    """
+    Assemble images from the tiles of an atlas with one gather.
+
+    Args:
+        surface_ids: Surface IDs of shape (..., height, width).
+        atlas (np.ndarray): Tiles of shape (num_surfaces, tile_height, tile_width, 3).
 
-def room_to_rgb_FT(room, box_mapping, room_structure=None):
+    Returns:
+        np.ndarray: Images of shape (..., height * tile_height, width * tile_width, 3).
+    """
+    surface_ids = np.asarray(surface_ids)
+    *batch, height, width = surface_ids.shape
+    _, tile_height, tile_width, channels = atlas.shape
+    # (..., height, width, tile_height, tile_width, 3) -> (..., height, tile_height, width, tile_width, 3)
+    tiles = np.swapaxes(atlas[surface_ids], -4, -3)
+    return tiles.reshape(*batch, height * tile_height, width * tile_width, channels)
+
+
+def room_to_rgb(room, room_structure=None):
     """
     Creates an RGB image of the room.
     :param room:
     :param room_structure:
     :return:
     """
-    resource_package = __name__
-
-    room = np.array(room)
-    if not room_structure is None:
-        # Change the ID of a player on a target
-        room[(room == 5) & (room_structure == 2)] = 6
-
-    # Load images, representing the corresponding situation
-    box_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'box.png')))
-    box = imageio.imread(box_filename)
-
-    box_on_target_filename = pkg_resources.resource_filename(resource_package,
-                                                             '/'.join(('surface', 'box_on_target.png')))
-    box_on_target = imageio.imread(box_on_target_filename)
+    return tile_rooms(surface_ids(room, room_structure), sprite_atlas())
 
-    box_target_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'box_target.png')))
-    box_target = imageio.imread(box_target_filename)
 
-    floor_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'floor.png')))
-    floor = imageio.imread(floor_filename)
+def rooms_to_rgb(rooms, room_structures=None):
+    """
+    Creates the RGB images of a batch of rooms of the same size at once.
+    :param rooms: Rooms of shape (batch, height, width)
+    :param room_structures: The room_fixed of every room, of the same shape
+    :return: Images of shape (batch, height * 16, width * 16, 3)
+    """
+    return tile_rooms(surface_ids(rooms, room_structures), sprite_atlas())
 
-    player_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'player.png')))
-    player = imageio.imread(player_filename)
 
-    player_on_target_filename = pkg_resources.resource_filename(resource_package,
-                                                                '/'.join(('surface', 'player_on_target.png')))
-    player_on_target = imageio.imread(player_on_target_filename)
+def room_to_tiny_world_rgb(room, room_structure=None, scale=1):
+    return tile_rooms(surface_ids(room, room_structure), tiny_world_atlas(scale))
 
-    wall_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'wall.png')))
-    wall = imageio.imread(wall_filename)
 
-    surfaces = [wall, floor, box_target, box_on_target, box, player, player_on_target]
+def rooms_to_tiny_world_rgb(rooms, room_structures=None, scale=1):
+    """
+    Creates the tiny world images of a batch of rooms of the same size at once.
+    :param rooms: Rooms of shape (batch, height, width)
+    :param room_structures: The room_fixed of every room, of the same shape
+    :param scale: Size of a cell in pixels
+    :return: Images of shape (batch, height * scale, width * scale, 3)
+    """
+    return tile_rooms(surface_ids(rooms, room_structures), tiny_world_atlas(scale))
 
-    # Assemble the new rgb_room, with all loaded images
-    room_rgb = np.zeros(shape=(room.shape[0] * 16, room.shape[1] * 16, 3), dtype=np.uint8)
-    for i in range(room.shape[0]):
-        x_i = i * 16
 
-        for j in range(room.shape[1]):
-            y_j = j * 16
+def room_to_rgb_FT(room, box_mapping, room_structure=None):
+    """
+    Creates an RGB image of the room.
+    :param room:
+    :param room_structure:
+    :return:
+    """
+    room = surface_ids(room, room_structure)
+    room_rgb = tile_rooms(room, sprite_atlas())
 
-            surfaces_id = room[i, j]
-            surface = surfaces[surfaces_id]
-            if 1 < surfaces_id < 5:
-                try:
-                    surface = get_proper_box_surface(surfaces_id, box_mapping, i, j)
-                except:
-                    pass
-            room_rgb[x_i:(x_i + 16), y_j:(y_j + 16), :] = surface
+    # Boxes and targets get the surface of their box
+    for i, j in np.argwhere((room > 1) & (room < 5)).tolist():
+        try:
+            surface = get_proper_box_surface(room[i, j], box_mapping, i, j)
+        except:
+            continue
+        room_rgb[i * 16:(i + 1) * 16, j * 16:(j + 1) * 16, :] = surface
 
     return room_rgb
 
@@ -168,46 +161,22 @@ def get_proper_box_surface(surfaces_id, box_mapping, i, j):
         box_id = list(box_mapping.values()).index((i, j))
 
     surface_name = 'box{}{}.png'.format(box_id, situation)
-    resource_package = __name__
-    filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'multibox', surface_name)))
-    surface = imageio.imread(filename)
-
-    return surface
+    return load_surface('surface', 'multibox', surface_name)
 
 
 def room_to_tiny_world_rgb_FT(room, box_mapping, room_structure=None, scale=1):
-        room = np.array(room)
-        if not room_structure is None:
-            # Change the ID of a player on a target
-            room[(room == 5) & (room_structure == 2)] = 6
-
-        wall = [0, 0, 0]
-        floor = [243, 248, 238]
-        box_target = [254, 126, 125]
-        box_on_target = [254, 95, 56]
-        box = [142, 121, 56]
-        player = [160, 212, 56]
-        player_on_target = [219, 212, 56]
-
-        surfaces = [wall, floor, box_target, box_on_target, box, player, player_on_target]
-
-        # Assemble the new rgb_room, with all loaded images
-        room_small_rgb = np.zeros(shape=(room.shape[0] * scale, room.shape[1] * scale, 3), dtype=np.uint8)
-        for i in range(room.shape[0]):
-            x_i = i * scale
-            for j in range(room.shape[1]):
-                y_j = j * scale
-
-                surfaces_id = int(room[i, j])
-                surface = np.array(surfaces[surfaces_id])
-                if 1 < surfaces_id < 5:
-                    try:
-                        surface = get_proper_tiny_box_surface(surfaces_id, box_mapping, i, j)
-                    except:
-                        pass
-                room_small_rgb[x_i:(x_i + scale), y_j:(y_j + scale), :] = surface
-
-        return room_small_rgb
+    room = surface_ids(room, room_structure)
+    room_small_rgb = tile_rooms(room, tiny_world_atlas(scale))
+
+    # Boxes and targets get the color of their box
+    for i, j in np.argwhere((room > 1) & (room < 5)).tolist():
+        try:
+            surface = get_proper_tiny_box_surface(room[i, j], box_mapping, i, j)
+        except:
+            continue
+        room_small_rgb[i * scale:(i + 1) * scale, j * scale:(j + 1) * scale, :] = surface
+
+    return room_small_rgb
 
 
 def get_proper_tiny_box_surface(surfaces_id, box_mapping, i, j):
@@ -275,14 +244,8 @@ def get_proper_tiny_box_surface(surfaces_id, box_mapping, i, j):
 
 
 def color_player_two(room_rgb, position, room_structure):
-    resource_package = __name__
-
-    player_filename = pkg_resources.resource_filename(resource_package, '/'.join(('surface', 'multiplayer', 'player1.png')))
-    player = imageio.imread(player_filename)
-
-    player_on_target_filename = pkg_resources.resource_filename(resource_package,
-                                                                '/'.join(('surface', 'multiplayer', 'player1_on_target.png')))
-    player_on_target = imageio.imread(player_on_target_filename)
+    player = load_surface('surface', 'multiplayer', 'player1.png')
+    player_on_target = load_surface('surface', 'multiplayer', 'player1_on_target.png')
 
     x_i = position[0] * 16
     y_j = position[1] * 16
@@ -0,0 +1,163 @@
+"""
+Cache of seeded Sokoban rooms.
+
+A room generated from a seed is a pure function of `(seed, dim_room, num_boxes, num_gen_steps)`
+(and of `second_player`), since the whole generation draws from one `np.random.Generator` seeded
+with it. Datasets can therefore carry seeds instead of rooms, and `SokobanEnv.reset(seed=...)`
+looks the room up here first: an in-memory LRU cache of the most recent rooms, backed by an
+optional directory of `.npz` files that worker processes and later runs share.
+
+Configure it with `configure_room_cache(max_size, directory)`, or with the environment variables
+VERL_AGENT_ENV_SOKOBAN_ROOM_CACHE_SIZE and VERL_AGENT_ENV_SOKOBAN_ROOM_CACHE_DIR.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from verl_agent_env.envs.sokoban.room_utils import generate_room
+
+# Part of the cache file names, to be increased whenever the rooms of a seed change
+GENERATOR_VERSION = 1
+
+room_cache_config = {
+    # Number of rooms kept in memory, 0 disables the in-memory cache
+    "max_size": 4096,
+    # Directory of the on-disk cache, None disables it
+    "directory": None,
+}
+room_cache_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+_lock = threading.Lock()
+_rooms: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+def configure_room_cache(max_size: int = 4096, directory: Optional[str] = None):
+    """
+    Configure the cache of seeded rooms. Rooms cached in memory are dropped.
+
+    Args:
+        max_size (int): Number of rooms kept in memory. 0 disables the in-memory cache.
+        directory (Optional[str]): Directory of the on-disk cache, created if missing. None disables it.
+    """
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    with _lock:
+        room_cache_config["max_size"] = max_size
+        room_cache_config["directory"] = directory
+        _rooms.clear()
+        for key in room_cache_stats:
+            room_cache_stats[key] = 0
+
+
+def configure_room_cache_from_env():
+    """
+    Configure the cache from the VERL_AGENT_ENV_SOKOBAN_ROOM_CACHE_SIZE and
+    VERL_AGENT_ENV_SOKOBAN_ROOM_CACHE_DIR environment variables.
+    """
+    max_size = os.environ.get("VERL_AGENT_ENV_SOKOBAN_ROOM_CACHE_SIZE")
+    directory = os.environ.get("VERL_AGENT_ENV_SOKOBAN_ROOM_CACHE_DIR")
+    if max_size is None and not directory:
+        return
+    configure_room_cache(int(max_size) if max_size else room_cache_config["max_size"], directory or None)
+
+configure_room_cache_from_env()
+
+
+def _cache_path(directory: str, key: tuple) -> str:
+    seed, (height, width), num_boxes, num_gen_steps, second_player = key
+    name = f"v{GENERATOR_VERSION}_{height}x{width}_{num_boxes}_{num_gen_steps}_{int(second_player)}_{seed}.npz"
+    return os.path.join(directory, name)
+
+
+def _load(path: str) -> Optional[tuple]:
+    try:
+        with np.load(path) as data:
+            room_fixed, room_state, box_mapping = data["room_fixed"], data["room_state"], data["box_mapping"]
+    except (OSError, KeyError, ValueError):
+        return None
+    return room_fixed, room_state, {(int(r), int(c)): (int(br), int(bc)) for r, c, br, bc in box_mapping.tolist()}
+
+
+def _save(path: str, room: tuple):
+    room_fixed, room_state, box_mapping = room
+    box_mapping = np.array([(*target, *box) for target, box in box_mapping.items()], dtype=np.int64).reshape(-1, 4)
+    # Write to a temporary file first, so that concurrent readers never see a partial file
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "wb") as f:
+        np.savez(f, room_fixed=room_fixed, room_state=room_state, box_mapping=box_mapping)
+    os.replace(temporary_path, path)
+
+
+def _generate(seed: int, dim_room: Tuple[int, int], num_boxes: int, num_gen_steps: int, second_player: bool) -> tuple:
+    rng = np.random.default_rng(seed)
+    while True:
+        try:
+            room_fixed, room_state, box_mapping = generate_room(
+                dim=dim_room,
+                num_steps=num_gen_steps,
+                num_boxes=num_boxes,
+                second_player=second_player,
+                rng=rng
+            )
+        except (RuntimeError, RuntimeWarning) as e:
+            # The retry keeps drawing from the same generator, so it is as reproducible as the first try
+            print("[SOKOBAN] Runtime Error/Warning: {}".format(e))
+            print("[SOKOBAN] Retry . . .")
+            continue
+        box_mapping = {tuple(int(x) for x in target): tuple(int(x) for x in box) for target, box in box_mapping.items()}
+        return room_fixed, room_state, box_mapping
+
+
+def seeded_room(seed: int, dim_room: Tuple[int, int], num_boxes: int, num_gen_steps: int, second_player: bool = False) -> tuple:
+    """
+    Return the room of a seed, from the cache if possible.
+
+    Returns:
+        tuple: (room_fixed, room_state, box_mapping) as in `generate_room`, owned by the caller.
+    """
+    key = (int(seed), tuple(int(x) for x in dim_room), num_boxes, num_gen_steps, bool(second_player))
+    with _lock:
+        room = _rooms.get(key)
+        if room is not None:
+            _rooms.move_to_end(key)
+            room_cache_stats["hits"] += 1
+        directory = room_cache_config["directory"]
+
+    if room is None and directory is not None:
+        room = _load(_cache_path(directory, key))
+        if room is not None:
+            with _lock:
+                room_cache_stats["disk_hits"] += 1
+    if room is None:
+        room = _generate(*key)
+        with _lock:
+            room_cache_stats["misses"] += 1
+        if directory is not None:
+            _save(_cache_path(directory, key), room)
+
+    with _lock:
+        if room_cache_config["max_size"] > 0:
+            _rooms[key] = room
+            _rooms.move_to_end(key)
+            while len(_rooms) > room_cache_config["max_size"]:
+                _rooms.popitem(last=False)
+
+    room_fixed, room_state, box_mapping = room
+    return room_fixed.copy(), room_state.copy(), dict(box_mapping)
+
+
+def get_room_cache_stats() -> dict:
+    """
+    Return the size and the hit rates of the cache of seeded rooms.
+    """
+    with _lock:
+        lookups = sum(room_cache_stats.values())
+        return {
+            **room_cache_config,
+            "size": len(_rooms),
+            **room_cache_stats,
+            "hit_rate": (room_cache_stats["hits"] + room_cache_stats["disk_hits"]) / lookups if lookups else None,
+        }
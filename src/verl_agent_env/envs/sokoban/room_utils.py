@@ -1,9 +1,10 @@
-import random
+from typing import Optional
+
 import numpy as np
-import marshal
 
 
-def generate_room(dim=(13, 13), p_change_directions=0.35, num_steps=25, num_boxes=3, tries=4, second_player=False):
+def generate_room(dim=(13, 13), p_change_directions=0.35, num_steps=25, num_boxes=3, tries=4, second_player=False,
+                  rng: Optional[np.random.Generator] = None, engine="grid"):
     """
     Generates a Sokoban room, represented by an integer matrix. The elements are encoded as follows:
     wall = 0
@@ -16,27 +17,23 @@ def generate_room(dim=(13, 13), p_change_directions=0.35, num_steps=25, num_boxe
     :param dim:
     :param p_change_directions:
     :param num_steps:
+    :param rng: Random number generator drawing the room, a fresh one if None. The room is a pure
+        function of the generator state and the other arguments.
+    :param engine: "grid" or "bitboard", the representation the reverse playing runs on (see
+        bitboard.py). Both give the same room.
     :return: Numpy 2d Array
     """
+    if rng is None:
+        rng = np.random.default_rng()
     room_state = np.zeros(shape=dim)
     room_structure = np.zeros(shape=dim)
 
     # Some times rooms with a score == 0 are the only possibility.
     # In these case, we try another model.
     for t in range(tries):
-        room = room_topology_generation(dim, p_change_directions, num_steps)
-        room = place_boxes_and_player(room, num_boxes=num_boxes, second_player=second_player)
-
-        # Room fixed represents all not movable parts of the room
-        room_structure = np.copy(room)
-        room_structure[room_structure == 5] = 1
-
-        # Room structure represents the current state of the room including movable parts
-        room_state = room.copy()
-        room_state[room_state == 2] = 4
-
-        room_state, score, box_mapping = reverse_playing(room_state, room_structure)
-        room_state[room_state == 3] = 4
+        room = room_topology_generation(dim, p_change_directions, num_steps, rng=rng)
+        room = place_boxes_and_player(room, num_boxes=num_boxes, second_player=second_player, rng=rng)
+        room_structure, room_state, box_mapping, score = _reverse_play_room(room, engine)
 
         if score > 0:
             break
@@ -47,15 +44,77 @@ def generate_room(dim=(13, 13), p_change_directions=0.35, num_steps=25, num_boxe
     return room_structure, room_state, box_mapping
 
 
-def room_topology_generation(dim=(10, 10), p_change_directions=0.35, num_steps=15):
+def generate_rooms(num_rooms, dim=(13, 13), p_change_directions=0.35, num_steps=25, num_boxes=3, tries=4,
+                   second_player=False, rng: Optional[np.random.Generator] = None, engine="grid"):
+    """
+    Generates `num_rooms` Sokoban rooms like `generate_room`, drawing the candidate topologies in bulk
+    with `room_topologies_generation`. Candidates without enough floor for the boxes or with a score
+    of 0 are replaced by new ones.
+
+    :param num_rooms:
+    :param tries: Number of bulk rounds in a row without a new room after which generation gives up.
+    :param rng: Random number generator drawing the rooms, a fresh one if None.
+    :param engine: "grid" or "bitboard", see `generate_room`.
+    :return: A list of (room_structure, room_state, box_mapping) as returned by `generate_room`.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    rooms = []
+    failed_rounds = 0
+    while len(rooms) < num_rooms:
+        num_generated = len(rooms)
+        for room in room_topologies_generation(num_rooms - len(rooms), dim, p_change_directions, num_steps, rng=rng):
+            try:
+                room = place_boxes_and_player(room, num_boxes=num_boxes, second_player=second_player, rng=rng)
+            except RuntimeError:
+                continue
+            room_structure, room_state, box_mapping, score = _reverse_play_room(room, engine)
+            if score > 0:
+                rooms.append((room_structure, room_state, box_mapping))
+
+        failed_rounds = failed_rounds + 1 if len(rooms) == num_generated else 0
+        if failed_rounds >= tries:
+            raise RuntimeWarning('Generated no room with score > 0 in {} rounds'.format(tries))
+
+    return rooms
+
+
+def _reverse_play_room(room, engine="grid"):
+    """
+    Turn a room with boxes on their targets and the player into a puzzle by reverse playing.
+
+    :return: room_structure, room_state, box_mapping and the score of the reverse playing.
+    """
+    # Room fixed represents all not movable parts of the room
+    room_structure = np.copy(room)
+    room_structure[room_structure == 5] = 1
+
+    # Room structure represents the current state of the room including movable parts
+    room_state = room.copy()
+    room_state[room_state == 2] = 4
+
+    if engine == "bitboard":
+        # bitboard.py builds on this module
+        from verl_agent_env.envs.sokoban.bitboard import reverse_playing_bitboard
+        room_state, score, box_mapping = reverse_playing_bitboard(room_state, room_structure)
+    else:
+        room_state, score, box_mapping = reverse_playing(room_state, room_structure)
+    room_state[room_state == 3] = 4
+    return room_structure, room_state, box_mapping, score
+
+
+def room_topology_generation(dim=(10, 10), p_change_directions=0.35, num_steps=15, rng: Optional[np.random.Generator] = None):
     """
     Generate a room topology, which consits of empty floors and walls.
 
     :param dim:
     :param p_change_directions:
     :param num_steps:
+    :param rng: Random number generator, a fresh one if None.
     :return:
     """
+    if rng is None:
+        rng = np.random.default_rng()
     dim_x, dim_y = dim
 
     # The ones in the mask represent all fields which will be set to floors
@@ -91,12 +150,12 @@ def room_topology_generation(dim=(10, 10), p_change_directions=0.35, num_steps=1
 
     # Possible directions during the walk
     directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-    direction = random.sample(directions, 1)[0]
+    direction = directions[rng.integers(len(directions))]
 
     # Starting position of random walk
     position = np.array([
-        random.randint(1, dim_x - 1),
-        random.randint(1, dim_y - 1)]
+        rng.integers(1, dim_x),
+        rng.integers(1, dim_y)]
     )
 
     level = np.zeros(dim, dtype=int)
@@ -104,8 +163,8 @@ def room_topology_generation(dim=(10, 10), p_change_directions=0.35, num_steps=1
     for s in range(num_steps):
 
         # Change direction randomly
-        if random.random() < p_change_directions:
-            direction = random.sample(directions, 1)[0]
+        if rng.random() < p_change_directions:
+            direction = directions[rng.integers(len(directions))]
 
         # Update position
         position = position + direction
@@ -113,7 +172,7 @@ def room_topology_generation(dim=(10, 10), p_change_directions=0.35, num_steps=1
         position[1] = max(min(position[1], dim_y - 2), 1)
 
         # Apply mask
-        mask = random.sample(masks, 1)[0]
+        mask = masks[rng.integers(len(masks))]
         mask_start = position - 1
         level[mask_start[0]:mask_start[0] + 3, mask_start[1]:mask_start[1] + 3] += mask
 
@@ -124,14 +183,89 @@ def room_topology_generation(dim=(10, 10), p_change_directions=0.35, num_steps=1
     return level
 
 
-def place_boxes_and_player(room, num_boxes, second_player):
+# Masks of room_topology_generation as the (row, col) offsets of their floor cells around the walk position
+TOPOLOGY_MASK_OFFSETS = [
+    [(0, -1), (0, 0), (0, 1)],
+    [(-1, 0), (0, 0), (1, 0)],
+    [(0, -1), (0, 0), (1, 0)],
+    [(0, -1), (0, 0), (1, -1), (1, 0)],
+    [(0, 0), (0, 1), (1, 0)],
+]
+
+
+def room_topologies_generation(num_rooms, dim=(10, 10), p_change_directions=0.35, num_steps=15,
+                               rng: Optional[np.random.Generator] = None):
+    """
+    Generate the topologies of `num_rooms` rooms at once, each distributed as in `room_topology_generation`.
+
+    All random draws of the walks are made up front, the walks advance all rooms together, and the
+    masks are scattered into the rooms with one assignment.
+
+    :param num_rooms:
+    :param dim:
+    :param p_change_directions:
+    :param num_steps:
+    :param rng: Random number generator, a fresh one if None.
+    :return: Levels of shape (num_rooms, dim[0], dim[1]) with floors (1) and walls (0).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    dim_x, dim_y = dim
+    directions = np.array([(1, 0), (0, 1), (-1, 0), (0, -1)])
+
+    first_direction = rng.integers(len(directions), size=num_rooms)
+    start = np.stack([rng.integers(1, dim_x, size=num_rooms), rng.integers(1, dim_y, size=num_rooms)], axis=1)
+    change = rng.random((num_rooms, num_steps)) < p_change_directions
+    new_direction = rng.integers(len(directions), size=(num_rooms, num_steps))
+    mask_ids = rng.integers(len(TOPOLOGY_MASK_OFFSETS), size=(num_rooms, num_steps))
+
+    # The direction of a step is the last one drawn up to it, else the first direction
+    steps = np.arange(num_steps)
+    last_change = np.maximum.accumulate(np.where(change, steps, -1), axis=1)
+    step_direction = np.where(
+        last_change >= 0,
+        np.take_along_axis(new_direction, np.maximum(last_change, 0), axis=1),
+        first_direction[:, None]
+    )
+    moves = directions[step_direction]
+
+    # The clamped walk is sequential in the steps, but vectorized over the rooms
+    positions = np.empty((num_rooms, num_steps, 2), dtype=int)
+    position = start
+    low, high = np.array([1, 1]), np.array([dim_x - 2, dim_y - 2])
+    for step in range(num_steps):
+        position = np.clip(position + moves[:, step], low, high)
+        positions[:, step] = position
+
+    # Scatter the floor cells of every mask
+    mask_table = np.zeros((len(TOPOLOGY_MASK_OFFSETS), 4, 2), dtype=int)
+    mask_valid = np.zeros((len(TOPOLOGY_MASK_OFFSETS), 4), dtype=bool)
+    for mask_id, offsets in enumerate(TOPOLOGY_MASK_OFFSETS):
+        mask_table[mask_id, :len(offsets)] = offsets
+        mask_valid[mask_id, :len(offsets)] = True
+    cells = positions[:, :, None, :] + mask_table[mask_ids]
+    valid = mask_valid[mask_ids]
+    rooms = np.broadcast_to(np.arange(num_rooms)[:, None, None], valid.shape)
+    levels = np.zeros((num_rooms, dim_x, dim_y), dtype=int)
+    levels[rooms[valid], cells[..., 0][valid], cells[..., 1][valid]] = 1
+
+    levels[:, :, [0, dim_y - 1]] = 0
+    levels[:, [0, dim_x - 1], :] = 0
+
+    return levels
+
+
+def place_boxes_and_player(room, num_boxes, second_player, rng: Optional[np.random.Generator] = None):
     """
     Places the player and the boxes into the floors in a room.
 
     :param room:
     :param num_boxes:
+    :param rng: Random number generator, a fresh one if None.
     :return:
     """
+    if rng is None:
+        rng = np.random.default_rng()
     # Get all available positions
     possible_positions = np.where(room == 1)
     num_possible_positions = possible_positions[0].shape[0]
@@ -145,12 +279,12 @@ def place_boxes_and_player(room, num_boxes, second_player):
         )
 
     # Place player(s)
-    ind = np.random.randint(num_possible_positions)
+    ind = rng.integers(num_possible_positions)
     player_position = possible_positions[0][ind], possible_positions[1][ind]
     room[player_position] = 5
 
     if second_player:
-        ind = np.random.randint(num_possible_positions)
+        ind = rng.integers(num_possible_positions)
         player_position = possible_positions[0][ind], possible_positions[1][ind]
         room[player_position] = 5
 
@@ -159,102 +293,174 @@ def place_boxes_and_player(room, num_boxes, second_player):
         possible_positions = np.where(room == 1)
         num_possible_positions = possible_positions[0].shape[0]
 
-        ind = np.random.randint(num_possible_positions)
+        ind = rng.integers(num_possible_positions)
         box_position = possible_positions[0][ind], possible_positions[1][ind]
         room[box_position] = 2
 
     return room
 
 
-# Global variables used for reverse playing.
-explored_states = set()
-num_boxes = 0
-best_room_score = -1
-best_room = None
-best_box_mapping = None
+# Seed of the Zobrist keys hashing the reverse playing states. Any fixed seed works.
+ZOBRIST_SEED = 0x5EED
 
 
-def reverse_playing(room_state, room_structure, search_depth=100):
+def reverse_playing(room_state, room_structure, search_depth=100, ttl=300, max_explored_states=300000):
     """
     This function plays Sokoban reverse in a way, such that the player can
     move and pull boxes.
     It ensures a solvable level with all boxes not being placed on a box target.
-    :param room_state:
-    :param room_structure:
-    :param search_depth:
-    :return: 2d array
-    """
-    global explored_states, num_boxes, best_room_score, best_room, best_box_mapping
 
-    # Box_Mapping is used to calculate the box displacement for every box
-    box_mapping = {}
-    box_locations = np.where(room_structure == 2)
-    num_boxes = len(box_locations[0])
-    for l in range(num_boxes):
-        box = (box_locations[0][l], box_locations[1][l])
-        box_mapping[box] = box
+    The search is a depth first search over the 8 reverse actions of ACTION_LOOKUP, in that order,
+    which stops at a depth of `ttl` - 1 or after `max_explored_states` states. A state is only
+    expanded the first time it is reached. The score of a state is the number of pulls on the path
+    to it times the sum of the box displacements, or 0 if a box is still on a target.
 
-    # explored_states globally stores the best room state and score found during search
-    explored_states = set()
-    best_room_score = -1
-    best_box_mapping = box_mapping
-    depth_first_search(room_state, room_structure, box_mapping, box_swaps=0, last_pull=(-1, -1), ttl=300)
+    The search runs iteratively on a flat copy of the room with in-place move and undo, and
+    identifies states by incremental 64-bit Zobrist hashes of the box and player positions. It keeps
+    no global state, so it is safe to call from several threads. The room must be surrounded by walls.
 
-    return best_room, best_room_score, best_box_mapping
-
-
-def depth_first_search(room_state, room_structure, box_mapping, box_swaps=0, last_pull=(-1, -1), ttl=300):
-    """
-    Searches through all possible states of the room.
-    This is a recursive function, which stops if the tll is reduced to 0 or
-    over 1.000.000 states have been explored.
     :param room_state:
     :param room_structure:
-    :param box_mapping:
-    :param box_swaps:
-    :param last_pull:
+    :param search_depth: Unused, kept for compatibility.
     :param ttl:
-    :return:
+    :param max_explored_states:
+    :return: The best room state, its score and its box mapping from box targets to box positions.
     """
-    global explored_states, num_boxes, best_room_score, best_room, best_box_mapping
-
-    ttl -= 1
-    if ttl <= 0 or len(explored_states) >= 300000:
-        return
-
-    state_tohash = marshal.dumps(room_state)
+    height, width = room_structure.shape
+    num_cells = height * width
+    structure = np.asarray(room_structure).astype(int).ravel().tolist()
+    cells = np.asarray(room_state).astype(int).ravel().tolist()
+    player = cells.index(5)
+
+    # Box_Mapping is used to calculate the box displacement for every box. Box k starts on
+    # target k, box_at maps a cell to the box on it.
+    targets = [cell for cell in range(num_cells) if structure[cell] == 2]
+    num_boxes = len(targets)
+    box_positions = list(targets)
+    box_at = [-1] * num_cells
+    for box, target in enumerate(targets):
+        box_at[target] = box
+    displacement = 0
+    empty_targets = cells.count(2)
+
+    # Zobrist keys of a pulled box (3), an unmoved box (4) and the player (5) on every cell
+    keys = np.random.default_rng(ZOBRIST_SEED).integers(0, 2 ** 63, size=(3, num_cells), dtype=np.int64).tolist()
+    keys = {3: keys[0], 4: keys[1], 5: keys[2]}
+    state_hash = 0
+    for cell, value in enumerate(cells):
+        if value in keys:
+            state_hash ^= keys[value][cell]
+
+    offsets = [CHANGE_COORDINATES[action % 4][0] * width + CHANGE_COORDINATES[action % 4][1] for action in ACTION_LOOKUP]
+    num_actions = len(offsets)
+    rows = [cell // width for cell in range(num_cells)]
+    cols = [cell % width for cell in range(num_cells)]
 
-    # Only search this state, if it not yet has been explored
-    if not (state_tohash in explored_states):
-
-        # Add current state and its score to explored states
-        room_score = box_swaps * box_displacement_score(box_mapping)
-        if np.where(room_state == 2)[0].shape[0] != num_boxes:
-            room_score = 0
-
-        if room_score > best_room_score:
-            best_room = room_state
-            best_room_score = room_score
-            best_box_mapping = box_mapping
-
-        explored_states.add(state_tohash)
-
-        for action in ACTION_LOOKUP.keys():
-            # The state and box mapping  need to be copied to ensure
-            # every action start from a similar state.
-            room_state_next = room_state.copy()
-            box_mapping_next = box_mapping.copy()
+    explored_states = set()
+    best_room_score = -1
+    best_cells = None
+    best_box_positions = None
 
-            room_state_next, box_mapping_next, last_pull_next = \
-                reverse_move(room_state_next, room_structure, box_mapping_next, last_pull, action)
+    ttl -= 1
+    if ttl <= 0 or max_explored_states <= 0:
+        return None, best_room_score, {}
+    # Every frame holds the next action to try, the ttl and box swaps of its state, and the undo
+    # record of the move that led to it. The root state is scored like any other state.
+    frames = [[0, ttl, 0, None]]
+    box_swaps = 0
+    while True:
+        if box_swaps is not None:
+            # Score and mark the state just entered
+            room_score = box_swaps * displacement
+            if empty_targets != num_boxes:
+                room_score = 0
+            if room_score > best_room_score:
+                best_room_score = room_score
+                best_cells = list(cells)
+                best_box_positions = list(box_positions)
+            explored_states.add(state_hash)
+            box_swaps = None
+        if not frames:
+            break
 
-            box_swaps_next = box_swaps
-            if last_pull_next != last_pull:
-                box_swaps_next += 1
+        frame = frames[-1]
+        action = frame[0]
+        if action == num_actions:
+            frames.pop()
+            undo = frame[3]
+            if undo is not None:
+                (player, state_hash, empty_targets, displacement,
+                 changed_cells, moved_box, moved_box_cell) = undo
+                for cell, value in changed_cells:
+                    cells[cell] = value
+                if moved_box >= 0:
+                    box_at[box_positions[moved_box]] = -1
+                    box_at[moved_box_cell] = moved_box
+                    box_positions[moved_box] = moved_box_cell
+            continue
+        frame[0] = action + 1
+
+        # Check if next position is an empty floor or an empty box target
+        offset = offsets[action]
+        next_position = player + offset
+        next_value = cells[next_position]
+        if next_value != 1 and next_value != 2:
+            # The state did not change, so it is explored already
+            continue
+        child_ttl = frame[1] - 1
+        if child_ttl <= 0 or len(explored_states) >= max_explored_states:
+            continue
+
+        changed_cells = [(player, 5), (next_position, next_value)]
+        undo = (player, state_hash, empty_targets, displacement, changed_cells, -1, -1)
+        # Move player, independent of pull or move action.
+        cells[player] = structure[player]
+        cells[next_position] = 5
+        state_hash ^= keys[5][player] ^ keys[5][next_position]
+        if structure[player] == 2:
+            empty_targets += 1
+        if next_value == 2:
+            empty_targets -= 1
 
-            depth_first_search(room_state_next, room_structure,
-                               box_mapping_next, box_swaps_next,
-                               last_pull, ttl)
+        # In addition try to pull a box if the action is a pull action
+        child_swaps = frame[2]
+        if action < 4:
+            box_cell = player - offset
+            box_value = cells[box_cell]
+            if box_value == 3 or box_value == 4:
+                changed_cells.append((box_cell, box_value))
+                cells[player] = 3
+                cells[box_cell] = structure[box_cell]
+                state_hash ^= keys[box_value][box_cell] ^ keys[3][player]
+                if structure[player] == 2:
+                    empty_targets -= 1
+                if structure[box_cell] == 2:
+                    empty_targets += 1
+                box = box_at[box_cell]
+                if box >= 0:
+                    # Update the box mapping
+                    undo = undo[:5] + (box, box_cell)
+                    target = targets[box]
+                    displacement += (abs(rows[player] - rows[target]) + abs(cols[player] - cols[target])
+                                     - abs(rows[box_cell] - rows[target]) - abs(cols[box_cell] - cols[target]))
+                    box_at[box_cell] = -1
+                    box_at[player] = box
+                    box_positions[box] = player
+                    child_swaps += 1
+        player = next_position
+
+        if state_hash in explored_states:
+            frames.append([num_actions, child_ttl, child_swaps, undo])
+        else:
+            frames.append([0, child_ttl, child_swaps, undo])
+            box_swaps = child_swaps
+
+    best_room = np.array(best_cells, dtype=np.asarray(room_state).dtype).reshape(height, width)
+    best_box_mapping = {
+        divmod(target, width): divmod(position, width)
+        for target, position in zip(targets, best_box_positions)
+    }
+    return best_room, best_room_score, best_box_mapping
 
 
 def reverse_move(room_state, room_structure, box_mapping, last_pull, action):
@@ -5,13 +5,22 @@ https://github.com/mpSchrader/gym-sokoban/tree/default
 """
 
 import copy
+import json
+import base64
+import struct
 import asyncio
+from collections import deque
 from typing import Optional, Tuple
 import gymnasium as gym
 import numpy as np
 from gymnasium.envs.toy_text.frozen_lake import generate_random_map
 from verl_agent_env.envs.base import LLMAgentEnv
 from verl_agent_env.envs.sokoban.room_utils import generate_room
+from verl_agent_env.envs.sokoban.level_bank import open_level_bank
+from verl_agent_env.envs.sokoban.pregeneration import pop_room
+from verl_agent_env.envs.sokoban.room_cache import seeded_room
+from verl_agent_env.envs.sokoban.deadlock import dead_squares, is_freeze_deadlock
+from verl_agent_env.envs.sokoban.bitboard import Bitboard
 from verl_agent_env.envs.sokoban.render_utils import room_to_rgb, room_to_tiny_world_rgb
 
 
@@ -26,7 +35,29 @@ class SokobanEnv(LLMAgentEnv):
                  max_steps=120,
                  num_boxes=4,
                  num_gen_steps=None,
-                 room_setup=None):
+                 room_setup=None,
+                 level_bank=None,
+                 terminate_on_deadlock=False,
+                 action_mode="move",
+                 engine="grid"):
+        """
+        Args:
+            dim_room: Size of the generated rooms.
+            max_steps: Number of steps after which the episode is over.
+            num_boxes: Number of boxes of the generated rooms.
+            num_gen_steps: Number of random walk steps of the room generation.
+            room_setup: A room as returned by `serialize_room`, played on every reset.
+            level_bank: Path of a level bank (see `level_bank.py`) to draw the rooms of size
+                `dim_room` with `num_boxes` boxes from, instead of generating them.
+            terminate_on_deadlock: Whether to truncate the episode, with `info["deadlock"]` set,
+                as soon as a push makes the room provably unsolvable (see `deadlock.py`).
+            action_mode: "move" for the eight move and push tools, one cell per call, or "push_box"
+                for a single `push_box(row, col, direction)` tool that walks the player to the box
+                and pushes it once, so that a solution takes one call per push.
+            engine: "grid" to play on the room arrays, or "bitboard" to play on packed bitboards
+                (see `bitboard.py`), whose reachability flood fills scale better to large rooms.
+                The room arrays are kept up to date in both engines.
+        """
         super().__init__()
 
         # General Configuration
@@ -49,6 +80,16 @@ class SokobanEnv(LLMAgentEnv):
         # Other Settings
         self.viewer = None
         self.max_steps = max_steps
+        self.terminate_on_deadlock = terminate_on_deadlock
+        self.deadlocked = False
+        assert action_mode in ACTION_MODES, f"Unknown action mode '{action_mode}', expected one of {ACTION_MODES}"
+        self.action_mode = action_mode
+        assert engine in ENGINES, f"Unknown engine '{engine}', expected one of {ENGINES}"
+        self.engine = engine
+        # The room as bitboards in the bitboard engine, else None
+        self._board = None
+        # Walking distance of the player to every reachable cell, see _reachability
+        self._reachable = None
         # observation space and action space are initialized in super().__init__(), to follow the LLM Agent Env interface
         # screen_height, screen_width = (dim_room[0] * 16, dim_room[1] * 16)
         # self.action_space = gym.spaces.Discrete(len(ACTION_LOOKUP))
@@ -56,6 +97,9 @@ class SokobanEnv(LLMAgentEnv):
         
         # Save Room Setup
         self.room_setup = room_setup
+        self.level_bank = level_bank
+        # Every reset starts from the configured size and box count, which a bank level may change
+        self._level_config = (self.dim_room, num_boxes)
         
         self._action_space_json_schema = []
         self._tool_name_action_id_map = {}
@@ -74,56 +118,20 @@ class SokobanEnv(LLMAgentEnv):
                 }
             })
             self._tool_name_action_id_map[func_name] = action_key
+        if action_mode == "push_box":
+            self._action_space_json_schema = [PUSH_BOX_TOOL]
     
     def _get_obs(self, error_msg: Optional[str] = None) -> Tuple[dict, ...]:
-        arr_walls, arr_goals, arr_boxes, arr_player = self.render(mode='raw')
-        # construct the map
-        # step 1, set the floor
-        grid_map = np.zeros((self.dim_room[0], self.dim_room[1]), dtype=np.uint8)
-        # step 2, set the walls
-        grid_map[arr_walls == 1] = 1
-        # step 3, set the targets
-        grid_map[arr_goals == 1] = 2
-        # step 4, set the boxes
-        grid_map[arr_boxes == 1] = 3
-        # step 5, set the boxes on target
-        grid_map[(arr_boxes == 1) & (arr_goals == 1)] = 4
-        # step 6, set the player
-        grid_map[arr_player == 1] = 5
-        # step 7, set the player on target
-        grid_map[(arr_player == 1) & (arr_goals == 1)] = 6
-        
-        # turn the grid map into a string
-        grid_map_str = ""
-        for i in range(self.dim_room[0]):
-            for j in range(self.dim_room[1]):
-                grid_map_str += GRID_LOOKUP[grid_map[i, j]]
-            grid_map_str += "\n"
-        grid_map_str = grid_map_str.rstrip()
-        
-        if error_msg is not None:
-            obs = f"There some ERROR occurred . The error message is: {error_msg}\n"
-        else:
-            obs = ""
-        if self._last_tool_call_id is not None:
-            obs += f"After the action, the map of the world is: \n{grid_map_str}\n You are at position {self.player_position[0]},{self.player_position[1]} in the world."
-            return (
-                {
-                    "role": "tool",
-                    "tool_call_id": self._last_tool_call_id,
-                    "content": obs
-                },
-            )
-        else:
-            obs += f"The current map of the world is: \n{grid_map_str}\n You are at position {self.player_position[0]},{self.player_position[1]} in the world."
-            return (
-                {
-                    "role": "user",
-                    "content": obs
-                },
-            )
+        grid_map_str = grid_map_to_string(grid_map_codes(self.room_fixed, self.room_state))
+        return format_observation(grid_map_str, self.player_position, self._last_tool_call_id, error_msg)
     
-    async def step(self, action):
+    def _parse_action(self, action) -> Tuple[int, Optional[str]]:
+        """
+        Turn the tool calls of an action message into an action ID, and remember the tool call ID.
+
+        Returns:
+            Tuple[int, Optional[str]]: The action ID, and an error message for the agent, if any.
+        """
         action = action['tool_calls']
         error_msg = None
         if len(action) == 0:
@@ -135,6 +143,17 @@ class SokobanEnv(LLMAgentEnv):
             self._last_tool_call_id = action[0]['id']
             action = action[0]['function']
             action = self._tool_name_action_id_map[action['name']]
+        return action, error_msg
+
+    @property
+    def batch_step_supported(self) -> bool:
+        # SokobanVecEnv only knows the one-cell move and push actions on the room arrays
+        return self.action_mode == "move" and self.engine == "grid"
+
+    async def step(self, action):
+        if self.action_mode == "push_box":
+            return self._step_push_box(action)
+        action, error_msg = self._parse_action(action)
 
         self.num_env_steps += 1
 
@@ -165,8 +184,9 @@ class SokobanEnv(LLMAgentEnv):
         if done:
             info["maxsteps_used"] = self._check_if_maxsteps()
             info["all_boxes_on_target"] = self._check_if_all_boxes_on_target()
+        truncated = self._check_if_deadlock(done, info)
 
-        return self._get_obs(error_msg), self.reward_last, done, False, info
+        return self._get_obs(error_msg), self.reward_last, done, truncated, info
 
     def _push(self, action):
         """
@@ -175,35 +195,40 @@ class SokobanEnv(LLMAgentEnv):
         :param action:
         :return: Boolean, indicating a change of the room's state
         """
-        change = CHANGE_COORDINATES[(action - 1) % 4]
-        new_position = self.player_position + change
-        current_position = self.player_position.copy()
+        if self._board is not None:
+            return self._step_board(action, push=True)
+        row_change, col_change = CHANGE_COORDINATES[(action - 1) % 4]
+        row, col = self.player_position
+        new_row, new_col = row + row_change, col + col_change
 
         # No push, if the push would get the box out of the room's grid
-        new_box_position = new_position + change
-        if new_box_position[0] >= self.room_state.shape[0] \
-                or new_box_position[1] >= self.room_state.shape[1]:
+        box_row, box_col = new_row + row_change, new_col + col_change
+        if box_row >= self.room_state.shape[0] \
+                or box_col >= self.room_state.shape[1]:
             return False, False
 
 
-        can_push_box = self.room_state[new_position[0], new_position[1]] in [3, 4]
-        can_push_box &= self.room_state[new_box_position[0], new_box_position[1]] in [1, 2]
+        can_push_box = self.room_state[new_row, new_col] in [3, 4]
+        can_push_box &= self.room_state[box_row, box_col] in [1, 2]
         if can_push_box:
 
-            self.new_box_position = tuple(new_box_position)
-            self.old_box_position = tuple(new_position)
+            self.new_box_position = (box_row, box_col)
+            self.old_box_position = (new_row, new_col)
 
             # Move Player
-            self.player_position = new_position
-            self.room_state[(new_position[0], new_position[1])] = 5
-            self.room_state[current_position[0], current_position[1]] = \
-                self.room_fixed[current_position[0], current_position[1]]
-
-            # Move Box
+            self.player_position = (new_row, new_col)
+            self.room_state[new_row, new_col] = 5
+            self.room_state[row, col] = self.room_fixed[row, col]
+
+            # Move Box. Only boxes change the number of targets left uncovered, since the player
+            # standing on a target counts as uncovered.
+            if self.room_fixed[new_row, new_col] == 2:
+                self.uncovered_targets += 1
             box_type = 4
-            if self.room_fixed[new_box_position[0], new_box_position[1]] == 2:
+            if self.room_fixed[box_row, box_col] == 2:
                 box_type = 3
-            self.room_state[new_box_position[0], new_box_position[1]] = box_type
+                self.uncovered_targets -= 1
+            self.room_state[box_row, box_col] = box_type
             return True, True
 
         # Try to move if no box to push, available
@@ -216,22 +241,181 @@ class SokobanEnv(LLMAgentEnv):
         :param action:
         :return: Boolean, indicating a change of the room's state
         """
-        change = CHANGE_COORDINATES[(action - 1) % 4]
-        new_position = self.player_position + change
-        current_position = self.player_position.copy()
+        if self._board is not None:
+            return self._step_board(action, push=False)
+        row_change, col_change = CHANGE_COORDINATES[(action - 1) % 4]
+        row, col = self.player_position
+        new_row, new_col = row + row_change, col + col_change
 
         # Move player if the field in the moving direction is either
         # an empty field or an empty box target.
-        if self.room_state[new_position[0], new_position[1]] in [1, 2]:
-            self.player_position = new_position
-            self.room_state[(new_position[0], new_position[1])] = 5
-            self.room_state[current_position[0], current_position[1]] = \
-                self.room_fixed[current_position[0], current_position[1]]
+        if self.room_state[new_row, new_col] in [1, 2]:
+            self.player_position = (new_row, new_col)
+            self.room_state[new_row, new_col] = 5
+            self.room_state[row, col] = self.room_fixed[row, col]
 
             return True
 
         return False
 
+    def _step_board(self, action, push: bool):
+        """
+        `_push` or `_move` in the bitboard engine: play the action on the bitboards, then copy the
+        few changed cells to the room arrays.
+        """
+        row, col = self.player_position
+        if push:
+            moved_player, moved_box = self._board.push((action - 1) % 4)
+        else:
+            moved_player, moved_box = self._board.move((action - 1) % 4), False
+        if moved_player:
+            new_row, new_col = self._board.position(self._board.player)
+            self.player_position = (new_row, new_col)
+            self.room_state[row, col] = self.room_fixed[row, col]
+            self.room_state[new_row, new_col] = 5
+        if moved_box:
+            box_row, box_col = 2 * new_row - row, 2 * new_col - col
+            self.new_box_position = (box_row, box_col)
+            self.old_box_position = (new_row, new_col)
+            if self.room_fixed[new_row, new_col] == 2:
+                self.uncovered_targets += 1
+            box_type = 4
+            if self.room_fixed[box_row, box_col] == 2:
+                box_type = 3
+                self.uncovered_targets -= 1
+            self.room_state[box_row, box_col] = box_type
+        return (moved_player, moved_box) if push else moved_player
+
+    def _walking_distance(self, cell: Tuple[int, int]) -> Optional[int]:
+        """
+        Return the walking distance of the player to a cell without pushing, or None if the player
+        cannot reach it.
+        """
+        if self._board is not None:
+            if not (0 <= cell[0] < self._board.height and 0 <= cell[1] < self._board.width):
+                return None
+            return self._board.distance(self._board.cell(*cell))
+        return self._reachability().get(cell)
+
+    def _reachability(self) -> dict:
+        """
+        Return the walking distance of the player to every cell it can reach without pushing.
+        The map is cached until a box moves, since in push_box mode only pushes move the player.
+        """
+        if self._reachable is None:
+            height, width = self.room_state.shape
+            distances = {self.player_position: 0}
+            queue = deque([self.player_position])
+            while queue:
+                row, col = queue.popleft()
+                for row_change, col_change in CHANGE_COORDINATES.values():
+                    cell = (row + row_change, col + col_change)
+                    if cell not in distances and 0 <= cell[0] < height and 0 <= cell[1] < width \
+                            and self.room_state[cell] in (1, 2):
+                        distances[cell] = distances[(row, col)] + 1
+                        queue.append(cell)
+            self._reachable = distances
+        return self._reachable
+
+    def _parse_push_box(self, action) -> Tuple[Optional[Tuple[int, int, int]], Optional[str]]:
+        """
+        Turn the tool calls of an action message into a box position and a direction, and remember
+        the tool call ID.
+
+        Returns:
+            Tuple: The (row, col, direction index of CHANGE_COORDINATES) of the push, or None if
+                there is nothing valid to do, and an error message for the agent, if any.
+        """
+        tool_calls = action['tool_calls']
+        if len(tool_calls) == 0:
+            self._last_tool_call_id = None
+            return None, None
+        error_msg = None
+        if len(tool_calls) > 1:
+            error_msg = f"You can only take one action at a time. But you tried to take {len(tool_calls)} actions at the same time. So we will only take the first action: {tool_calls[0]['function']}"
+        self._last_tool_call_id = tool_calls[0]['id']
+        function = tool_calls[0]['function']
+        try:
+            if function['name'] != PUSH_BOX_TOOL["name"]:
+                raise ValueError(f"Unknown tool '{function['name']}', the only tool is '{PUSH_BOX_TOOL['name']}'")
+            arguments = json.loads(function.get('arguments') or "{}")
+            row, col, direction = int(arguments['row']), int(arguments['col']), arguments['direction']
+            if direction not in PUSH_BOX_DIRECTIONS:
+                raise ValueError(f"Unknown direction '{direction}', expected one of {list(PUSH_BOX_DIRECTIONS)}")
+        except (ValueError, TypeError, KeyError) as e:
+            message = f"Invalid push_box call: missing argument {e}" if isinstance(e, KeyError) else f"Invalid push_box call: {e}"
+            return None, message if error_msg is None else f"{error_msg}\n{message}"
+        return (row, col, PUSH_BOX_DIRECTIONS[direction]), error_msg
+
+    def _step_push_box(self, action):
+        """
+        Take one push_box call: walk the player behind the box along a shortest path and push the
+        box one cell. A call that cannot be carried out changes nothing but costs a step like a
+        blocked move.
+        """
+        push, error_msg = self._parse_push_box(action)
+
+        self.num_env_steps += 1
+        self.new_box_position = None
+        self.old_box_position = None
+        moved_box = False
+        num_moves = 0
+
+        if push is not None:
+            row, col, direction = push
+            row_change, col_change = CHANGE_COORDINATES[direction]
+            behind = (row - row_change, col - col_change)
+            ahead = (row + row_change, col + col_change)
+            height, width = self.room_state.shape
+
+            def inside(cell):
+                return 0 <= cell[0] < height and 0 <= cell[1] < width
+
+            if not inside((row, col)) or self.room_state[row, col] not in (3, 4):
+                problem = f"There is no box at position {row},{col}."
+            elif not inside(ahead) or (self.room_state[ahead] not in (1, 2) and ahead != self.player_position):
+                # The player may stand in front of the box, as it walks away first
+                problem = f"The box at position {row},{col} cannot be pushed {PUSH_BOX_DIRECTION_NAMES[direction]}, the field behind it is not empty."
+            elif (distance := self._walking_distance(behind)) is None:
+                problem = f"You cannot reach position {behind[0]},{behind[1]} to push the box at position {row},{col} {PUSH_BOX_DIRECTION_NAMES[direction]}."
+            else:
+                problem = None
+                num_moves = distance + 1
+                # Walk the player behind the box, then push it like the push action does
+                self.room_state[self.player_position] = self.room_fixed[self.player_position]
+                self.player_position = behind
+                self.room_state[behind] = 5
+                if self._board is not None:
+                    self._board.player = self._board.cell(*behind)
+                _, moved_box = self._push(1 + direction)
+                self._reachable = None
+            if problem is not None:
+                error_msg = problem if error_msg is None else f"{error_msg}\n{problem}"
+
+        self._calc_reward()
+        done = self._check_if_done()
+
+        info = {
+            "action.name": PUSH_BOX_TOOL["name"],
+            "action.moved_player": moved_box,
+            "action.moved_box": moved_box,
+            "action.num_moves": num_moves,
+        }
+        if done:
+            info["maxsteps_used"] = self._check_if_maxsteps()
+            info["all_boxes_on_target"] = self._check_if_all_boxes_on_target()
+        truncated = self._check_if_deadlock(done, info)
+
+        return self._get_obs(error_msg), self.reward_last, done, truncated, info
+
+    def _count_uncovered_targets(self) -> int:
+        """
+        Count the targets without a box from scratch. Steps keep the count up to date incrementally.
+        """
+        empty_targets = self.room_state == 2
+        player_on_target = (self.room_fixed == 2) & (self.room_state == 5)
+        return int(np.count_nonzero(empty_targets | player_on_target))
+
     def _calc_reward(self):
         """
         Calculate Reward Based on
@@ -242,12 +426,7 @@ class SokobanEnv(LLMAgentEnv):
         self.reward_last = self.penalty_for_step
 
         # count boxes off or on the target
-        empty_targets = self.room_state == 2
-        player_on_target = (self.room_fixed == 2) & (self.room_state == 5)
-        total_targets = empty_targets | player_on_target
-
-        current_boxes_on_target = self.num_boxes - \
-                                  np.where(total_targets)[0].shape[0]
+        current_boxes_on_target = self.num_boxes - self.uncovered_targets
 
         # Add the reward if a box is pushed on the target and give a
         # penalty if a box is pushed off the target.
@@ -268,20 +447,38 @@ class SokobanEnv(LLMAgentEnv):
         return self._check_if_all_boxes_on_target() or self._check_if_maxsteps()
 
     def _check_if_all_boxes_on_target(self):
-        empty_targets = self.room_state == 2
-        player_hiding_target = (self.room_fixed == 2) & (self.room_state == 5)
-        are_all_boxes_on_targets = np.where(empty_targets | player_hiding_target)[0].shape[0] == 0
-        return are_all_boxes_on_targets
+        return self.uncovered_targets == 0
 
     def _check_if_maxsteps(self):
         return (self.max_steps == self.num_env_steps)
+
+    def _check_if_deadlock(self, done: bool, info: dict) -> bool:
+        """
+        In terminate_on_deadlock mode, check whether the last push left the room unsolvable, and
+        if so flag it in the step info. Only the pushed box can have become stuck, so the check
+        looks at its neighborhood only.
+
+        Returns:
+            bool: Whether to truncate the episode.
+        """
+        if not self.terminate_on_deadlock or done:
+            return False
+        if not self.deadlocked and self.new_box_position is not None:
+            row, col = self.new_box_position
+            self.deadlocked = self._dead_squares[row][col] or is_freeze_deadlock(
+                self.room_fixed, self.room_state, row, col, self._dead_squares
+            )
+        if self.deadlocked:
+            info["deadlock"] = True
+        return self.deadlocked
     
     def serialize_room(self):
         # Convert tuple keys in box_mapping to strings for serialization
         serialized_box_mapping = {}
         for key, value in self.box_mapping.items():
             assert isinstance(key, tuple)
-            serialized_box_mapping[str(key)] = [int(cell) for cell in value]
+            # Cast to int, as the repr of NumPy integers is not '2' but 'np.int64(2)' since NumPy 2
+            serialized_box_mapping[str(tuple(int(cell) for cell in key))] = [int(cell) for cell in value]
         
         # Convert NumPy arrays to native Python lists of lists of integers
         room_fixed_list = []
@@ -322,32 +519,182 @@ class SokobanEnv(LLMAgentEnv):
         assert self.room_state.shape == self.dim_room, f"{self.room_state.shape=} {self.dim_room=}"
         assert len(self.box_mapping) == self.num_boxes
 
+    def snapshot(self) -> bytes:
+        """
+        Return the full episode state as a compact binary snapshot, a few dozen to a few hundred
+        bytes: the room as bit masks of walls, targets and boxes, the box mapping, the player
+        position and the episode progress. See SNAPSHOT_HEADER for the layout.
+        """
+        height, width = self.room_fixed.shape
+        tool_call_id = (self._last_tool_call_id or "").encode("utf-8")
+        flags = (SNAPSHOT_DEADLOCKED if self.deadlocked else 0) | (SNAPSHOT_HAS_TOOL_CALL_ID if self._last_tool_call_id is not None else 0)
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, height, width, self.num_boxes, len(self.box_mapping),
+            self.player_position[0], self.player_position[1], flags, int(self.boxes_on_target),
+            self.num_env_steps, self.max_steps, float(self.reward_last), len(tool_call_id)
+        )
+        masks = np.packbits(np.stack([
+            self.room_fixed == 0,
+            self.room_fixed == 2,
+            (self.room_state == 3) | (self.room_state == 4),
+            self.room_state == 3,
+        ]).reshape(4, -1), axis=1)
+        box_mapping = bytes(int(x) for target, box in self.box_mapping.items() for x in (*target, *box))
+        return header + masks.tobytes() + box_mapping + tool_call_id
+
+    def restore(self, snapshot: bytes):
+        """
+        Restore the episode state from a `snapshot`.
+
+        Raises:
+            ValueError: If the bytes are not a Sokoban snapshot of a supported version.
+        """
+        if len(snapshot) < SNAPSHOT_HEADER.size or snapshot[:4] != SNAPSHOT_MAGIC:
+            raise ValueError("Not a Sokoban snapshot")
+        (_, version, height, width, num_boxes, num_mapped, player_row, player_col, flags, boxes_on_target,
+         num_env_steps, max_steps, reward_last, tool_call_id_length) = SNAPSHOT_HEADER.unpack_from(snapshot)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported Sokoban snapshot version {version}")
+        num_cells = height * width
+        mask_size = (num_cells + 7) // 8
+        offset = SNAPSHOT_HEADER.size
+        masks = np.unpackbits(
+            np.frombuffer(snapshot, dtype=np.uint8, count=4 * mask_size, offset=offset).reshape(4, mask_size),
+            axis=1, count=num_cells
+        ).astype(bool).reshape(4, height, width)
+        offset += 4 * mask_size
+        walls, targets, boxes, boxes_3 = masks
+
+        self.room_fixed = np.where(walls, 0, np.where(targets, 2, 1)).astype(np.int8)
+        self.room_state = self.room_fixed.copy()
+        self.room_state[boxes] = 4
+        self.room_state[boxes_3] = 3
+        self.room_state[player_row, player_col] = 5
+        mapping = snapshot[offset:offset + 4 * num_mapped]
+        self.box_mapping = {
+            (mapping[i], mapping[i + 1]): (mapping[i + 2], mapping[i + 3]) for i in range(0, len(mapping), 4)
+        }
+        offset += 4 * num_mapped
+        self._last_tool_call_id = None
+        if flags & SNAPSHOT_HAS_TOOL_CALL_ID:
+            self._last_tool_call_id = snapshot[offset:offset + tool_call_id_length].decode("utf-8")
+
+        self.dim_room = (height, width)
+        self.num_boxes = num_boxes
+        self.player_position = (player_row, player_col)
+        self.num_env_steps = num_env_steps
+        self.max_steps = max_steps
+        self.reward_last = reward_last
+        self.boxes_on_target = boxes_on_target
+        self.deadlocked = bool(flags & SNAPSHOT_DEADLOCKED)
+        self._on_room_restored()
+
+    def _on_room_restored(self):
+        """
+        Rebuild what is derived from the room after it was replaced by reset, set_state or restore.
+        """
+        self.uncovered_targets = self._count_uncovered_targets()
+        self._reachable = None
+        if self.terminate_on_deadlock:
+            # Dead squares only depend on the walls and targets, so they are computed once per room
+            self._dead_squares = dead_squares(self.room_fixed).tolist()
+        if self.engine == "bitboard":
+            self._board = Bitboard.from_room(self.room_fixed, self.room_state)
+
+    def get_state(self) -> dict:
+        """
+        Return the episode state, a base64 encoded `snapshot`.
+        """
+        if not hasattr(self, "room_state"):
+            return {"room": None}
+        return {"snapshot": base64.b64encode(self.snapshot()).decode("ascii")}
+
+    def set_state(self, state: dict):
+        """
+        Restore the episode state returned by `get_state`, or by its earlier JSON form: the room
+        as in `serialize_room` plus the progress of the episode.
+        """
+        if "snapshot" in state:
+            self.restore(base64.b64decode(state["snapshot"]))
+            return
+        if state["room"] is None:
+            return
+        # Levels of a bank may differ in size and box count from the constructor arguments
+        if "dim_room" in state:
+            self.dim_room = tuple(state["dim_room"])
+            self.num_boxes = state["num_boxes"]
+        self.deserialize_room(state["room"])
+        self.player_position = tuple(state["player_position"])
+        self.deadlocked = state.get("deadlocked", False)
+        self._on_room_restored()
+        self.num_env_steps = state["num_env_steps"]
+        self.max_steps = state["max_steps"]
+        self.reward_last = state["reward_last"]
+        self.boxes_on_target = state["boxes_on_target"]
+        self._last_tool_call_id = state["last_tool_call_id"]
+
     async def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
         await super().reset(seed=seed, options=options)
-        if options is not None and options.get("room_setup", None) is not None:
+        self.dim_room, self.num_boxes = self._level_config
+        info = {}
+        options = options or {}
+        level_bank = options.get("level_bank", self.level_bank)
+        if options.get("room_setup", None) is not None:
             self.deserialize_room(options["room_setup"])
+        elif level_bank is not None and (
+            options.get("level_index") is not None or options.get("difficulty") is not None or self.room_setup is None
+        ):
+            info = self._load_bank_level(level_bank, options.get("level_index"), options.get("difficulty"), seed)
         elif self.room_setup is not None:
             self.deserialize_room(self.room_setup)
         else:
-            try:
-                self.room_fixed, self.room_state, self.box_mapping = generate_room(
-                    dim=self.dim_room,
-                    num_steps=self.num_gen_steps,
-                    num_boxes=self.num_boxes,
-                    second_player=options.get("second_player", False) if options is not None else False
-                )
-            except (RuntimeError, RuntimeWarning) as e:
-                print("[SOKOBAN] Runtime Error/Warning: {}".format(e))
-                print("[SOKOBAN] Retry . . .")
-                return await self.reset(seed=seed, options=options)
-
-        self.player_position = np.argwhere(self.room_state == 5)[0]
+            second_player = options.get("second_player", False)
+            if seed is not None:
+                # The room of a seed is always the same, see room_cache.py
+                room = seeded_room(seed, self.dim_room, self.num_boxes, self.num_gen_steps, second_player)
+            else:
+                # Take a room generated in the background, see pregeneration.py, else generate one here
+                room = None if second_player else pop_room(self.dim_room, self.num_boxes, self.num_gen_steps)
+            while room is None:
+                try:
+                    room = generate_room(
+                        dim=self.dim_room,
+                        num_steps=self.num_gen_steps,
+                        num_boxes=self.num_boxes,
+                        second_player=second_player,
+                        rng=self.np_random
+                    )
+                except (RuntimeError, RuntimeWarning) as e:
+                    print("[SOKOBAN] Runtime Error/Warning: {}".format(e))
+                    print("[SOKOBAN] Retry . . .")
+            self.room_fixed, self.room_state, self.box_mapping = room
+
+        self.player_position = tuple(int(x) for x in np.argwhere(self.room_state == 5)[0])
+        self.deadlocked = False
+        self._on_room_restored()
         self.num_env_steps = 0
         self.reward_last = 0
         self.boxes_on_target = 0
         self._last_tool_call_id = None
 
-        return self._get_obs(), {}
+        return self._get_obs(), info
+
+    def _load_bank_level(self, path: str, level_index: Optional[int] = None, difficulty=None, seed: Optional[int] = None) -> dict:
+        """
+        Load a level of a level bank: the given one, or a random one of size `dim_room` with
+        `num_boxes` boxes, optionally within a difficulty range. The draw is reproducible for a seed.
+
+        Returns:
+            dict: The reset info, with the index and the difficulty of the level.
+        """
+        bank = open_level_bank(path)
+        if level_index is None:
+            rng = np.random.default_rng(seed) if seed is not None else self.np_random
+            level_index = bank.sample(rng, *self._level_config, difficulty)
+        self.room_fixed, self.room_state, self.box_mapping, level_difficulty = bank.load(int(level_index))
+        self.dim_room = self.room_fixed.shape
+        self.num_boxes = len(self.box_mapping)
+        return {"level_index": int(level_index), "difficulty": level_difficulty}
 
     def render(self, mode='human', close=None, scale=1):
         assert mode in RENDERING_MODES
@@ -398,7 +745,7 @@ class SokobanEnv(LLMAgentEnv):
     
     @property
     def task_prompt(self) -> str:
-        return GUIDE
+        return PUSH_BOX_GUIDE if self.action_mode == "push_box" else GUIDE
     
     @property
     def action_space_json_schema(self):
@@ -452,6 +799,100 @@ CHANGE_COORDINATES = {
 
 RENDERING_MODES = ['rgb_array', 'human', 'tiny_rgb_array', 'tiny_human', 'raw']
 
+ACTION_MODES = ("move", "push_box")
+
+ENGINES = ("grid", "bitboard")
+
+# Layout of the header of `SokobanEnv.snapshot`, followed by the packed bit masks of the walls,
+# the targets, the boxes and the boxes on targets (4 x ceil(height * width / 8) bytes), the box
+# mapping (4 bytes per box: target row and column, box row and column) and the UTF-8 tool call ID:
+# magic, version, height, width, num_boxes, box mapping size, player row, player column, flags,
+# boxes_on_target, num_env_steps, max_steps, reward_last, tool call ID length
+SNAPSHOT_HEADER = struct.Struct("<4sBBBBBBBBhIIdH")
+SNAPSHOT_MAGIC = b"SOKS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DEADLOCKED = 1
+SNAPSHOT_HAS_TOOL_CALL_ID = 2
+
+# Directions of the push_box tool, as indices of CHANGE_COORDINATES
+PUSH_BOX_DIRECTIONS = {"up": 0, "down": 1, "left": 2, "right": 3}
+PUSH_BOX_DIRECTION_NAMES = {index: name for name, index in PUSH_BOX_DIRECTIONS.items()}
+
+PUSH_BOX_TOOL = {
+    "name": "push_box",
+    "description": "Walk the player to the box at the given position and push it one field in the given direction. The player walks around walls and boxes along a shortest path to the field on the opposite side of the box, and the push fails if that field cannot be reached or if the field in front of the box is not empty (floor or target without a box). Up decreases the row, down increases the row, left decreases the column and right increases the column.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "row": {
+                "type": "integer",
+                "description": "The row of the box to push, counted from 0 at the top of the map"
+            },
+            "col": {
+                "type": "integer",
+                "description": "The column of the box to push, counted from 0 at the left of the map"
+            },
+            "direction": {
+                "type": "string",
+                "enum": list(PUSH_BOX_DIRECTIONS),
+                "description": "The direction to push the box in"
+            }
+        },
+        "required": ["row", "col", "direction"]
+    }
+}
+
+
+def grid_map_codes(room_fixed: np.ndarray, room_state: np.ndarray) -> np.ndarray:
+    """
+    Return the GRID_LOOKUP code of every cell. Works on a single room or on a stack of rooms.
+    """
+    goals = room_fixed == 2
+    boxes = (room_state == 3) | (room_state == 4)
+    player = room_state == 5
+    grid_map = np.zeros(room_fixed.shape, dtype=np.uint8)
+    grid_map[room_fixed == 0] = 1
+    grid_map[goals] = 2
+    grid_map[boxes] = 3
+    grid_map[boxes & goals] = 4
+    grid_map[player] = 5
+    grid_map[player & goals] = 6
+    return grid_map
+
+
+def grid_map_to_string(grid_map: np.ndarray) -> str:
+    """
+    Render the codes of one room as the text shown to the agent.
+    """
+    return "\n".join("".join(GRID_LOOKUP[cell] for cell in row) for row in grid_map.tolist()).rstrip()
+
+
+def format_observation(grid_map_str: str, player_position, last_tool_call_id: Optional[str], error_msg: Optional[str] = None) -> Tuple[dict, ...]:
+    """
+    Build the observation message: a tool response to the last tool call, or a user message after a reset.
+    """
+    if error_msg is not None:
+        obs = f"There some ERROR occurred . The error message is: {error_msg}\n"
+    else:
+        obs = ""
+    if last_tool_call_id is not None:
+        obs += f"After the action, the map of the world is: \n{grid_map_str}\n You are at position {player_position[0]},{player_position[1]} in the world."
+        return (
+            {
+                "role": "tool",
+                "tool_call_id": last_tool_call_id,
+                "content": obs
+            },
+        )
+    else:
+        obs += f"The current map of the world is: \n{grid_map_str}\n You are at position {player_position[0]},{player_position[1]} in the world."
+        return (
+            {
+                "role": "user",
+                "content": obs
+            },
+        )
+
 GUIDE = """
 ### Sokoban Puzzle Instructions
 
@@ -523,6 +964,20 @@ Each puzzle will have a different layout, but the rules and goal remain the same
 Enjoy the challenge!
 """
 
+PUSH_BOX_CONTROLS = """#### Controls
+You play with a single function, `push_box`, which takes the position of a box (`row` and `col`, counted from 0 at the top left of the map) and a `direction` (`up`, `down`, `left` or `right`).
+The player walks to the field on the opposite side of the box by itself, avoiding walls and boxes, and pushes the box one field in the given direction.
+The push fails if the player cannot reach that field, or if the field in front of the box is a wall or another box.
+
+"""
+
+# The guide of the push_box action mode, where each function call pushes one box once
+PUSH_BOX_GUIDE = (
+    GUIDE[:GUIDE.index("#### Controls")]
+    + PUSH_BOX_CONTROLS
+    + GUIDE[GUIDE.index("#### Rewards"):].replace("- **Move**: Each step you take costs 0.1.", "- **Push**: Each push you make costs 0.1.")
+)
+
 if __name__ == "__main__":
     async def main():
         env = SokobanEnv()
@@ -0,0 +1,216 @@
+"""
+Push-optimal Sokoban solver.
+
+The search runs over pushes rather than single moves: a node is the set of box cells plus the area
+the player can walk to, normalized to the smallest reachable cell, so that every walk between two
+pushes is one edge. It is an A* search on the number of pushes with an admissible heuristic (the sum
+of each box's push distance to its nearest target), a transposition table of the best push count
+per node, and pruning of pushes onto dead squares and into 2x2 blocks (see `deadlock.py`).
+
+    result = solve(env.room_fixed, env.room_state, max_nodes=100000)
+    if result["status"] == "solved":
+        print(result["num_pushes"], [ACTION_LOOKUP[action] for action in result["actions"]])
+
+Cells outside the grid count as walls, which matches `SokobanEnv` for rooms surrounded by walls.
+"""
+
+import time
+import heapq
+import itertools
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from verl_agent_env.envs.sokoban.deadlock import _dead_cells, _in_block, neighbor_table
+
+# Largest finite push distance, used for cells from which no target can be reached
+UNREACHABLE = 10 ** 6
+
+
+def _reachable(player: int, walls: List[bool], boxes, neighbors: List[List[int]]) -> List[int]:
+    """
+    Return the cells the player can walk to without pushing, in breadth first order.
+    """
+    seen = {player}
+    queue = [player]
+    for cell in queue:
+        for direction in range(4):
+            next_cell = neighbors[direction][cell]
+            if next_cell >= 0 and next_cell not in seen and not walls[next_cell] and next_cell not in boxes:
+                seen.add(next_cell)
+                queue.append(next_cell)
+    return queue
+
+
+def _walk(start: int, goal: int, walls: List[bool], boxes, neighbors: List[List[int]]) -> List[int]:
+    """
+    Return the directions of a shortest walk of the player from start to goal, around the boxes.
+    """
+    previous = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell == goal:
+            break
+        for direction in range(4):
+            next_cell = neighbors[direction][cell]
+            if next_cell >= 0 and next_cell not in previous and not walls[next_cell] and next_cell not in boxes:
+                previous[next_cell] = (cell, direction)
+                queue.append(next_cell)
+    directions = []
+    cell = goal
+    while previous[cell] is not None:
+        cell, direction = previous[cell]
+        directions.append(direction)
+    return directions[::-1]
+
+
+def _push_distances(walls: List[bool], targets: List[int], neighbors: List[List[int]]) -> List[int]:
+    """
+    Return the smallest number of pushes moving a lone box from every cell to a target, ignoring the
+    other boxes but not the room the player needs behind the box.
+    """
+    distances = [UNREACHABLE] * len(walls)
+    queue = deque(targets)
+    for target in targets:
+        distances[target] = 0
+    while queue:
+        cell = queue.popleft()
+        for direction in range(4):
+            box = neighbors[direction][cell]
+            if box < 0 or walls[box] or distances[box] != UNREACHABLE:
+                continue
+            player = neighbors[direction][box]
+            if player < 0 or walls[player]:
+                continue
+            distances[box] = distances[cell] + 1
+            queue.append(box)
+    return distances
+
+
+def solve(room_fixed: np.ndarray,
+          room_state: np.ndarray,
+          max_nodes: Optional[int] = 200000,
+          time_limit: Optional[float] = None,
+          weight: float = 1.0) -> Dict:
+    """
+    Search for a solution of a Sokoban room with the fewest pushes.
+
+    Args:
+        room_fixed (np.ndarray): Walls (0), floors (1) and targets (2) of the room.
+        room_state (np.ndarray): Current state of the room, with boxes (3, 4) and the player (5).
+        max_nodes (Optional[int]): Maximum number of expanded nodes, None for no limit.
+        time_limit (Optional[float]): Maximum search time in seconds, None for no limit.
+        weight (float): Weight of the heuristic. Up to 1 finds push-optimal solutions, larger weights find
+            solutions faster that may take more pushes.
+
+    Returns:
+        Dict: `status` ("solved", "unsolvable" or "budget_exhausted"), `optimal` (whether the push
+            count is proven minimal), `num_pushes` and `num_moves` of the solution (None if not
+            solved), `actions` (the ACTION_LOOKUP IDs playing the solution, pushes as push actions
+            and walks as move actions), `num_nodes` (expanded nodes) and `time` (seconds).
+    """
+    start_time = time.perf_counter()
+    room_fixed = np.asarray(room_fixed)
+    room_state = np.asarray(room_state)
+    height, width = room_fixed.shape
+    neighbors = neighbor_table(height, width)
+    walls = (room_fixed == 0).ravel().tolist()
+    targets = np.flatnonzero(room_fixed == 2).tolist()
+    target_set = frozenset(targets)
+    dead = _dead_cells(walls, targets, neighbors)
+    distances = _push_distances(walls, targets, neighbors)
+    start_boxes = tuple(sorted(np.flatnonzero((room_state == 3) | (room_state == 4)).tolist()))
+    start_player = int(np.flatnonzero(room_state == 5)[0])
+
+    def result(status: str, path: Optional[List[Tuple[int, int]]] = None, num_nodes: int = 0) -> Dict:
+        actions = None
+        if path is not None:
+            # Replay the pushes, walking the player to the cell behind each box first
+            actions = []
+            boxes = set(start_boxes)
+            player = start_player
+            for box, direction in path:
+                behind = neighbors[direction ^ 1][box]
+                actions.extend(5 + step for step in _walk(player, behind, walls, boxes, neighbors))
+                actions.append(1 + direction)
+                boxes.remove(box)
+                boxes.add(neighbors[direction][box])
+                player = box
+        return {
+            "status": status,
+            "optimal": status == "solved" and weight <= 1.0,
+            "num_pushes": len(path) if path is not None else None,
+            "num_moves": len(actions) if actions is not None else None,
+            "actions": actions,
+            "num_nodes": num_nodes,
+            "time": time.perf_counter() - start_time,
+        }
+
+    if len(start_boxes) > len(targets) or any(dead[box] for box in start_boxes):
+        return result("unsolvable")
+    if all(box in target_set for box in start_boxes):
+        return result("solved", [])
+
+    def node_key(boxes: tuple, player: int) -> Tuple[tuple, int]:
+        return boxes, min(_reachable(player, walls, boxes, neighbors))
+
+    start_key = node_key(start_boxes, start_player)
+    # Best known push count and the parent node and push leading to every node
+    best_pushes = {start_key: 0}
+    parents = {start_key: None}
+    counter = itertools.count()
+    heuristic = sum(distances[box] for box in start_boxes)
+    # Among equal estimates, prefer nodes closer to a solution
+    frontier = [(weight * heuristic, 0, next(counter), start_key, start_player)]
+    num_nodes = 0
+
+    while frontier:
+        _, negative_pushes, _, key, player = heapq.heappop(frontier)
+        pushes = -negative_pushes
+        if pushes > best_pushes[key]:
+            continue
+        if max_nodes is not None and num_nodes >= max_nodes:
+            return result("budget_exhausted", num_nodes=num_nodes)
+        if time_limit is not None and time.perf_counter() - start_time > time_limit:
+            return result("budget_exhausted", num_nodes=num_nodes)
+        num_nodes += 1
+
+        boxes = key[0]
+        box_set = set(boxes)
+        reachable = set(_reachable(player, walls, box_set, neighbors))
+        for box in boxes:
+            for direction in range(4):
+                behind = neighbors[direction ^ 1][box]
+                ahead = neighbors[direction][box]
+                if behind < 0 or behind not in reachable or ahead < 0 or walls[ahead] or ahead in box_set or dead[ahead]:
+                    continue
+                box_set.remove(box)
+                box_set.add(ahead)
+                frozen = _in_block(ahead, walls, box_set, target_set, neighbors)
+                box_set.remove(ahead)
+                box_set.add(box)
+                if frozen:
+                    continue
+
+                child_boxes = tuple(sorted(ahead if other == box else other for other in boxes))
+                child_key = node_key(child_boxes, box)
+                child_pushes = pushes + 1
+                if child_pushes >= best_pushes.get(child_key, UNREACHABLE):
+                    continue
+                best_pushes[child_key] = child_pushes
+                parents[child_key] = (key, box, direction)
+                heuristic = sum(distances[other] for other in child_boxes)
+                if heuristic == 0:
+                    # All boxes are on targets. With an admissible heuristic the first goal reached
+                    # through the frontier order is push-optimal, and a goal child has f = g, so it
+                    # cannot be beaten by any node still in the frontier.
+                    path = []
+                    node = child_key
+                    while parents[node] is not None:
+                        node, pushed_box, pushed_direction = parents[node]
+                        path.append((pushed_box, pushed_direction))
+                    return result("solved", path[::-1], num_nodes)
+                heapq.heappush(frontier, (child_pushes + weight * heuristic, -child_pushes, next(counter), child_key, box))
+
+    return result("unsolvable", num_nodes=num_nodes)
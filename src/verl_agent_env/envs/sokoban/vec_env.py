@@ -0,0 +1,264 @@
+"""
+Batched Sokoban engine that steps many rooms at once with NumPy array operations.
+
+`SokobanEnv.step` runs a few Python branches and full-grid scans per room, which at batch sizes in
+the thousands costs more than the game logic itself. `SokobanVecEnv` stacks B rooms of the same size
+into (B, H, W) int8 arrays and applies B actions, rewards and done checks with fancy indexing, with
+the same rules, rewards and observation text as `SokobanEnv`.
+
+`step_sokoban_envs` steps a list of `SokobanEnv` instances through it, which is how `interface`
+serves batch steps of many Sokoban environments.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from verl_agent_env.envs.sokoban.sokoban import (
+    ACTION_LOOKUP,
+    CHANGE_COORDINATES,
+    GRID_LOOKUP,
+    SokobanEnv,
+    format_observation,
+    grid_map_codes,
+)
+
+# Row and column change of every action ID, see CHANGE_COORDINATES. The no operation action does not move.
+ACTION_ROW_CHANGE = np.array([0] + [CHANGE_COORDINATES[(action - 1) % 4][0] for action in range(1, 9)], dtype=np.int64)
+ACTION_COL_CHANGE = np.array([0] + [CHANGE_COORDINATES[(action - 1) % 4][1] for action in range(1, 9)], dtype=np.int64)
+
+
+class SokobanVecEnv:
+    """
+    A batch of Sokoban rooms of the same size, with the episode progress of each room.
+    """
+
+    def __init__(self,
+                 room_fixed: np.ndarray,
+                 room_state: np.ndarray,
+                 player_position: np.ndarray,
+                 num_boxes: np.ndarray,
+                 boxes_on_target: np.ndarray,
+                 uncovered_targets: np.ndarray,
+                 num_env_steps: np.ndarray,
+                 max_steps: np.ndarray,
+                 penalty_for_step: float = -0.1,
+                 penalty_box_off_target: float = -1,
+                 reward_box_on_target: float = 1,
+                 reward_finished: float = 10) -> None:
+        """
+        Args:
+            room_fixed (np.ndarray): (B, H, W) walls, floors and targets of every room.
+            room_state (np.ndarray): (B, H, W) current state of every room.
+            player_position (np.ndarray): (B, 2) row and column of the player in every room.
+            num_boxes (np.ndarray): (B,) number of boxes of every room.
+            boxes_on_target (np.ndarray): (B,) number of boxes on a target after the last step.
+            uncovered_targets (np.ndarray): (B,) number of targets without a box in every room.
+            num_env_steps (np.ndarray): (B,) number of steps taken in every episode.
+            max_steps (np.ndarray): (B,) number of steps after which every episode is over.
+        """
+        self.room_fixed = np.asarray(room_fixed, dtype=np.int8)
+        self.room_state = np.asarray(room_state, dtype=np.int8)
+        self.player_position = np.asarray(player_position, dtype=np.int64)
+        self.num_boxes = np.asarray(num_boxes, dtype=np.int64)
+        self.boxes_on_target = np.asarray(boxes_on_target, dtype=np.int64)
+        self.uncovered_targets = np.asarray(uncovered_targets, dtype=np.int64)
+        self.num_env_steps = np.asarray(num_env_steps, dtype=np.int64)
+        self.max_steps = np.asarray(max_steps, dtype=np.int64)
+        self.penalty_for_step = penalty_for_step
+        self.penalty_box_off_target = penalty_box_off_target
+        self.reward_box_on_target = reward_box_on_target
+        self.reward_finished = reward_finished
+        self.reward_last = np.zeros(len(self.room_state), dtype=np.float64)
+
+    @property
+    def num_envs(self) -> int:
+        return self.room_state.shape[0]
+
+    @classmethod
+    def from_envs(cls, envs: List[SokobanEnv]) -> "SokobanVecEnv":
+        """
+        Stack the rooms of reset `SokobanEnv` instances of the same room size.
+        """
+        first = envs[0]
+        return cls(
+            room_fixed=np.stack([env.room_fixed for env in envs]),
+            room_state=np.stack([env.room_state for env in envs]),
+            player_position=np.array([env.player_position for env in envs]),
+            num_boxes=np.array([env.num_boxes for env in envs]),
+            boxes_on_target=np.array([env.boxes_on_target for env in envs]),
+            uncovered_targets=np.array([env.uncovered_targets for env in envs]),
+            num_env_steps=np.array([env.num_env_steps for env in envs]),
+            max_steps=np.array([env.max_steps for env in envs]),
+            penalty_for_step=first.penalty_for_step,
+            penalty_box_off_target=first.penalty_box_off_target,
+            reward_box_on_target=first.reward_box_on_target,
+            reward_finished=first.reward_finished,
+        )
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Apply one action ID (see ACTION_LOOKUP) to every room.
+
+        Returns:
+            Tuple[np.ndarray, ...]: (B,) arrays of the rewards, the done flags, whether the player
+                moved, whether a box moved, whether all boxes are on targets, whether the episode
+                used up its steps, and whether the action was invalid because the player would leave
+                the grid, which `SokobanEnv` reports as an IndexError. Invalid actions change nothing
+                but the step count.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        batch = np.arange(self.num_envs)
+        height, width = self.room_state.shape[1:]
+        self.num_env_steps += 1
+
+        is_push = (actions >= 1) & (actions <= 4)
+        is_move = actions >= 5
+        row_change = ACTION_ROW_CHANGE[actions]
+        col_change = ACTION_COL_CHANGE[actions]
+        row, col = self.player_position[:, 0], self.player_position[:, 1]
+        new_row, new_col = row + row_change, col + col_change
+        box_row, box_col = new_row + row_change, new_col + col_change
+
+        # Negative indices wrap around like in SokobanEnv, indices past the grid do not
+        box_outside = (box_row >= height) | (box_col >= width)
+        player_outside = (new_row >= height) | (new_col >= width)
+        safe_new_row = np.where(player_outside, 0, new_row)
+        safe_new_col = np.where(player_outside, 0, new_col)
+        safe_box_row = np.where(box_outside, 0, box_row)
+        safe_box_col = np.where(box_outside, 0, box_col)
+        next_cell = self.room_state[batch, safe_new_row, safe_new_col]
+        box_next_cell = self.room_state[batch, safe_box_row, safe_box_col]
+
+        # A push out of the grid does nothing, a push without a movable box falls back to a move
+        push = is_push & ~box_outside
+        moved_box = push & ((next_cell == 3) | (next_cell == 4)) & ((box_next_cell == 1) | (box_next_cell == 2))
+        try_move = (is_move | (push & ~moved_box))
+        invalid = try_move & player_outside
+        moved = try_move & ~player_outside & ((next_cell == 1) | (next_cell == 2))
+        moved_player = moved | moved_box
+
+        # Move the players, then the pushed boxes
+        envs = batch[moved_player]
+        self.room_state[envs, row[envs], col[envs]] = self.room_fixed[envs, row[envs], col[envs]]
+        self.room_state[envs, new_row[envs], new_col[envs]] = 5
+        self.player_position[envs, 0] = new_row[envs]
+        self.player_position[envs, 1] = new_col[envs]
+        envs = batch[moved_box]
+        on_target = self.room_fixed[envs, box_row[envs], box_col[envs]] == 2
+        self.room_state[envs, box_row[envs], box_col[envs]] = np.where(on_target, 3, 4)
+        # Only pushed boxes change the number of uncovered targets, like in SokobanEnv._push
+        self.uncovered_targets[envs] += (self.room_fixed[envs, new_row[envs], new_col[envs]] == 2).astype(np.int64) - on_target
+        uncovered_targets = self.uncovered_targets
+
+        # Same arithmetic, in the same order, as SokobanEnv._calc_reward
+        current_boxes_on_target = self.num_boxes - uncovered_targets
+        rewards = np.full(self.num_envs, self.penalty_for_step, dtype=np.float64)
+        rewards[current_boxes_on_target > self.boxes_on_target] += self.reward_box_on_target
+        rewards[current_boxes_on_target < self.boxes_on_target] += self.penalty_box_off_target
+        all_boxes_on_target = uncovered_targets == 0
+        rewards[all_boxes_on_target] += self.reward_finished
+        self.boxes_on_target = current_boxes_on_target
+        self.reward_last = rewards
+
+        maxsteps_used = self.max_steps == self.num_env_steps
+        dones = all_boxes_on_target | maxsteps_used
+        return rewards, dones, moved_player, moved_box, all_boxes_on_target, maxsteps_used, invalid
+
+    def grid_maps(self) -> np.ndarray:
+        """
+        Return the (B, H, W) GRID_LOOKUP codes of every room.
+        """
+        return grid_map_codes(self.room_fixed, self.room_state)
+
+
+def grid_maps_to_strings(grid_maps: np.ndarray) -> List[str]:
+    """
+    Render the (B, H, W) codes of several rooms as the text of `grid_map_to_string`. Every distinct
+    row of the batch is rendered once, since most rows repeat across rooms and steps.
+    """
+    num_rooms, height, width = grid_maps.shape
+    rows = np.ascontiguousarray(grid_maps, dtype=np.uint8).reshape(num_rooms * height, width)
+    unique_rows, inverse = np.unique(rows.view(np.dtype((np.void, width))).ravel(), return_inverse=True)
+    row_texts = [
+        "".join(GRID_LOOKUP[cell] for cell in row)
+        for row in unique_rows.view(np.uint8).reshape(-1, width).tolist()
+    ]
+    return [
+        "\n".join([row_texts[row] for row in room]).rstrip()
+        for room in inverse.reshape(num_rooms, height).tolist()
+    ]
+
+
+def step_sokoban_envs(envs: List[SokobanEnv], actions: List[dict]) -> List[object]:
+    """
+    Take one step in each of several `SokobanEnv` instances, with the same outcome as awaiting
+    `env.step(action)` on each of them. Rooms of the same size are stepped together by a `SokobanVecEnv`.
+
+    Args:
+        envs (List[SokobanEnv]): Distinct, reset environments.
+        actions (List[dict]): One action message per environment.
+
+    Returns:
+        List[object]: Per environment, the (observation, reward, done, truncated, info) tuple of
+            `SokobanEnv.step`, or the exception the step raised.
+    """
+    outcomes: List[object] = [None] * len(envs)
+    action_ids: List[Optional[int]] = [None] * len(envs)
+    error_msgs: List[Optional[str]] = [None] * len(envs)
+    groups = {}
+    for index, (env, action) in enumerate(zip(envs, actions)):
+        try:
+            action_ids[index], error_msgs[index] = env._parse_action(action)
+        except Exception as e:
+            outcomes[index] = e
+            continue
+        groups.setdefault(env.room_state.shape, []).append(index)
+
+    for indices in groups.values():
+        group_envs = [envs[index] for index in indices]
+        vec_env = SokobanVecEnv.from_envs(group_envs)
+        rewards, dones, moved_player, moved_box, all_boxes_on_target, maxsteps_used, invalid = vec_env.step(
+            np.array([action_ids[index] for index in indices])
+        )
+        grid_map_strs = grid_maps_to_strings(vec_env.grid_maps())
+        for position, (index, env) in enumerate(zip(indices, group_envs)):
+            env.num_env_steps = int(vec_env.num_env_steps[position])
+            env.new_box_position = None
+            env.old_box_position = None
+            if invalid[position]:
+                row, col = vec_env.player_position[position] + (ACTION_ROW_CHANGE[action_ids[index]], ACTION_COL_CHANGE[action_ids[index]])
+                axis, value, size = (0, row, env.room_state.shape[0]) if row >= env.room_state.shape[0] else (1, col, env.room_state.shape[1])
+                outcomes[index] = IndexError(f"index {value} is out of bounds for axis {axis} with size {size}")
+                continue
+            if moved_player[position]:
+                env.room_state[...] = vec_env.room_state[position]
+                env.player_position = tuple(vec_env.player_position[position].tolist())
+            if moved_box[position]:
+                env.old_box_position = tuple(int(x) for x in vec_env.player_position[position])
+                env.new_box_position = (
+                    env.old_box_position[0] + int(ACTION_ROW_CHANGE[action_ids[index]]),
+                    env.old_box_position[1] + int(ACTION_COL_CHANGE[action_ids[index]])
+                )
+            env.reward_last = float(rewards[position])
+            env.boxes_on_target = int(vec_env.boxes_on_target[position])
+            env.uncovered_targets = int(vec_env.uncovered_targets[position])
+
+            done = bool(dones[position])
+            info = {
+                "action.name": ACTION_LOOKUP[action_ids[index]],
+                "action.moved_player": bool(moved_player[position]),
+                "action.moved_box": bool(moved_box[position]),
+            }
+            if done:
+                info["maxsteps_used"] = bool(maxsteps_used[position])
+                info["all_boxes_on_target"] = bool(all_boxes_on_target[position])
+            # Deadlock checks only look at the pushed box, so they run per environment
+            truncated = env._check_if_deadlock(done, info)
+            observation = format_observation(
+                grid_map_strs[position],
+                env.player_position,
+                env._last_tool_call_id,
+                error_msgs[index]
+            )
+            outcomes[index] = (observation, env.reward_last, done, truncated, info)
+    return outcomes
@@ -1,14 +1,389 @@
+import os
 import json
+import time
 import asyncio
+import functools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from verl_agent_env.envs.base import LLMAgentEnv as Env
 from verl_agent_env import ALL_VERL_ENVS
+from verl_agent_env.state_store import StateStore, state_store_from_url
+from verl_agent_env.envs.sokoban.vec_env import step_sokoban_envs
+from verl_agent_env.envs.frozen_lake import step_frozen_lake_envs
+from verl_agent_env.envs.sokoban.pregeneration import get_pregeneration_stats
+from verl_agent_env.envs.sokoban.room_cache import get_room_cache_stats
 import uuid
-from typing import Optional
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Prefix of every env_id created by this process. A sharded host gives each worker process its own
+# prefix so that the front process can tell which worker owns an environment.
+ENV_ID_PREFIX = os.environ.get("VERL_AGENT_ENV_ID_PREFIX", "")
 
 # A simple in-memory store for environments
 environments = {}
+# The registered name each environment was initialized from
+environment_names = {}
+# The keyword arguments each environment was constructed with
+environment_kwargs = {}
+# The job ID each environment was tagged with at initialization, if any
+environment_job_ids = {}
+# The last access time of each environment, ordered from least to most recently used
+environment_last_access = OrderedDict()
+
+# Limits on the environments kept alive, so that environments that trainers forgot to close
+# do not accumulate. None disables a limit.
+eviction_config = {
+    # Seconds without any call after which an environment is closed
+    "idle_ttl": None,
+    # Number of environments above which the least recently used ones are closed
+    "max_environments": None,
+    # Seconds between two sweeps for idle environments
+    "sweep_interval": 60.0,
+}
+# Number of environments closed by eviction so far, by reason
+eviction_stats = {"idle": 0, "capacity": 0}
+
+# Recent delays, in seconds, of the event loop in waking up a sleeping task, measured by
+# run_loop_lag_monitor. A high lag means environment code is blocking the loop.
+loop_lag_samples = deque(maxlen=600)
+
+# Worker pools that CPU-heavy environment methods are offloaded to, keyed by environment name.
+# Environments without an entry run their methods inline on the event loop.
+env_executors = {}
+
+# Functions stepping many environments of one type at once, keyed by environment name. Each takes a
+# list of environments and a list of actions, and returns per environment the result tuple of
+# `env.step` or the exception it raised. `take_steps` uses them for environments whose step is not
+# offloaded to an executor.
+batch_step_functions = {
+    "verl_env/sokoban-v0": step_sokoban_envs,
+    "verl_env/frozen_lake-v1": step_frozen_lake_envs,
+}
+
+# Event loops used to drive environment coroutines inside worker threads, one per thread
+_thread_local = threading.local()
+
+# Optional external store of environment states, see verl_agent_env.state_store
+state_store: Optional[StateStore] = None
+# Whether every call reloads the environment state from the store, so that any worker sharing
+# the store can serve any environment. Otherwise the store is only a write-through backup that is
+# read when an environment is not in memory, e.g. after a worker restart.
+state_store_stateless = False
+
+def configure_state_store(store: Optional[StateStore], stateless: bool = False):
+    """
+    Keep the state of every environment in an external state store, in addition to memory.
+    Environments that do not implement `get_state` (e.g. MCP environments) stay memory-only.
+
+    Args:
+        store (Optional[StateStore]): The state store, or None to keep environments in memory only.
+        stateless (bool): Whether to reload the environment state from the store on every call.
+    """
+    global state_store, state_store_stateless
+    state_store = store
+    state_store_stateless = stateless
+
+def configure_state_store_from_env():
+    """
+    Configure the state store from the VERL_AGENT_ENV_STATE_STORE environment variable (a URL as
+    accepted by `state_store_from_url`) and VERL_AGENT_ENV_STATELESS ("1" for stateless workers).
+    """
+    url = os.environ.get("VERL_AGENT_ENV_STATE_STORE")
+    if url:
+        configure_state_store(
+            state_store_from_url(url),
+            stateless=os.environ.get("VERL_AGENT_ENV_STATELESS", "0") == "1"
+        )
+
+configure_state_store_from_env()
+
+def _get_environment(env_id: str) -> Env:
+    """
+    Return the environment with the given ID, loading its state from the state store if needed.
+
+    Raises:
+        KeyError: If the environment with the given ID is not found.
+    """
+    env: Env = environments.get(env_id, None)
+    if state_store is not None and (env is None or state_store_stateless):
+        env = _load_environment(env_id, env)
+    if env is None:
+        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    _touch_environment(env_id)
+    return env
+
+def _load_environment(env_id: str, env: Optional[Env]) -> Optional[Env]:
+    """
+    Restore an environment from its record in the state store, reusing the in-memory object if any.
+    """
+    record = state_store.get(env_id)
+    if record is None:
+        return env
+    record = json.loads(record)
+    if env is None:
+        env = ALL_VERL_ENVS[record["env_name"]](**record["env_kwargs"])
+        environments[env_id] = env
+        environment_names[env_id] = record["env_name"]
+        environment_kwargs[env_id] = record["env_kwargs"]
+        if record["job_id"] is not None:
+            environment_job_ids[env_id] = record["job_id"]
+    env.set_state(record["state"])
+    return env
+
+def _save_environment(env_id: str, env: Env):
+    """
+    Write the state of an environment to the state store, if one is configured.
+    """
+    if state_store is None:
+        return
+    try:
+        state = env.get_state()
+    except NotImplementedError:
+        return
+    record = {
+        "env_name": environment_names[env_id],
+        "env_kwargs": environment_kwargs[env_id],
+        "job_id": environment_job_ids.get(env_id),
+        "state": state
+    }
+    state_store.set(env_id, json.dumps(record).encode("utf-8"))
+
+def _forget_environment(env_id: str) -> Optional[Env]:
+    """
+    Drop an environment and its metadata from memory and from the state store, and return it.
+    Returns None if it was not in memory.
+    """
+    env = environments.pop(env_id, None)
+    environment_names.pop(env_id, None)
+    environment_kwargs.pop(env_id, None)
+    environment_job_ids.pop(env_id, None)
+    environment_last_access.pop(env_id, None)
+    if state_store is not None:
+        state_store.delete(env_id)
+    return env
+
+def configure_eviction(idle_ttl: Optional[float] = None, max_environments: Optional[int] = None, sweep_interval: float = 60.0):
+    """
+    Configure when environments are closed without a close call from the client.
+
+    Args:
+        idle_ttl (Optional[float]): Seconds without any call after which an environment is closed by
+            the sweeper, see `run_eviction_sweeper`. None keeps idle environments forever.
+        max_environments (Optional[int]): Maximum number of live environments. Initializing one more
+            closes the least recently used environment. None means no limit.
+        sweep_interval (float): Seconds between two sweeps for idle environments.
+    """
+    eviction_config["idle_ttl"] = idle_ttl
+    eviction_config["max_environments"] = max_environments
+    eviction_config["sweep_interval"] = sweep_interval
+
+def configure_eviction_from_env():
+    """
+    Configure eviction from the VERL_AGENT_ENV_IDLE_TTL, VERL_AGENT_ENV_MAX_ENVIRONMENTS and
+    VERL_AGENT_ENV_SWEEP_INTERVAL environment variables.
+    """
+    idle_ttl = os.environ.get("VERL_AGENT_ENV_IDLE_TTL")
+    max_environments = os.environ.get("VERL_AGENT_ENV_MAX_ENVIRONMENTS")
+    configure_eviction(
+        idle_ttl=float(idle_ttl) if idle_ttl else None,
+        max_environments=int(max_environments) if max_environments else None,
+        sweep_interval=float(os.environ.get("VERL_AGENT_ENV_SWEEP_INTERVAL", 60.0))
+    )
+
+configure_eviction_from_env()
 
-async def initialize_environment(env_name: str, seed: Optional[int] = None, env_kwargs: Optional[dict] = None):
+def _touch_environment(env_id: str):
+    """
+    Record an access to an environment, making it the most recently used one.
+    """
+    environment_last_access[env_id] = time.monotonic()
+    environment_last_access.move_to_end(env_id)
+
+async def _evict_environments(env_ids: List[str], reason: str):
+    """
+    Close environments on behalf of the eviction policy and count them under the given reason.
+    """
+    # Forget all victims before the first await, so that concurrent evictions pick different ones
+    evicted = [(env_id, _forget_environment(env_id)) for env_id in env_ids]
+    eviction_stats[reason] += len(evicted)
+    for env_id, env in evicted:
+        if env is None:
+            continue
+        try:
+            await env.close()
+        except Exception as e:
+            print(f"[INTERFACE] Failed to close evicted environment '{env_id}': {e}")
+
+async def _enforce_max_environments(num_new: int = 1):
+    """
+    Close the least recently used environments so that `num_new` more fit under the limit.
+    """
+    max_environments = eviction_config["max_environments"]
+    if max_environments is None:
+        return
+    num_to_evict = len(environments) + num_new - max_environments
+    if num_to_evict > 0:
+        await _evict_environments(list(environment_last_access)[:num_to_evict], "capacity")
+
+async def sweep_idle_environments() -> int:
+    """
+    Close every environment that has not been accessed for `idle_ttl` seconds.
+
+    Returns:
+        int: The number of environments closed.
+    """
+    idle_ttl = eviction_config["idle_ttl"]
+    if idle_ttl is None:
+        return 0
+    deadline = time.monotonic() - idle_ttl
+    idle_env_ids = []
+    for env_id, last_access in environment_last_access.items():
+        # Ordered from least to most recently used, so the first recent one ends the scan
+        if last_access > deadline:
+            break
+        idle_env_ids.append(env_id)
+    await _evict_environments(idle_env_ids, "idle")
+    return len(idle_env_ids)
+
+async def run_eviction_sweeper():
+    """
+    Sweep idle environments forever. Meant to run as a background task of the server.
+    """
+    while True:
+        await asyncio.sleep(eviction_config["sweep_interval"])
+        try:
+            await sweep_idle_environments()
+        except Exception as e:
+            print(f"[INTERFACE] Idle environment sweep failed: {e}")
+
+async def run_loop_lag_monitor(interval: float = 0.1):
+    """
+    Measure the event loop lag forever. Meant to run as a background task of the server.
+    """
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        loop_lag_samples.append(max(0.0, time.monotonic() - start - interval))
+
+def get_stats() -> dict:
+    """
+    Return statistics about the live environments, the evictions, the event loop lag over the
+    last minute, the Sokoban room pre-generation and the cache of seeded Sokoban rooms, to help tune the limits.
+    """
+    lags = sorted(loop_lag_samples)
+    return {
+        "num_environments": len(environments),
+        "idle_ttl": eviction_config["idle_ttl"],
+        "max_environments": eviction_config["max_environments"],
+        "evictions": dict(eviction_stats),
+        "sokoban_pregeneration": get_pregeneration_stats(),
+        "sokoban_room_cache": get_room_cache_stats(),
+        "event_loop_lag_ms": {
+            "p50": 1000 * lags[len(lags) // 2] if lags else None,
+            "p99": 1000 * lags[int(len(lags) * 0.99)] if lags else None,
+            "max": 1000 * lags[-1] if lags else None,
+        },
+    }
+
+def configure_executor(env_name: str, executor: Optional[str] = "thread", max_workers: Optional[int] = None, methods: Iterable[str] = ("reset", "step")):
+    """
+    Run the given methods of an environment type in a worker pool instead of on the event loop,
+    so that a slow reset or step of one environment does not stall every other request.
+
+    Calls for the same env_id are expected not to overlap, which is how rollouts drive environments.
+    In "process" mode the environment is pickled to a worker process and its updated state is copied
+    back after the call, so it only suits environments that are cheap to pickle and hold no live
+    connections (e.g. not MCP environments).
+
+    Args:
+        env_name (str): The registered name of the environment type, e.g. "verl_env/sokoban-v0".
+        executor (Optional[str]): "thread", "process", or None to run the methods inline again.
+        max_workers (Optional[int]): The size of the worker pool. Defaults to the pool's own default.
+        methods (Iterable[str]): The environment methods to offload, out of "reset" and "step".
+    """
+    assert env_name in ALL_VERL_ENVS, f"Environment '{env_name}' not found in registered environments. Available environments: {ALL_VERL_ENVS}"
+    assert executor in (None, "thread", "process"), f"Unknown executor '{executor}', expected 'thread', 'process' or None"
+    methods = set(methods)
+    assert methods <= {"reset", "step"}, f"Only reset and step can be offloaded, got {methods}"
+
+    previous = env_executors.pop(env_name, None)
+    if previous is not None:
+        previous["pool"].shutdown(wait=False)
+    if executor is None:
+        return
+
+    if executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"verl-env-{env_name}")
+    else:
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+    env_executors[env_name] = {
+        "executor": executor,
+        "pool": pool,
+        "methods": methods
+    }
+
+def configure_executors_from_env(spec: Optional[str] = None):
+    """
+    Configure executors from a comma separated spec, by default read from the
+    VERL_AGENT_ENV_EXECUTORS environment variable so it also applies under uvicorn.
+    Each entry is `env_name=executor[:max_workers[:method+method]]`, for example
+    `verl_env/sokoban-v0=process:8:reset,verl_env/countdown-v0=thread:4`.
+    """
+    if spec is None:
+        spec = os.environ.get("VERL_AGENT_ENV_EXECUTORS", "")
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        env_name, config = entry.split("=", 1)
+        config = config.split(":")
+        kwargs = {"executor": None if config[0] == "inline" else config[0]}
+        if len(config) > 1 and config[1]:
+            kwargs["max_workers"] = int(config[1])
+        if len(config) > 2 and config[2]:
+            kwargs["methods"] = config[2].split("+")
+        configure_executor(env_name.strip(), **kwargs)
+
+configure_executors_from_env()
+
+def _run_env_method(env: Env, method: str, kwargs: dict):
+    """
+    Run an async environment method to completion in a worker thread.
+    """
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        _thread_local.loop = loop
+    return loop.run_until_complete(getattr(env, method)(**kwargs))
+
+def _run_env_method_in_process(env: Env, method: str, kwargs: dict):
+    """
+    Run an async environment method to completion in a worker process, and send the
+    environment back along with the result since the caller holds a stale copy.
+    """
+    return env, _run_env_method(env, method, kwargs)
+
+async def _call_env_method(env_id: str, env: Env, method: str, **kwargs):
+    """
+    Await an environment method, in the worker pool configured for the environment type if any.
+    """
+    config = env_executors.get(environment_names.get(env_id))
+    if config is None or method not in config["methods"]:
+        return await getattr(env, method)(**kwargs)
+
+    loop = asyncio.get_running_loop()
+    if config["executor"] == "thread":
+        return await loop.run_in_executor(
+            config["pool"], functools.partial(_run_env_method, env, method, kwargs)
+        )
+    updated_env, result = await loop.run_in_executor(
+        config["pool"], functools.partial(_run_env_method_in_process, env, method, kwargs)
+    )
+    env.__dict__.update(updated_env.__dict__)
+    return result
+
+async def initialize_environment(env_name: str, seed: Optional[int] = None, env_kwargs: Optional[dict] = None, job_id: Optional[str] = None):
     """
     Initialize a new environment with the given name and optional seed.
 
@@ -16,6 +391,8 @@ async def initialize_environment(env_name: str, seed: Optional[int] = None, env_
         env_name (str): The name of the environment to initialize.
         seed (Optional[int]): An optional seed for the environment's random number generator.
         env_kwargs (Optional[dict]): An optional dictionary of keyword arguments for the environment.
+        job_id (Optional[str]): An optional tag, e.g. the training job ID, so that all environments
+            of a job can be closed together with `close_environments(job_id=...)`.
         
     Returns:
         dict: A dictionary containing a success message, the environment ID, 
@@ -26,15 +403,27 @@ async def initialize_environment(env_name: str, seed: Optional[int] = None, env_
     assert env_name in ALL_VERL_ENVS, f"Environment '{env_name}' not found in registered environments. Available environments: {ALL_VERL_ENVS}"
 
     while True:
-        env_id = str(uuid.uuid4())
+        env_id = f"{ENV_ID_PREFIX}{uuid.uuid4()}"
         if env_id not in environments:
             break
     
     if env_kwargs is None:
         env_kwargs = {}
     env: Env = ALL_VERL_ENVS[env_name](**env_kwargs)
+    await _enforce_max_environments()
     environments[env_id] = env
-    observation, info = await env.reset(seed=seed, options=env_kwargs)
+    _touch_environment(env_id)
+    environment_names[env_id] = env_name
+    environment_kwargs[env_id] = env_kwargs
+    if job_id is not None:
+        environment_job_ids[env_id] = job_id
+    try:
+        observation, info = await _call_env_method(env_id, env, "reset", seed=seed, options=env_kwargs)
+    except Exception:
+        # Do not leave a half-initialized environment behind
+        await close_environment(env_id)
+        raise
+    _save_environment(env_id, env)
     return {
         "message": f"Environment '{env_name}' initialized successfully.",
         "env_id": env_id,
@@ -57,12 +446,10 @@ async def reset_environment(env_id: str, seed: Optional[int] = None, options: Op
     Raises:
         KeyError: If the environment with the given ID is not found.
     """
-    env: Env = environments.get(env_id, None)
+    env: Env = _get_environment(env_id)
     
-    if env is None:
-        raise KeyError(f"Environment with ID '{env_id}' not found.")
-    
-    observation, info = await env.reset(seed=seed, options=options)
+    observation, info = await _call_env_method(env_id, env, "reset", seed=seed, options=options)
+    _save_environment(env_id, env)
     return {
         "observation": observation,
         "info": info
@@ -79,13 +466,76 @@ async def close_environment(env_id: str):
         dict: A dictionary containing a message indicating whether the environment 
               was closed successfully or if it was not found.
     """
-    env: Env = environments.pop(env_id, None)
+    stored = state_store is not None and state_store.get(env_id) is not None
+    env: Env = _forget_environment(env_id)
     if env is not None:
         await env.close()
         return {"message": f"Environment with ID '{env_id}' closed successfully."}
+    elif stored:
+        # The environment lives in the state store only, e.g. it was created by another worker
+        return {"message": f"Environment with ID '{env_id}' closed successfully."}
     else:
         return {"message": f"Environment with ID '{env_id}' not found."}
     
+async def initialize_environments(requests: List[dict], include_task_prompt: bool = False, include_tools_schema: bool = False):
+    """
+    Initialize several environments concurrently.
+
+    Args:
+        requests (List[dict]): One dictionary per environment, holding the keyword arguments of
+            `initialize_environment` (`env_name` and optionally `seed`, `env_kwargs` and `job_id`).
+        include_task_prompt (bool): Whether to add each environment's task prompt to its result,
+            which saves a follow-up `get_task_prompt` call per environment.
+        include_tools_schema (bool): Whether to add each environment's OpenAI tools schema to its
+            result, which saves a follow-up `tools_json_schema_openai` call per environment.
+
+    Returns:
+        list: One dictionary per request, in the same order as the input. A successful item is the
+              result of `initialize_environment`, optionally with `task_prompt` and `tools_schema`.
+              A failed item contains an error message instead.
+    """
+    async def initialize_one(request: dict):
+        result = await initialize_environment(**request)
+        if include_task_prompt:
+            result["task_prompt"] = get_task_prompt(result["env_id"])
+        if include_tools_schema:
+            result["tools_schema"] = tools_json_schema_openai(result["env_id"])
+        return result
+
+    results = await asyncio.gather(
+        *[initialize_one(request) for request in requests],
+        return_exceptions=True
+    )
+    return [_batch_item_result(result) for result in results]
+
+async def close_environments(env_ids: Optional[List[str]] = None, job_id: Optional[str] = None):
+    """
+    Close several environments concurrently.
+
+    Args:
+        env_ids (Optional[List[str]]): The IDs of the environments to close.
+        job_id (Optional[str]): Additionally close every environment tagged with this job ID.
+
+    Returns:
+        list: One dictionary per closed environment ID, containing the env_id and either the
+              message of `close_environment` or an error message.
+    """
+    env_ids = list(env_ids) if env_ids is not None else []
+    if job_id is not None:
+        requested = set(env_ids)
+        env_ids.extend(
+            env_id for env_id, tag in list(environment_job_ids.items())
+            if tag == job_id and env_id not in requested
+        )
+    results = await asyncio.gather(
+        *[close_environment(env_id) for env_id in env_ids],
+        return_exceptions=True
+    )
+    return [
+        {"env_id": env_id, **_batch_item_result(result)}
+        for env_id, result in zip(env_ids, results)
+    ]
+
 def action_space_json_schema(env_id: str):
     """
     Retrieve the action space of the environment with the given ID in a Json schema format.
@@ -101,10 +551,7 @@ def action_space_json_schema(env_id: str):
     Raises:
         KeyError: If the environment with the given ID is not found.
     """
-    env: Env = environments.get(env_id, None)
-    
-    if env is None:
-        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    env: Env = _get_environment(env_id)
     
     # Assuming the action space can be represented as a dictionary
     action_space_json_schema = env.unwrapped.action_space_json_schema
@@ -124,10 +571,7 @@ def get_task_prompt(env_id: str):
     Raises:
         KeyError: If the environment with the given ID is not found.
     """
-    env: Env = environments.get(env_id, None)
-    
-    if env is None:
-        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    env: Env = _get_environment(env_id)
     
     # Assuming the environment has a method or attribute `task_prompt`
     task_prompt = env.unwrapped.task_prompt
@@ -138,7 +582,7 @@ def allow_parallel_tool_call(env_id: str):
     """
     Retrieve the allow_parallel_tool_call of the environment with the given ID.
     """
-    env: Env = environments.get(env_id, None)
+    env: Env = _get_environment(env_id)
     return env.unwrapped.allow_parallel_tool_call
 
 def tools_json_schema_openai(env_id: str):
@@ -154,10 +598,7 @@ def tools_json_schema_openai(env_id: str):
     Raises:
         KeyError: If the environment with the given ID is not found.
     """
-    env: Env = environments.get(env_id, None)
-    
-    if env is None:
-        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    env: Env = _get_environment(env_id)
     
     # Assuming the environment has a method or attribute `tools_json_schema`
     tools_schema = env.unwrapped.tools_json_schema_openai
@@ -177,10 +618,7 @@ def tools_json_schema_anthropic(env_id: str):
     Raises:
         KeyError: If the environment with the given ID is not found.
     """
-    env: Env = environments.get(env_id, None)
-    
-    if env is None:
-        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    env: Env = _get_environment(env_id)
     
     # Assuming the environment has a method or attribute `tools_json_schema_anthropic`
     tools_schema = env.unwrapped.tools_json_schema_anthropic
@@ -201,12 +639,10 @@ async def take_step(env_id: str, action):
     Raises:
         KeyError: If the environment with the given ID is not found.
     """
-    env: Env = environments.get(env_id, None)
-    
-    if env is None:
-        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    env: Env = _get_environment(env_id)
     
-    observation, reward, done, truncated, info = await env.step(action)
+    observation, reward, done, truncated, info = await _call_env_method(env_id, env, "step", action=action)
+    _save_environment(env_id, env)
     
     return {
         "observation": observation,
@@ -216,6 +652,90 @@ async def take_step(env_id: str, action):
         "info": info
     }
 
+async def take_steps(steps: List[Tuple[str, Any]]):
+    """
+    Take one step in each of several environments concurrently.
+
+    Args:
+        steps (List[Tuple[str, Any]]): A list of (env_id, action) pairs. The actions follow the
+            same OpenAI message format as in `take_step`.
+
+    Returns:
+        list: One dictionary per (env_id, action) pair, in the same order as the input. A successful
+              item contains the env_id, observation, reward, done status, truncated status, and
+              additional info. A failed item contains the env_id and an error message instead, so one
+              bad environment does not fail the whole batch.
+    """
+    results = [None] * len(steps)
+    _take_batched_steps(steps, results)
+    remaining = [index for index, result in enumerate(results) if result is None]
+    remaining_results = await asyncio.gather(
+        *[take_step(*steps[index]) for index in remaining],
+        return_exceptions=True
+    )
+    for index, result in zip(remaining, remaining_results):
+        results[index] = result
+    return [
+        {"env_id": env_id, **_batch_item_result(result)}
+        for (env_id, _), result in zip(steps, results)
+    ]
+
+def _take_batched_steps(steps: List[Tuple[str, Any]], results: list):
+    """
+    Step the environments that have a function in `batch_step_functions` all at once, and fill in
+    their results. Steps of other environments, of environments whose `batch_step_supported` is
+    False, of unknown env_ids, and repeated steps of the same env_id are left to `take_step`.
+    """
+    groups = {}
+    seen = set()
+    for index, (env_id, _) in enumerate(steps):
+        env_name = environment_names.get(env_id)
+        if env_id in seen or env_name not in batch_step_functions:
+            continue
+        config = env_executors.get(env_name)
+        if config is not None and "step" in config["methods"]:
+            continue
+        try:
+            env = _get_environment(env_id)
+        except KeyError:
+            continue
+        # Environments can opt out per instance, e.g. Sokoban in push_box action mode
+        if not getattr(env, "batch_step_supported", True):
+            continue
+        seen.add(env_id)
+        groups.setdefault(env_name, []).append((index, env))
+
+    for env_name, members in groups.items():
+        outcomes = batch_step_functions[env_name](
+            [env for _, env in members],
+            [steps[index][1] for index, _ in members]
+        )
+        for (index, env), outcome in zip(members, outcomes):
+            if isinstance(outcome, Exception):
+                results[index] = outcome
+                continue
+            _save_environment(steps[index][0], env)
+            observation, reward, done, truncated, info = outcome
+            results[index] = {
+                "observation": observation,
+                "reward": reward,
+                "done": done,
+                "truncated": truncated,
+                "info": info
+            }
+
+def _batch_item_result(result):
+    """
+    Turn one result of `asyncio.gather(..., return_exceptions=True)` into a batch item,
+    reporting a failed item as an error message instead of failing the whole batch.
+    """
+    if isinstance(result, BaseException) and not isinstance(result, Exception):
+        # Do not swallow cancellation or interpreter exit
+        raise result
+    if isinstance(result, Exception):
+        return {"error": str(result)}
+    return result
+
 def convert_claude_action_to_openai_action(action):
     """
     Convert the action from Claude to OpenAI style.
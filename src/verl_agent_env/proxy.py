@@ -0,0 +1,363 @@
+"""
+Front process that forwards the environment service API to several backend environment servers.
+
+The backends are servers speaking the environment service API. Every env_id handed out by the front encodes
+the backend that owns the environment, so all later calls of an environment are routed back to it.
+Subclasses decide how backends are reached, where new environments are placed, and how env_ids
+encode the owning backend.
+"""
+
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, Response
+from verl_agent_env.serialization import FAST_JSON_MEDIA_TYPE, encode_response, loads
+from verl_agent_env.websocket_session import WEBSOCKET_PATH, serve_websocket
+
+# Headers that are passed through to the backends and back to the client
+FORWARDED_REQUEST_HEADERS = ("content-type", "accept")
+FORWARDED_RESPONSE_HEADERS = ("content-type",)
+
+# HTTP method and endpoint of the WebSocket operations on a single environment
+ENV_OPERATION_ENDPOINTS = {
+    "reset": ("POST", "reset"),
+    "step": ("POST", "step"),
+    "close": ("POST", "close"),
+    "action_space": ("GET", "action-space"),
+    "task_prompt": ("GET", "task-prompt"),
+    "allow_parallel_tool_call": ("GET", "allow-parallel-tool-call"),
+    "tools_schema_openai": ("GET", "tools-schema-openai"),
+}
+
+
+class EnvironmentProxy:
+    """
+    Base class of the fronts that forward requests to backend environment servers.
+    """
+
+    def __init__(self) -> None:
+        self.sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    # ----- To be implemented by subclasses -----
+
+    @property
+    def backends(self) -> List[str]:
+        """
+        The names of the backends that currently accept new environments.
+        """
+        raise NotImplementedError("backends property is not implemented")
+
+    def place(self, num_environments: int, placement_key: Optional[str] = None) -> List[str]:
+        """
+        Choose the backend of each of `num_environments` new environments.
+        """
+        raise NotImplementedError("place method is not implemented")
+
+    def route(self, env_id: str) -> Tuple[str, str]:
+        """
+        Return the backend owning the environment and the env_id known by that backend.
+
+        Raises:
+            KeyError: If the env_id does not belong to any known backend.
+        """
+        raise NotImplementedError("route method is not implemented")
+
+    def external_env_id(self, backend: str, env_id: str) -> str:
+        """
+        Return the env_id handed out to clients for an environment of the given backend.
+        """
+        return env_id
+
+    def create_session(self, backend: str) -> aiohttp.ClientSession:
+        """
+        Create the HTTP session used to talk to the given backend.
+        """
+        raise NotImplementedError("create_session method is not implemented")
+
+    def base_url(self, backend: str) -> str:
+        """
+        Return the base URL of the given backend, without a trailing slash.
+        """
+        raise NotImplementedError("base_url method is not implemented")
+
+    async def start(self):
+        """
+        Start the backends, if the proxy owns them.
+        """
+        pass
+
+    async def stop(self):
+        """
+        Stop the backends, if the proxy owns them.
+        """
+        pass
+
+    # ----- Forwarding -----
+
+    def session(self, backend: str) -> aiohttp.ClientSession:
+        if backend not in self.sessions:
+            self.sessions[backend] = self.create_session(backend)
+        return self.sessions[backend]
+
+    async def close_sessions(self):
+        await asyncio.gather(*[session.close() for session in self.sessions.values()])
+        self.sessions = {}
+
+    async def forward(self, backend: str, method: str, path: str, body: Optional[bytes] = None, headers: Optional[dict] = None) -> Response:
+        """
+        Forward a request to a backend and return its response as is.
+        """
+        async with self.session(backend).request(
+            method, f"{self.base_url(backend)}{path}", data=body, headers=headers
+        ) as response:
+            content = await response.read()
+            response_headers = {
+                key: value for key, value in response.headers.items()
+                if key.lower() in FORWARDED_RESPONSE_HEADERS
+            }
+            return Response(content=content, status_code=response.status, headers=response_headers)
+
+    async def post_json(self, backend: str, path: str, payload: Any) -> Any:
+        """
+        POST a JSON payload to a backend and return the decoded JSON response.
+        """
+        # The fast path spares the backend the validation of its response, see serialization
+        async with self.session(backend).post(
+            f"{self.base_url(backend)}{path}", json=payload, headers={"accept": FAST_JSON_MEDIA_TYPE}
+        ) as response:
+            response.raise_for_status()
+            return loads(await response.read())
+
+    async def get_json(self, backend: str, path: str) -> Any:
+        async with self.session(backend).get(
+            f"{self.base_url(backend)}{path}", headers={"accept": "application/json"}
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    # ----- API operations -----
+
+    async def initialize(self, payload: dict) -> dict:
+        backend = self.place(1, payload.get("job_id"))[0]
+        result = await self.post_json(backend, "/api/environment/initialize", payload)
+        if result.get("env_id") is not None:
+            result["env_id"] = self.external_env_id(backend, result["env_id"])
+        return result
+
+    async def batch_initialize(self, payload: dict) -> dict:
+        requests = payload.get("requests", [])
+        backends = self.place(len(requests), payload.get("job_id"))
+        groups: Dict[str, List[int]] = {}
+        for index, backend in enumerate(backends):
+            groups.setdefault(backend, []).append(index)
+
+        async def initialize_group(backend: str, indices: List[int]):
+            group_payload = dict(payload, requests=[requests[i] for i in indices])
+            return await self.post_json(backend, "/api/environment/batch-initialize", group_payload)
+
+        results: List[Optional[dict]] = [None] * len(requests)
+        group_results = await asyncio.gather(
+            *[initialize_group(backend, indices) for backend, indices in groups.items()],
+            return_exceptions=True
+        )
+        for (backend, indices), group_result in zip(groups.items(), group_results):
+            for position, index in enumerate(indices):
+                if isinstance(group_result, Exception):
+                    results[index] = {"error": f"Backend '{backend}' failed: {group_result}"}
+                    continue
+                item = group_result["results"][position]
+                if item.get("env_id") is not None:
+                    item["env_id"] = self.external_env_id(backend, item["env_id"])
+                results[index] = item
+        return {"results": results}
+
+    async def batch_step(self, payload: dict) -> dict:
+        steps = payload.get("steps", [])
+        results: List[Optional[dict]] = [None] * len(steps)
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        for index, item in enumerate(steps):
+            try:
+                backend, env_id = self.route(item["env_id"])
+            except KeyError as e:
+                results[index] = {"env_id": item["env_id"], "error": str(e)}
+                continue
+            groups.setdefault(backend, []).append((index, env_id))
+
+        async def step_group(backend: str, members: List[Tuple[int, str]]):
+            group_payload = {
+                "steps": [{"env_id": env_id, "action": steps[index]["action"]} for index, env_id in members]
+            }
+            return await self.post_json(backend, "/api/environment/batch-step", group_payload)
+
+        group_results = await asyncio.gather(
+            *[step_group(backend, members) for backend, members in groups.items()],
+            return_exceptions=True
+        )
+        for (backend, members), group_result in zip(groups.items(), group_results):
+            for position, (index, _) in enumerate(members):
+                if isinstance(group_result, Exception):
+                    item = {"error": f"Backend '{backend}' failed: {group_result}"}
+                else:
+                    item = group_result["results"][position]
+                item["env_id"] = steps[index]["env_id"]
+                results[index] = item
+        return {"results": results}
+
+    async def batch_close(self, payload: dict) -> dict:
+        env_ids = payload.get("env_ids") or []
+        job_id = payload.get("job_id")
+        results = []
+        groups: Dict[str, List[Tuple[str, str]]] = {}
+        for external_id in env_ids:
+            try:
+                backend, env_id = self.route(external_id)
+            except KeyError as e:
+                results.append({"env_id": external_id, "error": str(e)})
+                continue
+            groups.setdefault(backend, []).append((external_id, env_id))
+        # Environments tagged with the job ID may live on any backend
+        if job_id is not None:
+            for backend in self.backends:
+                groups.setdefault(backend, [])
+
+        async def close_group(backend: str, members: List[Tuple[str, str]]):
+            group_payload = {"env_ids": [env_id for _, env_id in members], "job_id": job_id}
+            return await self.post_json(backend, "/api/environment/batch-close", group_payload)
+
+        group_results = await asyncio.gather(
+            *[close_group(backend, members) for backend, members in groups.items()],
+            return_exceptions=True
+        )
+        for (backend, members), group_result in zip(groups.items(), group_results):
+            if isinstance(group_result, Exception):
+                results.extend(
+                    {"env_id": external_id, "error": f"Backend '{backend}' failed: {group_result}"}
+                    for external_id, _ in members
+                )
+                continue
+            for item in group_result["results"]:
+                item["env_id"] = self.external_env_id(backend, item["env_id"])
+                results.append(item)
+        return {"results": results}
+
+    async def forward_env_request(self, request: Request, env_id: str, endpoint: str) -> Response:
+        try:
+            backend, backend_env_id = self.route(env_id)
+        except KeyError as e:
+            return JSONResponse({"message": str(e)}, status_code=404)
+        headers = {
+            key: value for key, value in request.headers.items()
+            if key.lower() in FORWARDED_REQUEST_HEADERS
+        }
+        return await self.forward(
+            backend,
+            request.method,
+            f"/api/environment/{backend_env_id}/{endpoint}",
+            body=await request.body(),
+            headers=headers
+        )
+
+    async def run_websocket_operation(self, message: dict) -> Any:
+        """
+        Run one operation received over the WebSocket transport by forwarding it to the backends.
+        """
+        op = message["op"]
+        fields = {key: value for key, value in message.items() if key not in ("id", "op")}
+        if op == "initialize":
+            return await self.initialize(fields)
+        if op == "batch_initialize":
+            return await self.batch_initialize(fields)
+        if op == "batch_step":
+            return await self.batch_step(fields)
+        if op == "batch_close":
+            return await self.batch_close(fields)
+        method, endpoint = ENV_OPERATION_ENDPOINTS[op]
+        backend, env_id = self.route(fields.pop("env_id"))
+        path = f"/api/environment/{env_id}/{endpoint}"
+        if method == "GET":
+            return await self.get_json(backend, path)
+        return await self.post_json(backend, path, fields)
+
+    async def health(self) -> dict:
+        async def backend_health(backend: str):
+            try:
+                return await self.get_json(backend, "/")
+            except Exception as e:
+                return {"status": "unreachable", "error": str(e)}
+
+        statuses = await asyncio.gather(*[backend_health(backend) for backend in self.backends])
+        return {
+            "status": "running",
+            "num_environments": sum(status.get("num_environments", 0) for status in statuses),
+            "backends": dict(zip(self.backends, statuses))
+        }
+
+    async def stats(self) -> dict:
+        async def backend_stats(backend: str):
+            try:
+                return await self.get_json(backend, "/api/stats")
+            except Exception as e:
+                return {"error": str(e)}
+
+        stats = await asyncio.gather(*[backend_stats(backend) for backend in self.backends])
+        return {"backends": dict(zip(self.backends, stats))}
+
+    def build_app(self) -> FastAPI:
+        """
+        Build the FastAPI app exposing the environment service API in front of the backends.
+        """
+        @asynccontextmanager
+        async def lifespan(app: FastAPI):
+            await self.start()
+            try:
+                yield
+            finally:
+                await self.close_sessions()
+                await self.stop()
+
+        app = FastAPI(lifespan=lifespan)
+
+        async def read_json(request: Request) -> Any:
+            return json.loads(await request.body())
+
+        def respond(request: Request, result: Any):
+            return encode_response(result, request.headers.get("accept")) or result
+
+        @app.post("/api/environment/initialize")
+        async def initialize_env(request: Request):
+            return respond(request, await self.initialize(await read_json(request)))
+
+        @app.post("/api/environment/batch-initialize")
+        async def initialize_envs(request: Request):
+            return respond(request, await self.batch_initialize(await read_json(request)))
+
+        @app.post("/api/environment/batch-step")
+        async def take_steps(request: Request):
+            return respond(request, await self.batch_step(await read_json(request)))
+
+        @app.post("/api/environment/batch-close")
+        async def close_envs(request: Request):
+            return respond(request, await self.batch_close(await read_json(request)))
+
+        @app.api_route("/api/environment/{env_id}/{endpoint}", methods=["GET", "POST"])
+        async def forward_env(request: Request, env_id: str, endpoint: str):
+            return await self.forward_env_request(request, env_id, endpoint)
+
+        @app.websocket(WEBSOCKET_PATH)
+        async def websocket_endpoint(websocket: WebSocket):
+            await websocket.accept()
+            await serve_websocket(websocket, self.run_websocket_operation)
+
+        @app.get("/api/stats")
+        async def get_stats():
+            return await self.stats()
+
+        @app.get("/")
+        async def health_check():
+            return await self.health()
+
+        return app
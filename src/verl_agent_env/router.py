@@ -0,0 +1,242 @@
+"""
+Multi-node router that fronts several environment server nodes behind one endpoint URL.
+
+Each node is any server speaking the environment service API, i.e. `verl_agent_env.app` or
+`verl_agent_env.sharded_app`. New environments are placed on a healthy node by consistent hashing
+or by least load, and the router prefixes each env_id with the owning node's name
+(e.g. "n2.<node env_id>"), so later calls of an environment always go back to its node without any
+routing table in the router. Nodes failing their health checks stop receiving new environments
+until they recover.
+
+Run it with:
+    VERL_AGENT_ENV_ROUTER_NODES="n0=http://10.0.0.1:8000,n1=http://10.0.0.2:8000" \\
+        uvicorn verl_agent_env.router:app --host 0.0.0.0 --port 8000
+or:
+    python -m verl_agent_env.router --node n0=http://10.0.0.1:8000 --node n1=http://10.0.0.2:8000
+"""
+
+import os
+import uuid
+import bisect
+import asyncio
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from verl_agent_env.proxy import EnvironmentProxy
+
+NODE_SEPARATOR = "."
+
+
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class ConsistentHashRing:
+    """
+    Hash ring with virtual nodes, so that adding or removing a node only moves the keys of that node.
+    """
+
+    def __init__(self, nodes: List[str] = (), virtual_nodes: int = 64) -> None:
+        self.virtual_nodes = virtual_nodes
+        self._hashes: List[int] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        for replica in range(self.virtual_nodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node: str):
+        keep = [i for i, ring_node in enumerate(self._nodes) if ring_node != node]
+        self._hashes = [self._hashes[i] for i in keep]
+        self._nodes = [self._nodes[i] for i in keep]
+
+    def get(self, key: str) -> str:
+        if not self._nodes:
+            raise RuntimeError("No healthy node available")
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class EnvironmentRouter(EnvironmentProxy):
+    """
+    Front of several environment server nodes.
+    """
+
+    def __init__(self,
+                 nodes: Dict[str, str],
+                 placement: str = "least-load",
+                 health_interval: float = 5.0,
+                 health_timeout: float = 5.0,
+                 max_failures: int = 3) -> None:
+        """
+        Args:
+            nodes (Dict[str, str]): The base URL of each node, keyed by node name.
+            placement (str): "least-load" to place new environments on the node with the fewest
+                environments, or "hash" to place them by consistent hashing.
+            health_interval (float): Seconds between two health checks of the nodes.
+            health_timeout (float): Seconds after which a health check counts as failed.
+            max_failures (int): Consecutive failed health checks after which a node is unhealthy.
+        """
+        super().__init__()
+        assert len(nodes) > 0, "At least one node is required"
+        assert placement in ("least-load", "hash"), f"Unknown placement '{placement}', expected 'least-load' or 'hash'"
+        for name in nodes:
+            assert name and NODE_SEPARATOR not in name, f"Node name '{name}' must be non-empty and must not contain '{NODE_SEPARATOR}'"
+        self.nodes = {name: url.rstrip("/") for name, url in nodes.items()}
+        self.placement = placement
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_failures = max_failures
+
+        self.healthy = {name: True for name in self.nodes}
+        self.failures = {name: 0 for name in self.nodes}
+        # Number of environments on each node, as reported by its last health check plus
+        # the environments placed on it since then
+        self.loads = {name: 0 for name in self.nodes}
+        self.ring = ConsistentHashRing(list(self.nodes))
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def backends(self) -> List[str]:
+        return [name for name in self.nodes if self.healthy[name]]
+
+    def place(self, num_environments: int, placement_key: Optional[str] = None) -> List[str]:
+        if not self.backends:
+            raise RuntimeError("No healthy node available")
+        placed = []
+        if self.placement == "hash":
+            if placement_key is None:
+                placement_key = str(uuid.uuid4())
+            placed = [self.ring.get(f"{placement_key}/{i}") for i in range(num_environments)]
+            for node in placed:
+                self.loads[node] += 1
+        else:
+            for _ in range(num_environments):
+                node = min(self.backends, key=lambda name: self.loads[name])
+                self.loads[node] += 1
+                placed.append(node)
+        return placed
+
+    def route(self, env_id: str) -> Tuple[str, str]:
+        node, separator, node_env_id = env_id.partition(NODE_SEPARATOR)
+        if not separator or node not in self.nodes:
+            raise KeyError(f"Environment with ID '{env_id}' not found.")
+        return node, node_env_id
+
+    def external_env_id(self, backend: str, env_id: str) -> str:
+        return f"{backend}{NODE_SEPARATOR}{env_id}"
+
+    def create_session(self, backend: str) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=None)
+        )
+
+    def base_url(self, backend: str) -> str:
+        return self.nodes[backend]
+
+    def set_healthy(self, node: str, healthy: bool):
+        if healthy == self.healthy[node]:
+            return
+        self.healthy[node] = healthy
+        if healthy:
+            self.ring.add(node)
+        else:
+            self.ring.remove(node)
+        print(f"[ROUTER] Node '{node}' at {self.nodes[node]} is {'healthy again' if healthy else 'unhealthy'}")
+
+    async def check_node(self, node: str):
+        """
+        Run one health check of a node and update its health and load.
+        """
+        try:
+            status = await asyncio.wait_for(self.get_json(node, "/"), timeout=self.health_timeout)
+        except Exception:
+            self.failures[node] += 1
+            if self.failures[node] >= self.max_failures:
+                self.set_healthy(node, False)
+            return
+        self.failures[node] = 0
+        self.loads[node] = status.get("num_environments", self.loads[node])
+        self.set_healthy(node, True)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*[self.check_node(node) for node in self.nodes])
+            await asyncio.sleep(self.health_interval)
+
+    async def start(self):
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    async def health(self) -> dict:
+        return {
+            "status": "running",
+            "nodes": {
+                node: {
+                    "url": url,
+                    "healthy": self.healthy[node],
+                    "num_environments": self.loads[node]
+                }
+                for node, url in self.nodes.items()
+            }
+        }
+
+
+def parse_nodes(specs: List[str]) -> Dict[str, str]:
+    """
+    Parse node specs of the form "name=url", or plain URLs which are then named n0, n1, ...
+    """
+    nodes = {}
+    for index, spec in enumerate(specs):
+        spec = spec.strip()
+        if not spec:
+            continue
+        name, separator, url = spec.partition("=")
+        if not separator:
+            name, url = f"n{index}", spec
+        nodes[name.strip()] = url.strip()
+    return nodes
+
+
+router = None
+app = None
+if os.environ.get("VERL_AGENT_ENV_ROUTER_NODES"):
+    router = EnvironmentRouter(
+        parse_nodes(os.environ["VERL_AGENT_ENV_ROUTER_NODES"].split(",")),
+        placement=os.environ.get("VERL_AGENT_ENV_ROUTER_PLACEMENT", "least-load")
+    )
+    app = router.build_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Route environment requests over several environment server nodes.")
+    parser.add_argument("--node", action="append", required=True, help="A node as name=url, or a plain url. Repeat for every node.")
+    parser.add_argument("--placement", choices=["least-load", "hash"], default="least-load")
+    parser.add_argument("--health-interval", type=float, default=5.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        EnvironmentRouter(
+            parse_nodes(args.node),
+            placement=args.placement,
+            health_interval=args.health_interval
+        ).build_app(),
+        host=args.host,
+        port=args.port
+    )
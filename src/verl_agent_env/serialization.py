@@ -0,0 +1,97 @@
+"""
+Fast encoding of API responses, negotiated with the `Accept` header.
+
+By default FastAPI validates every response against its response model and encodes it with the
+standard library, which costs time proportional to the size of the observation and info. Clients
+can opt into pre-serialized responses that skip this work:
+
+    - `Accept: application/msgpack` (or `application/x-msgpack`): MessagePack, requires `msgpack`.
+    - `Accept: application/vnd.verl-agent-env.fast+json`: JSON encoded with `orjson` if installed,
+      else with the standard library, answered as `application/json`.
+
+Install both with `pip install verl_agent_env[fast]`.
+"""
+
+import json
+from typing import Any, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+FAST_JSON_MEDIA_TYPE = "application/vnd.verl-agent-env.fast+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _default(obj):
+    # NumPy scalars and arrays, e.g. flags in the info dict of the environments
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(obj: Any) -> bytes:
+    """
+    Encode an object to JSON bytes, with orjson if it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default).encode("utf-8")
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def loads(content: bytes, media_type: Optional[str] = None) -> Any:
+    """
+    Decode a response body encoded by `encode_response`, given its content type.
+    """
+    if media_type is not None and media_type.split(";")[0].strip() in MSGPACK_MEDIA_TYPES:
+        return msgpack.unpackb(content, raw=False)
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Return the fast media type to answer with, following the order of the `Accept` header,
+    or None if the client did not ask for one that is available.
+    """
+    if not accept:
+        return None
+    for media_range in accept.split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            return media_type
+        if media_type == FAST_JSON_MEDIA_TYPE:
+            return media_type
+        if media_type in (JSON_MEDIA_TYPE, "*/*"):
+            return None
+    return None
+
+
+def encode_response(content: Any, accept: Optional[str]) -> Optional[Response]:
+    """
+    Encode the content in the fast format asked for by the `Accept` header.
+
+    Returns:
+        Optional[Response]: The encoded response, or None if the client did not ask for a fast format,
+            in which case the content goes through the route's response model as usual.
+    """
+    media_type = negotiate(accept)
+    if media_type is None:
+        return None
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return Response(content=dumps_msgpack(content), media_type=media_type)
+    return Response(content=dumps_json(content), media_type=JSON_MEDIA_TYPE)
@@ -0,0 +1,158 @@
+"""
+Single-node serving mode that spreads environments over several worker processes.
+
+`verl_agent_env.app` keeps its environments in process memory, so it cannot be scaled with
+`uvicorn --workers N`: a step may land on a worker that never created the environment. This module
+instead runs N independent `verl_agent_env.app` workers on Unix sockets, each creating env_ids with
+its own shard prefix (e.g. "s3.<uuid>"), and serves the same API from a front process that routes
+every call to the worker owning the environment.
+
+Run it with:
+    VERL_AGENT_ENV_NUM_SHARDS=8 uvicorn verl_agent_env.sharded_app:app --host 0.0.0.0 --port 8000
+or:
+    python -m verl_agent_env.sharded_app --num-shards 8 --port 8000
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import itertools
+import subprocess
+import tempfile
+from typing import List, Optional, Tuple
+
+import aiohttp
+from verl_agent_env.proxy import EnvironmentProxy
+
+SHARD_SEPARATOR = "."
+
+
+def shard_env_id_prefix(shard: int) -> str:
+    """
+    Return the env_id prefix used by the given shard.
+    """
+    return f"s{shard}{SHARD_SEPARATOR}"
+
+
+def parse_shard(env_id: str) -> int:
+    """
+    Return the shard encoded in an env_id.
+
+    Raises:
+        KeyError: If the env_id does not carry a shard prefix.
+    """
+    prefix, separator, _ = env_id.partition(SHARD_SEPARATOR)
+    if not separator or not prefix.startswith("s") or not prefix[1:].isdigit():
+        raise KeyError(f"Environment with ID '{env_id}' not found.")
+    return int(prefix[1:])
+
+
+class ShardedEnvironmentHost(EnvironmentProxy):
+    """
+    Front process of a single-node host, which owns N `verl_agent_env.app` worker processes.
+    """
+
+    def __init__(self, num_shards: int, socket_dir: Optional[str] = None, startup_timeout: float = 60.0) -> None:
+        super().__init__()
+        assert num_shards > 0, f"num_shards must be positive, got {num_shards}"
+        self.num_shards = num_shards
+        self.socket_dir = socket_dir
+        self.startup_timeout = startup_timeout
+        self.processes: List[subprocess.Popen] = []
+        self._shard_names = [f"s{shard}" for shard in range(num_shards)]
+        self._round_robin = itertools.cycle(self._shard_names)
+
+    def socket_path(self, backend: str) -> str:
+        return os.path.join(self.socket_dir, f"{backend}.sock")
+
+    @property
+    def backends(self) -> List[str]:
+        return self._shard_names
+
+    def place(self, num_environments: int, placement_key: Optional[str] = None) -> List[str]:
+        return [next(self._round_robin) for _ in range(num_environments)]
+
+    def route(self, env_id: str) -> Tuple[str, str]:
+        shard = parse_shard(env_id)
+        if shard >= self.num_shards:
+            raise KeyError(f"Environment with ID '{env_id}' not found.")
+        return self._shard_names[shard], env_id
+
+    def create_session(self, backend: str) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            connector=aiohttp.UnixConnector(path=self.socket_path(backend), limit=0),
+            timeout=aiohttp.ClientTimeout(total=None)
+        )
+
+    def base_url(self, backend: str) -> str:
+        # The host part is ignored when talking over a Unix socket
+        return "http://localhost"
+
+    async def start(self):
+        if self.socket_dir is None:
+            self.socket_dir = tempfile.mkdtemp(prefix="verl_agent_env_")
+        for shard, backend in enumerate(self._shard_names):
+            env = dict(os.environ, VERL_AGENT_ENV_ID_PREFIX=shard_env_id_prefix(shard))
+            self.processes.append(subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "verl_agent_env.app:app",
+                    "--uds", self.socket_path(backend),
+                    "--log-level", "warning",
+                ],
+                env=env
+            ))
+        await asyncio.gather(*[self._wait_until_ready(backend) for backend in self._shard_names])
+
+    async def _wait_until_ready(self, backend: str):
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                await self.get_json(backend, "/")
+                return
+            except (aiohttp.ClientError, OSError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Shard '{backend}' did not start within {self.startup_timeout} seconds")
+                # The session caches a connector bound to a socket that may not exist yet
+                session = self.sessions.pop(backend, None)
+                if session is not None:
+                    await session.close()
+                await asyncio.sleep(0.1)
+
+    async def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        for backend in self._shard_names:
+            if os.path.exists(self.socket_path(backend)):
+                os.remove(self.socket_path(backend))
+
+
+host = ShardedEnvironmentHost(
+    num_shards=int(os.environ.get("VERL_AGENT_ENV_NUM_SHARDS", os.cpu_count() or 1)),
+    socket_dir=os.environ.get("VERL_AGENT_ENV_SOCKET_DIR")
+)
+app = host.build_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve environments from several worker processes on one node.")
+    parser.add_argument("--num-shards", type=int, default=os.cpu_count() or 1, help="Number of worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket-dir", default=None, help="Directory of the workers' Unix sockets. Defaults to a temporary directory.")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        ShardedEnvironmentHost(num_shards=args.num_shards, socket_dir=args.socket_dir).build_app(),
+        host=args.host,
+        port=args.port
+    )
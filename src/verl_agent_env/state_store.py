@@ -0,0 +1,330 @@
+"""
+External stores for the state of live environments.
+
+With a state store configured, `interface` writes the compact state of every environment (see
+`LLMAgentEnv.get_state`) to the store after each initialize, reset and step, and rebuilds
+environments it does not hold in memory from the store. A restarted worker, or any other worker
+sharing the store, can then keep serving in-flight episodes.
+
+Backends:
+    - InMemoryStateStore: a dict, mostly for tests.
+    - SQLiteStateStore: a local SQLite file, shared by the processes of one node.
+    - LMDBStateStore: a local LMDB file, if the optional `lmdb` package is installed.
+    - RedisStateStore: any server speaking the Redis protocol. `LocalRedisServer` is a minimal
+      in-process stand-in for tests and single-node setups.
+"""
+
+import socket
+import sqlite3
+import threading
+import socketserver
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+
+class StateStore:
+    """
+    Interface of the key-value stores holding environment states.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the value stored under the key, or None if there is none.
+        """
+        raise NotImplementedError("get method is not implemented")
+
+    def set(self, key: str, value: bytes):
+        """
+        Store the value under the key, replacing any previous value.
+        """
+        raise NotImplementedError("set method is not implemented")
+
+    def delete(self, key: str):
+        """
+        Remove the key, if it exists.
+        """
+        raise NotImplementedError("delete method is not implemented")
+
+    def close(self):
+        """
+        Release the resources of the store.
+        """
+        pass
+
+
+class InMemoryStateStore(StateStore):
+    def __init__(self) -> None:
+        self._data: Dict[str, bytes] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._data.get(key)
+
+    def set(self, key: str, value: bytes):
+        self._data[key] = value
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+class SQLiteStateStore(StateStore):
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets the worker processes of a node read while another one writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS env_state (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM env_state WHERE key = ?", (key,)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO env_state (key, value) VALUES (?, ?)", (key, value))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM env_state WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class LMDBStateStore(StateStore):
+    def __init__(self, path: str, map_size: int = 1 << 32) -> None:
+        if lmdb is None:
+            raise ImportError("LMDBStateStore requires the lmdb package: pip install lmdb")
+        self.path = path
+        self._env = lmdb.open(path, map_size=map_size, subdir=False, lock=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._env.begin() as txn:
+            value = txn.get(key.encode("utf-8"))
+        return None if value is None else bytes(value)
+
+    def set(self, key: str, value: bytes):
+        with self._env.begin(write=True) as txn:
+            txn.put(key.encode("utf-8"), value)
+
+    def delete(self, key: str):
+        with self._env.begin(write=True) as txn:
+            txn.delete(key.encode("utf-8"))
+
+    def close(self):
+        self._env.close()
+
+
+def _encode_command(*args) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        parts.append(f"${len(arg)}\r\n".encode())
+        parts.append(arg)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the Redis server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        raise RuntimeError(f"Redis error: {payload.decode('utf-8')}")
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [_read_reply(reader) for _ in range(length)]
+    raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+
+class RedisStateStore(StateStore):
+    """
+    State store on a server speaking the Redis protocol (RESP), without a client library dependency.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0, namespace: str = "verl_agent_env:", timeout: float = 10.0) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.namespace = namespace
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._reader = None
+
+    def _connect(self):
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile("rb")
+        if self.db:
+            self._send("SELECT", str(self.db))
+
+    def _send(self, *args):
+        self._socket.sendall(_encode_command(*args))
+        return _read_reply(self._reader)
+
+    def execute(self, *args):
+        """
+        Run one command and return its decoded reply, reconnecting once if the connection dropped.
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is None:
+                        self._connect()
+                    return self._send(*args)
+                except (ConnectionError, OSError):
+                    self._disconnect()
+                    if attempt == 1:
+                        raise
+
+    def _disconnect(self):
+        if self._socket is not None:
+            try:
+                self._reader.close()
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = None
+        self._reader = None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", self.namespace + key)
+
+    def set(self, key: str, value: bytes):
+        self.execute("SET", self.namespace + key, value)
+
+    def delete(self, key: str):
+        self.execute("DEL", self.namespace + key)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+class _RedisRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server: "LocalRedisServer" = self.server.owner
+        while True:
+            try:
+                command = _read_reply(self.rfile)
+            except (ConnectionError, OSError):
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(b"-ERR expected an array of bulk strings\r\n")
+                continue
+            self.wfile.write(server.handle_command([bytes(arg) for arg in command]))
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalRedisServer:
+    """
+    Minimal in-process server speaking the Redis protocol, supporting PING, SELECT, GET, SET and DEL.
+    It stands in for a real Redis server in tests and single-node setups.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._data: Dict[bytes, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _RedisRequestHandler)
+        self._server.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def handle_command(self, command: List[bytes]) -> bytes:
+        name = command[0].upper()
+        with self._lock:
+            if name == b"PING":
+                return b"+PONG\r\n"
+            if name == b"SELECT":
+                return b"+OK\r\n"
+            if name == b"GET" and len(command) == 2:
+                value = self._data.get(command[1])
+                if value is None:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(value), value)
+            if name == b"SET" and len(command) == 3:
+                self._data[command[1]] = command[2]
+                return b"+OK\r\n"
+            if name == b"DEL":
+                removed = sum(self._data.pop(key, None) is not None for key in command[1:])
+                return b":%d\r\n" % removed
+        return b"-ERR unsupported command '%s'\r\n" % name
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """
+        Serve in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def state_store_from_url(url: str) -> StateStore:
+    """
+    Create a state store from a URL: "memory://", "sqlite:///path/to/file.db",
+    "lmdb:///path/to/file.lmdb" or "redis://host:port/db".
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return InMemoryStateStore()
+    if parsed.scheme == "sqlite":
+        return SQLiteStateStore(parsed.path)
+    if parsed.scheme == "lmdb":
+        return LMDBStateStore(parsed.path)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/")) if parsed.path.lstrip("/") else 0
+        return RedisStateStore(parsed.hostname or "127.0.0.1", parsed.port or 6379, db=db)
+    raise ValueError(f"Unknown state store URL '{url}', expected memory://, sqlite://, lmdb:// or redis://")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a minimal Redis-protocol state store.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = LocalRedisServer(args.host, args.port)
+    print(f"Serving Redis protocol on {server.address[0]}:{server.address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,198 @@
+"""
+WebSocket transport of the environment service API.
+
+A client opens one connection to `/api/ws` and multiplexes the calls of many environments over it,
+which saves the HTTP request, routing and validation overhead of every agent turn. Each message is
+a JSON object `{"id": ..., "op": ..., **fields}` and is answered by `{"id": ..., "result": ...}` or
+`{"id": ..., "error": ...}` once the operation completes. Operations run concurrently, so responses
+may come back in a different order than the requests; match them by id.
+
+Operations and their fields:
+    initialize: env_name, seed, env_kwargs, job_id
+    batch_initialize: requests, job_id, include_task_prompt, include_tools_schema
+    reset: env_id, seed, options
+    step: env_id, action
+    batch_step: steps
+    close: env_id
+    batch_close: env_ids, job_id
+    action_space, task_prompt, allow_parallel_tool_call, tools_schema_openai: env_id
+
+Each result is the body the matching HTTP endpoint would return.
+"""
+
+import json
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import aiohttp
+from verl_agent_env.serialization import dumps_json
+
+WEBSOCKET_PATH = "/api/ws"
+
+# Required fields of each operation
+OPERATION_FIELDS = {
+    "initialize": ("env_name",),
+    "batch_initialize": ("requests",),
+    "reset": ("env_id",),
+    "step": ("env_id", "action"),
+    "batch_step": ("steps",),
+    "close": ("env_id",),
+    "batch_close": (),
+    "action_space": ("env_id",),
+    "task_prompt": ("env_id",),
+    "allow_parallel_tool_call": ("env_id",),
+    "tools_schema_openai": ("env_id",),
+}
+
+
+def encode_message(message: Any) -> str:
+    return dumps_json(message).decode("utf-8")
+
+
+def validate_message(message: dict):
+    """
+    Raises:
+        ValueError: If the operation is unknown or a required field is missing.
+    """
+    op = message.get("op")
+    if op not in OPERATION_FIELDS:
+        raise ValueError(f"Unknown operation '{op}', expected one of {sorted(OPERATION_FIELDS)}")
+    missing = [field for field in OPERATION_FIELDS[op] if field not in message]
+    if missing:
+        raise ValueError(f"Operation '{op}' is missing the fields {missing}")
+
+
+async def serve_websocket(websocket, run_operation: Callable[[dict], Awaitable[Any]]):
+    """
+    Serve the operations sent over an accepted WebSocket until the client disconnects.
+
+    Args:
+        websocket (fastapi.WebSocket): The accepted WebSocket.
+        run_operation (Callable[[dict], Awaitable[Any]]): Runs one decoded message and returns its result.
+    """
+    from fastapi import WebSocketDisconnect
+
+    send_lock = asyncio.Lock()
+    pending: Set[asyncio.Task] = set()
+    connected = True
+
+    async def send(message: dict):
+        if not connected:
+            return
+        async with send_lock:
+            await websocket.send_text(encode_message(message))
+
+    async def handle(message: dict):
+        request_id = message.get("id")
+        try:
+            validate_message(message)
+            response = {"id": request_id, "result": await run_operation(message)}
+        except KeyError as e:
+            # The interface reports unknown env_ids with a KeyError carrying the full message
+            response = {"id": request_id, "error": e.args[0] if e.args else str(e)}
+        except Exception as e:
+            response = {"id": request_id, "error": str(e)}
+        try:
+            await send(response)
+        except Exception:
+            pass
+
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError as e:
+                await send({"id": None, "error": f"Invalid JSON message: {e}"})
+                continue
+            if not isinstance(message, dict):
+                await send({"id": None, "error": "Messages must be JSON objects"})
+                continue
+            task = asyncio.create_task(handle(message))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connected = False
+        # Let in-flight operations finish so environments are not left half-initialized
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+class WebSocketClient:
+    """
+    Asynchronous client of the WebSocket transport.
+
+    Example:
+        async with WebSocketClient("http://localhost:8000") as client:
+            result = await client.request("initialize", env_name="verl_env/frozen_lake-v1", seed=0)
+            step = await client.request("step", env_id=result["env_id"], action=action)
+    """
+
+    def __init__(self, base_url: str, session: Optional[aiohttp.ClientSession] = None) -> None:
+        url = base_url.rstrip("/")
+        if url.startswith("http"):
+            url = "ws" + url[len("http"):]
+        self.url = url + WEBSOCKET_PATH
+        self._session = session
+        self._owns_session = session is None
+        self._websocket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._futures: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    async def connect(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        self._websocket = await self._session.ws_connect(self.url, max_msg_size=0)
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def _read(self):
+        try:
+            async for message in self._websocket:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                response = json.loads(message.data)
+                future = self._futures.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        finally:
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("WebSocket connection closed"))
+            self._futures = {}
+
+    async def request(self, op: str, **fields) -> Any:
+        """
+        Send one operation and wait for its result.
+
+        Raises:
+            RuntimeError: If the server reports an error for the operation.
+        """
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+        await self._websocket.send_str(encode_message(dict(fields, id=request_id, op=op)))
+        return await future
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader is not None:
+            await self._reader
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,29 @@
+import asyncio
+
+from verl_agent_env.benchmark import find_regressions, run_benchmark, server_stats, start_server, stop_server
+
+
+def test_benchmark_drives_scripted_episodes():
+    process, url = start_server("app")
+    try:
+        for transport in ("http", "batch", "ws"):
+            result = asyncio.run(run_benchmark(url, "verl_env/echo-v0", {"episode_length": 3}, concurrency=4, num_steps=5, transport=transport))
+            assert result["num_errors"] == 0
+            assert result["num_steps"] == 20
+            assert result["steps_per_second"] > 0
+            # Every episode is truncated after 3 steps and reset once
+            assert result["latency"]["reset"]["count"] == 4
+        stats = server_stats(url)
+        assert stats["num_environments"] == 0
+        assert "p99" in stats["event_loop_lag_ms"]
+    finally:
+        stop_server(process)
+
+
+def test_find_regressions_compares_matching_runs():
+    def run(steps_per_second, concurrency=100):
+        return {"env_name": "verl_env/echo-v0", "transport": "http", "accept": "json", "concurrency": concurrency, "steps_per_second": steps_per_second}
+
+    baseline = [run(1000.0), run(500.0, concurrency=1000)]
+    assert find_regressions([run(950.0), run(100.0, concurrency=10)], baseline, max_regression=0.1) == []
+    assert len(find_regressions([run(850.0)], baseline, max_regression=0.1)) == 1
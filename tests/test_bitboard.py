@@ -0,0 +1,70 @@
+import asyncio
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban.bitboard import Bitboard, reverse_playing_bitboard
+from verl_agent_env.envs.sokoban.room_utils import place_boxes_and_player, reverse_playing, room_topology_generation
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+
+def test_bitboard_round_trip_and_reachability():
+    env = SokobanEnv(dim_room=(9, 11), num_boxes=3, action_mode="push_box")
+    asyncio.run(env.reset(seed=4))
+    board = Bitboard.from_room(env.room_fixed, env.room_state)
+    assert (board.room_state() == env.room_state).all()
+    assert board.uncovered_targets() == env.uncovered_targets and not board.is_solved()
+    # Walking distances agree with the breadth first search of the grid engine
+    reachable = env._reachability()
+    for row in range(9):
+        for col in range(11):
+            assert board.distance(board.cell(row, col)) == reachable.get((row, col))
+    assert bin(board.reachable()).count("1") == len(reachable)
+    assert board.key() == board.copy().key()
+
+
+def test_reverse_playing_bitboard_matches_grid():
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        while True:
+            try:
+                room = place_boxes_and_player(room_topology_generation((9, 9), 0.35, 30, rng=rng), 3, False, rng=rng)
+                break
+            except RuntimeError:
+                continue
+        room_structure = room.copy()
+        room_structure[room_structure == 5] = 1
+        room_state = room.copy()
+        room_state[room_state == 2] = 4
+        expected_room, expected_score, expected_mapping = reverse_playing(room_state.copy(), room_structure)
+        best_room, score, box_mapping = reverse_playing_bitboard(room_state.copy(), room_structure)
+        assert score == expected_score
+        assert (best_room == expected_room).all()
+        assert box_mapping == expected_mapping
+
+
+def test_bitboard_engine_plays_like_grid_engine():
+    for action_mode in ("move", "push_box"):
+        envs = [SokobanEnv(dim_room=(8, 8), num_boxes=2, action_mode=action_mode, engine=engine) for engine in ("grid", "bitboard")]
+        for env in envs:
+            asyncio.run(env.reset(seed=1))
+        assert not envs[1].batch_step_supported
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            if action_mode == "move":
+                name = ["push_up", "push_down", "push_left", "push_right", "move_up", "move_down", "move_left", "move_right"][rng.integers(8)]
+                action = {"tool_calls": [{"id": "call", "type": "function", "function": {"name": name}}]}
+            else:
+                row, col = (int(x) for x in np.argwhere((envs[0].room_state == 3) | (envs[0].room_state == 4))[rng.integers(2)])
+                direction = ["up", "down", "left", "right"][rng.integers(4)]
+                arguments = f'{{"row": {row}, "col": {col}, "direction": "{direction}"}}'
+                action = {"tool_calls": [{"id": "call", "type": "function", "function": {"name": "push_box", "arguments": arguments}}]}
+            grid_result, board_result = (asyncio.run(env.step(action)) for env in envs)
+            assert grid_result[1:] == board_result[1:]
+            assert grid_result[0] == board_result[0]
+            assert (envs[0].room_state == envs[1].room_state).all()
+            if grid_result[2]:
+                break
+        # Snapshots restore the bitboards too
+        restored = SokobanEnv(dim_room=(8, 8), num_boxes=2, action_mode=action_mode, engine="bitboard")
+        restored.restore(envs[1].snapshot())
+        assert (restored._board.room_state() == envs[1].room_state).all()
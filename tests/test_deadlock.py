@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban.deadlock import dead_squares, is_freeze_deadlock
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+from verl_agent_env.envs.sokoban.vec_env import step_sokoban_envs
+
+ROOM_FIXED = [
+    [0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 0],
+    [0, 1, 1, 1, 1, 0],
+    [0, 1, 1, 2, 2, 0],
+    [0, 0, 0, 0, 0, 0],
+]
+
+
+def _env(room_state, terminate_on_deadlock=True):
+    env = SokobanEnv(dim_room=(5, 6), num_boxes=2, terminate_on_deadlock=terminate_on_deadlock, room_setup={
+        "room_fixed": ROOM_FIXED,
+        "room_state": room_state,
+        "box_mapping": {"(3, 3)": [2, 2], "(3, 4)": [2, 3]},
+    })
+    asyncio.run(env.reset())
+    return env
+
+
+def _action(name):
+    return {"tool_calls": [{"id": "call", "type": "function", "function": {"name": name}}]}
+
+
+def test_dead_squares_and_freeze_deadlocks():
+    room_fixed = np.array(ROOM_FIXED)
+    dead = dead_squares(room_fixed)
+    # Corners and the top row are dead, the bottom row right of its corner leads to the targets
+    assert dead[1].tolist() == [False, True, True, True, True, False]
+    assert dead[3].tolist() == [False, True, False, False, False, False]
+    assert not dead[0].any()
+
+    # Two boxes side by side against the bottom wall freeze each other, unless both are on targets
+    room_state = np.array(ROOM_FIXED)
+    room_state[3, 1:3] = 4
+    assert is_freeze_deadlock(room_fixed, room_state, 3, 2, dead.tolist())
+    room_state = np.array(ROOM_FIXED)
+    room_state[3, 3:5] = 3
+    assert not is_freeze_deadlock(room_fixed, room_state, 3, 3, dead.tolist())
+    # A lone box against a wall can still slide along it
+    room_state = np.array(ROOM_FIXED)
+    room_state[3, 2] = 4
+    assert not is_freeze_deadlock(room_fixed, room_state, 3, 2, dead.tolist())
+
+
+def test_pushing_into_a_corner_truncates_the_episode():
+    room_state = [
+        [0, 0, 0, 0, 0, 0],
+        [0, 1, 1, 1, 1, 0],
+        [0, 1, 4, 4, 1, 0],
+        [0, 1, 5, 2, 2, 0],
+        [0, 0, 0, 0, 0, 0],
+    ]
+    env = _env(room_state)
+    twin = _env(room_state)
+    _, _, done, truncated, info = asyncio.run(env.step(_action("push_up")))
+    assert not done and truncated and info["deadlock"]
+    # The batch engine flags the same step
+    _, _, done, truncated, info = step_sokoban_envs([twin], [_action("push_up")])[0]
+    assert not done and truncated and info["deadlock"]
+
+    # The flag survives a state round trip, and is off by default
+    restored = SokobanEnv(dim_room=(5, 6), num_boxes=2, terminate_on_deadlock=True)
+    restored.set_state(env.get_state())
+    assert asyncio.run(restored.step(_action("move_down")))[3]
+    env = _env(room_state, terminate_on_deadlock=False)
+    _, _, done, truncated, info = asyncio.run(env.step(_action("push_up")))
+    assert not truncated and "deadlock" not in info
@@ -0,0 +1,120 @@
+import copy
+import random
+import asyncio
+
+import gymnasium as gym
+import numpy as np
+from gymnasium.envs.toy_text.frozen_lake import generate_random_map
+
+from verl_agent_env import interface
+from verl_agent_env.envs.frozen_lake import FrozenLakeEnv, step_frozen_lake_envs, transition_table
+
+TOOL_NAMES = ["move_left", "move_down", "move_right", "move_up"]
+
+
+def _action(action_id, call_id="call_0"):
+    return {"tool_calls": [{"id": call_id, "type": "function", "function": {"name": TOOL_NAMES[action_id]}}]}
+
+
+def test_transition_table_matches_gymnasium():
+    for is_slippery in (False, True):
+        desc = generate_random_map(size=6, p=0.7, seed=3)
+        reference = gym.make("FrozenLake-v1", desc=desc, is_slippery=is_slippery).unwrapped
+        table = transition_table(np.asarray(desc, dtype="c"), is_slippery)
+        assert table.shape == (36, 4, 3 if is_slippery else 1)
+        for s in range(36):
+            for a in range(4):
+                expected = [next_state for _, next_state, _, _ in reference.P[s][a]]
+                # gymnasium keeps a single outcome for holes and the goal, the table repeats it
+                assert table[s, a].tolist() == expected * (table.shape[2] // len(expected))
+
+
+def test_episodes_match_gymnasium():
+    async def run():
+        rng = random.Random(0)
+        for is_slippery in (False, True):
+            for seed in range(4):
+                env = FrozenLakeEnv(map_size=4, is_slippery=is_slippery)
+                obs, _ = await env.reset(seed=seed)
+                reference = gym.make(
+                    "FrozenLake-v1",
+                    desc=generate_random_map(size=4, p=0.8, seed=seed),
+                    is_slippery=is_slippery
+                )
+                s, _ = reference.reset(seed=seed)
+                assert f"position {s // 4},{s % 4}" in obs[0]["content"]
+                # Past the end of the episode, to cover steps from holes, the goal and truncation
+                for step in range(105):
+                    action_id = rng.randrange(4)
+                    obs, reward, terminated, truncated, _ = await env.step(_action(action_id))
+                    s, expected_reward, expected_terminated, expected_truncated, _ = reference.step(action_id)
+                    assert f"position {s // 4},{s % 4}" in obs[0]["content"]
+                    assert (reward, terminated, truncated) == (expected_reward, expected_terminated, expected_truncated)
+
+    asyncio.run(run())
+
+
+def test_state_round_trip():
+    async def run():
+        env = FrozenLakeEnv(map_size=5, is_slippery=True)
+        await env.reset(seed=11)
+        await env.step(_action(1))
+        other = FrozenLakeEnv(map_size=5, is_slippery=True)
+        other.set_state(env.get_state())
+        for step in range(20):
+            assert await other.step(_action(step % 4, f"call_{step}")) == await env.step(_action(step % 4, f"call_{step}"))
+
+    asyncio.run(run())
+
+
+def test_batched_steps_match_single_steps():
+    async def run():
+        rng = random.Random(1)
+        envs, twins = [], []
+        for seed in range(10):
+            kwargs = {"map_size": rng.choice([4, 6]), "is_slippery": rng.random() < 0.5}
+            env, twin = FrozenLakeEnv(**kwargs), FrozenLakeEnv(**kwargs)
+            await env.reset(seed=seed)
+            await twin.reset(seed=seed)
+            envs.append(env)
+            twins.append(twin)
+
+        for step in range(30):
+            actions = [
+                {"tool_calls": []} if rng.random() < 0.05 else _action(rng.randrange(4), f"call_{step}")
+                for _ in envs
+            ]
+            expected = [await twin.step(action) for twin, action in zip(twins, actions)]
+            assert step_frozen_lake_envs(envs, actions) == expected
+            assert [env.get_state() for env in envs] == [twin.get_state() for twin in twins]
+
+    asyncio.run(run())
+
+
+def test_take_steps_routes_frozen_lake_envs_through_batch_step():
+    async def run():
+        env_ids = [
+            (await interface.initialize_environment("verl_env/frozen_lake-v1", seed=i, env_kwargs={"map_size": 4, "is_slippery": True}))["env_id"]
+            for i in range(3)
+        ]
+        twins = [copy.deepcopy(interface.environments[env_id]) for env_id in env_ids]
+        calls = []
+        original = interface.batch_step_functions["verl_env/frozen_lake-v1"]
+
+        def spy(envs, actions):
+            calls.append(len(envs))
+            return original(envs, actions)
+
+        interface.batch_step_functions["verl_env/frozen_lake-v1"] = spy
+        try:
+            results = await interface.take_steps([(env_id, _action(2)) for env_id in env_ids])
+        finally:
+            interface.batch_step_functions["verl_env/frozen_lake-v1"] = original
+            await interface.close_environments(env_ids)
+
+        assert calls == [3]
+        for twin, result in zip(twins, results):
+            observation, reward, done, truncated, info = await twin.step(_action(2))
+            assert (result["observation"], result["reward"], result["done"], result["truncated"]) == (observation, reward, done, truncated)
+
+    asyncio.run(run())
@@ -27,3 +27,118 @@ def test_initialize_close_environment():
     assert isinstance(close_result, dict)
     assert "message" in close_result
     assert close_result["message"] == f"Environment with ID '{result['env_id']}' closed successfully."
+
+
+def test_take_steps_reports_per_env_results():
+    import asyncio
+    from verl_agent_env.interface import take_steps
+
+    async def run():
+        init_result = await initialize_environment("verl_env/frozen_lake-v1", seed=0, env_kwargs={"map_size": 4})
+        env_id = init_result["env_id"]
+        action = {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "move_right", "arguments": "{}"}}]
+        }
+        results = await take_steps([(env_id, action), ("missing-env", action)])
+        await close_environment(env_id)
+        return env_id, results
+
+    env_id, results = asyncio.run(run())
+
+    assert len(results) == 2
+    assert results[0]["env_id"] == env_id
+    assert "error" not in results[0]
+    assert results[0]["observation"][0]["tool_call_id"] == "call_0"
+    assert results[1]["env_id"] == "missing-env"
+    assert "not found" in results[1]["error"]
+
+
+def test_initialize_and_close_environments_by_job_id():
+    import asyncio
+    from verl_agent_env import interface
+    from verl_agent_env.interface import initialize_environments, close_environments
+
+    async def run():
+        init_results = await initialize_environments(
+            [
+                {"env_name": "verl_env/countdown-v0", "seed": 0, "job_id": "job-a"},
+                {"env_name": "verl_env/countdown-v0", "seed": 1, "job_id": "job-a"},
+                {"env_name": "verl_env/not-registered"},
+            ],
+            include_task_prompt=True,
+        )
+        close_results = await close_environments(job_id="job-a")
+        return init_results, close_results
+
+    init_results, close_results = asyncio.run(run())
+
+    env_ids = [result["env_id"] for result in init_results[:2]]
+    assert all(result["task_prompt"] for result in init_results[:2])
+    assert "not found" in init_results[2]["error"]
+    assert sorted(result["env_id"] for result in close_results) == sorted(env_ids)
+    assert all(env_id not in interface.environments for env_id in env_ids)
+
+
+def test_configure_executor_offloads_env_methods():
+    import asyncio
+    from verl_agent_env import interface
+    from verl_agent_env.interface import configure_executor, take_step
+
+    async def run():
+        init_result = await initialize_environment("verl_env/countdown-v0", seed=0)
+        env_id = init_result["env_id"]
+        action = {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "test_equation", "arguments": "{\"equation\": \"1 + 1\"}"}}]
+        }
+        step_result = await take_step(env_id, action)
+        attempts = len(interface.environments[env_id]._attempts)
+        await close_environment(env_id)
+        return step_result, attempts
+
+    configure_executor("verl_env/countdown-v0", "thread", max_workers=2)
+    try:
+        step_result, attempts = asyncio.run(run())
+    finally:
+        configure_executor("verl_env/countdown-v0", None)
+
+    assert step_result["info"]["attempts"][0]["eval"] == 2
+    assert attempts == 1
+    assert "verl_env/countdown-v0" not in interface.env_executors
+
+
+def test_eviction_closes_least_recently_used_and_idle_environments():
+    import asyncio
+    from verl_agent_env import interface
+    from verl_agent_env.interface import configure_eviction, get_task_prompt, sweep_idle_environments
+
+    async def run():
+        env_ids = []
+        for seed in range(3):
+            result = await initialize_environment("verl_env/countdown-v0", seed=seed)
+            env_ids.append(result["env_id"])
+        # Touch the oldest environment, so the second one becomes the least recently used
+        get_task_prompt(env_ids[0])
+        result = await initialize_environment("verl_env/countdown-v0", seed=3)
+        env_ids.append(result["env_id"])
+        alive_after_capacity = [env_id in interface.environments for env_id in env_ids]
+
+        configure_eviction(idle_ttl=0.0)
+        num_idle = await sweep_idle_environments()
+        return alive_after_capacity, num_idle
+
+    baseline = dict(interface.eviction_stats)
+    configure_eviction(max_environments=len(interface.environments) + 3)
+    try:
+        alive_after_capacity, num_idle = asyncio.run(run())
+    finally:
+        configure_eviction()
+
+    assert alive_after_capacity == [True, False, True, True]
+    assert num_idle == 3
+    assert interface.eviction_stats["capacity"] - baseline["capacity"] == 1
+    assert interface.eviction_stats["idle"] - baseline["idle"] == num_idle
+    assert len(interface.environments) == 0
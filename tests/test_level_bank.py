@@ -0,0 +1,82 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from verl_agent_env.envs.sokoban.level_bank import LevelBank, LevelBankWriter, box_displacement
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+
+def _write_bank(path, num_levels=8):
+    levels = []
+    with LevelBankWriter(str(path), max_height=7, max_width=7, max_boxes=2) as writer:
+        for index in range(num_levels):
+            env = SokobanEnv(dim_room=(6, 6) if index % 2 else (7, 7), num_boxes=1 + index % 2)
+            asyncio.run(env.reset(seed=index))
+            writer.add(env.room_fixed, env.room_state, env.box_mapping, difficulty=box_displacement(env.box_mapping))
+            levels.append(env)
+    return levels
+
+
+def test_level_bank_round_trip(tmp_path):
+    path = tmp_path / "levels.bank"
+    levels = _write_bank(path)
+    bank = LevelBank(str(path))
+    assert len(bank) == len(levels)
+    for index, env in enumerate(levels):
+        room_fixed, room_state, box_mapping, difficulty = bank.load(index)
+        assert (room_fixed == env.room_fixed).all()
+        assert (room_state == env.room_state).all()
+        assert box_mapping == {tuple(int(x) for x in k): tuple(int(x) for x in v) for k, v in env.box_mapping.items()}
+        assert difficulty == box_displacement(env.box_mapping)
+    with pytest.raises(IndexError):
+        bank.load(len(levels))
+
+    # Appending keeps the earlier levels
+    with LevelBankWriter(str(path), max_height=7, max_width=7, max_boxes=2) as writer:
+        writer.add(*bank.load(0)[:3], difficulty=99)
+    assert len(LevelBank(str(path))) == len(levels) + 1
+    with pytest.raises(ValueError):
+        LevelBankWriter(str(path), max_height=8, max_width=8, max_boxes=2)
+
+
+def test_level_bank_sampling_by_difficulty(tmp_path):
+    path = tmp_path / "levels.bank"
+    _write_bank(path, num_levels=12)
+    bank = LevelBank(str(path))
+    rng = np.random.default_rng(0)
+    difficulties = bank.difficulty_counts((6, 6), 2)
+    assert sum(difficulties.values()) == 6
+    low = min(difficulties)
+    for _ in range(20):
+        room_fixed, _, box_mapping, difficulty = bank.load(bank.sample(rng, (6, 6), 2, [low, low]))
+        assert room_fixed.shape == (6, 6) and len(box_mapping) == 2 and difficulty == low
+    with pytest.raises(ValueError):
+        bank.sample(rng, (6, 6), 3)
+
+
+def test_sokoban_reset_from_level_bank(tmp_path):
+    path = tmp_path / "levels.bank"
+    _write_bank(path)
+    bank = LevelBank(str(path))
+
+    async def run():
+        env = SokobanEnv(dim_room=(7, 7), num_boxes=1, level_bank=str(path))
+        _, info = await env.reset(seed=0, options={"level_index": 3})
+        assert info["level_index"] == 3
+        assert env.dim_room == (6, 6) and env.num_boxes == 2
+        assert (env.room_state == bank.load(3)[1]).all()
+
+        # A state saved from a bank level restores into an environment built with other arguments
+        restored = SokobanEnv(dim_room=(7, 7), num_boxes=1)
+        restored.set_state(env.get_state())
+        assert (restored.room_state == env.room_state).all() and restored.num_boxes == 2
+
+        # Without a level index, a level of the environment's size is drawn, reproducibly per seed
+        env = SokobanEnv(dim_room=(7, 7), num_boxes=1, level_bank=str(path))
+        first = [(await env.reset(seed=seed))[1]["level_index"] for seed in range(5)]
+        second = [(await env.reset(seed=seed))[1]["level_index"] for seed in range(5)]
+        assert first == second
+        assert all(index % 2 == 0 for index in first)
+
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban.level_hash import LevelDedupIndex, canonical_level_hash
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+ROOM_FIXED = np.array([
+    [0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 0, 0],
+    [0, 1, 1, 1, 1, 0],
+    [0, 1, 0, 1, 2, 0],
+    [0, 0, 0, 0, 0, 0],
+])
+ROOM_STATE = np.array([
+    [0, 0, 0, 0, 0, 0],
+    [0, 5, 1, 1, 0, 0],
+    [0, 1, 1, 4, 1, 0],
+    [0, 1, 0, 1, 2, 0],
+    [0, 0, 0, 0, 0, 0],
+])
+
+
+def test_hash_is_invariant_to_symmetries_padding_and_walking():
+    expected = canonical_level_hash(ROOM_FIXED, ROOM_STATE)
+    for flip in (False, True):
+        for turns in range(4):
+            room_fixed = np.rot90(np.fliplr(ROOM_FIXED) if flip else ROOM_FIXED, turns)
+            room_state = np.rot90(np.fliplr(ROOM_STATE) if flip else ROOM_STATE, turns)
+            assert canonical_level_hash(room_fixed, room_state) == expected
+    # Extra outer walls
+    assert canonical_level_hash(np.pad(ROOM_FIXED, ((0, 3), (1, 0))), np.pad(ROOM_STATE, ((0, 3), (1, 0)))) == expected
+    # The player walked elsewhere in its region
+    walked = ROOM_STATE.copy()
+    walked[1, 1], walked[3, 1] = 1, 5
+    assert canonical_level_hash(ROOM_FIXED, walked) == expected
+
+    # A moved box makes another puzzle
+    pushed = ROOM_STATE.copy()
+    pushed[2, 3], pushed[2, 2] = 1, 4
+    assert canonical_level_hash(ROOM_FIXED, pushed) != expected
+
+
+def test_dedup_index_streams_and_persists(tmp_path):
+    path = str(tmp_path / "levels.hashes")
+    rooms = []
+    for seed in range(40):
+        env = SokobanEnv(dim_room=(5, 5), num_boxes=1)
+        asyncio.run(env.reset(seed=seed))
+        rooms.append((env.room_fixed, env.room_state))
+    with LevelDedupIndex(path) as index:
+        new = [index.add_level(*room) for room in rooms]
+        # Tiny rooms repeat
+        assert 0 < sum(new) < len(rooms) and len(index) == sum(new)
+    with LevelDedupIndex(path) as index:
+        assert len(index) == sum(new)
+        assert not any(index.add_level(*room) for room in rooms)
+        assert canonical_level_hash(*rooms[0]) in index
@@ -0,0 +1,47 @@
+import time
+import asyncio
+
+from verl_agent_env import interface
+from verl_agent_env.envs.sokoban import pregeneration
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+
+def _wait_for_depth(key, depth, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        queue = pregeneration.get_pregeneration_stats()["queues"].get(key)
+        if queue is not None and queue["depth"] >= depth:
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"The queue of {key} did not reach {depth} rooms")
+
+
+def test_resets_take_pregenerated_rooms():
+    pregeneration.configure_pregeneration(queue_size=3, max_workers=2)
+    try:
+        async def reset(env):
+            return await env.reset()
+
+        env = SokobanEnv(dim_room=(6, 6), num_boxes=1)
+        # The first reset of a configuration misses and starts filling its queue
+        asyncio.run(reset(env))
+        key = f"6x6/1/{env.num_gen_steps}"
+        _wait_for_depth(key, 3)
+
+        rooms = set()
+        for _ in range(3):
+            asyncio.run(reset(env))
+            assert env.room_state.shape == (6, 6) and (env.room_state == 5).sum() == 1
+            assert len(env.box_mapping) == 1
+            rooms.add(env.room_state.tobytes())
+        # Every worker generates its own rooms
+        assert len(rooms) > 1
+
+        stats = interface.get_stats()["sokoban_pregeneration"]
+        assert stats["hits"] == 3 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.75
+        assert stats["generated"] >= 3
+        assert stats["queues"][key]["depth"] + stats["queues"][key]["in_flight"] <= 3
+    finally:
+        pregeneration.configure_pregeneration(queue_size=0)
+    assert pregeneration.pop_room((6, 6), 1, 20) is None
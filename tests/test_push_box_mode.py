@@ -0,0 +1,85 @@
+import json
+import asyncio
+
+from verl_agent_env import interface
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+from verl_agent_env.envs.sokoban.solver import solve
+
+DIRECTION_NAMES = ["up", "down", "left", "right"]
+DIRECTION_CHANGES = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def _push_box(row, col, direction, call_id="call"):
+    arguments = json.dumps({"row": row, "col": col, "direction": direction})
+    return {"tool_calls": [{"id": call_id, "type": "function", "function": {"name": "push_box", "arguments": arguments}}]}
+
+
+def _solution_pushes(env):
+    # Turn the move-level solution of the solver into push_box calls
+    row, col = env.player_position
+    pushes = []
+    for action in solve(env.room_fixed, env.room_state)["actions"]:
+        direction = (action - 1) % 4
+        row_change, col_change = DIRECTION_CHANGES[direction]
+        row, col = row + row_change, col + col_change
+        if action <= 4:
+            pushes.append((row, col, DIRECTION_NAMES[direction]))
+    return pushes
+
+
+def test_push_box_mode_solves_rooms_one_call_per_push():
+    async def run():
+        for seed in range(4):
+            env = SokobanEnv(dim_room=(7, 7), num_boxes=2, action_mode="push_box")
+            await env.reset(seed=seed)
+            assert [tool["name"] for tool in env.action_space_json_schema] == ["push_box"]
+            pushes = _solution_pushes(env)
+            total_reward = 0
+            for index, (row, col, direction) in enumerate(pushes):
+                observation, reward, done, truncated, info = await env.step(_push_box(row, col, direction, f"call_{index}"))
+                assert "ERROR" not in observation[0]["content"]
+                assert info["action.moved_box"] and info["action.num_moves"] >= 1
+                total_reward += reward
+            assert done and info["all_boxes_on_target"]
+            # One step penalty per push, plus the box and completion rewards
+            assert round(total_reward, 6) == round(-0.1 * len(pushes) + 2 + 10, 6)
+
+    asyncio.run(run())
+
+
+def test_push_box_mode_reports_invalid_calls():
+    async def run():
+        env = SokobanEnv(dim_room=(3, 5), num_boxes=1, action_mode="push_box", room_setup={
+            "room_fixed": [[0, 0, 0, 0, 0], [0, 1, 1, 2, 0], [0, 0, 0, 0, 0]],
+            "room_state": [[0, 0, 0, 0, 0], [0, 5, 4, 2, 0], [0, 0, 0, 0, 0]],
+            "box_mapping": {"(1, 3)": [1, 2]},
+        })
+        await env.reset()
+        for action, error in [
+            (_push_box(1, 1, "right"), "There is no box at position 1,1"),
+            (_push_box(1, 2, "up"), "cannot be pushed up"),
+            (_push_box(1, 2, "left"), "You cannot reach position 1,3"),
+            (_push_box(1, 2, "sideways"), "Unknown direction"),
+            ({"tool_calls": [{"id": "call", "type": "function", "function": {"name": "push_box", "arguments": "{}"}}]}, "missing argument"),
+        ]:
+            observation, reward, done, truncated, info = await env.step(action)
+            assert error in observation[0]["content"]
+            assert reward == -0.1 and not info["action.moved_box"]
+        observation, reward, done, truncated, info = await env.step(_push_box(1, 2, "right"))
+        assert done and reward == -0.1 + 1 + 10
+
+    asyncio.run(run())
+
+
+def test_push_box_mode_skips_the_batch_engine():
+    async def run():
+        env_id = (await interface.initialize_environment("verl_env/sokoban-v0", seed=0, env_kwargs={
+            "dim_room": [6, 6], "num_boxes": 1, "action_mode": "push_box"
+        }))["env_id"]
+        try:
+            results = await interface.take_steps([(env_id, _push_box(0, 0, "up"))])
+            assert "There is no box" in results[0]["observation"][0]["content"]
+        finally:
+            await interface.close_environments([env_id])
+
+    asyncio.run(run())
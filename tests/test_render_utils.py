@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban import render_utils
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+
+def _rooms(num_rooms=4):
+    envs = []
+    for seed in range(num_rooms):
+        env = SokobanEnv(dim_room=(6, 7), num_boxes=2)
+        asyncio.run(env.reset(seed=seed))
+        envs.append(env)
+    return envs
+
+
+def _tile_with_loops(room, atlas):
+    # Reference per-cell assembly
+    size = atlas.shape[1]
+    image = np.zeros((room.shape[0] * size, room.shape[1] * size, 3), dtype=np.uint8)
+    for i in range(room.shape[0]):
+        for j in range(room.shape[1]):
+            image[i * size:(i + 1) * size, j * size:(j + 1) * size] = atlas[room[i, j]]
+    return image
+
+
+def test_tile_rooms_matches_per_cell_assembly():
+    atlas = np.random.default_rng(0).integers(0, 256, size=(7, 16, 16, 3), dtype=np.uint8)
+    envs = _rooms()
+    for env in envs:
+        room = render_utils.surface_ids(env.room_state, env.room_fixed)
+        assert (render_utils.tile_rooms(room, atlas) == _tile_with_loops(room, atlas)).all()
+
+    rooms = render_utils.surface_ids([env.room_state for env in envs], [env.room_fixed for env in envs])
+    batch = render_utils.tile_rooms(rooms, atlas)
+    assert batch.shape == (len(envs), 6 * 16, 7 * 16, 3)
+    for image, room in zip(batch, rooms):
+        assert (image == _tile_with_loops(room, atlas)).all()
+
+
+def test_tiny_world_rendering():
+    envs = _rooms()
+    env = envs[0]
+    image = render_utils.room_to_tiny_world_rgb(env.room_state, env.room_fixed, scale=3)
+    assert image.shape == (18, 21, 3) and image.dtype == np.uint8
+    row, col = env.player_position
+    assert (image[row * 3:(row + 1) * 3, col * 3:(col + 1) * 3] == render_utils.TINY_WORLD_COLORS[5]).all()
+    assert (env.render(mode="tiny_rgb_array", scale=3) == image).all()
+
+    batch = render_utils.rooms_to_tiny_world_rgb(
+        np.stack([env.room_state for env in envs]), np.stack([env.room_fixed for env in envs]), scale=3
+    )
+    for batch_image, other in zip(batch, envs):
+        assert (batch_image == render_utils.room_to_tiny_world_rgb(other.room_state, other.room_fixed, scale=3)).all()
+
+    # Boxes keep their own colors, other cells the plain tiny world colors
+    colored = render_utils.room_to_tiny_world_rgb_FT(env.room_state, env.box_mapping, env.room_fixed, scale=3)
+    for target, box in env.box_mapping.items():
+        row, col = target
+        if env.room_state[row, col] == 2:
+            expected = render_utils.get_proper_tiny_box_surface(2, env.box_mapping, row, col)
+            assert (colored[row * 3, col * 3] == expected).all()
+    floor = env.room_state == 1
+    assert (colored[::3, ::3][floor] == image[::3, ::3][floor]).all()
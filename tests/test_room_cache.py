@@ -0,0 +1,50 @@
+import asyncio
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban import room_cache
+from verl_agent_env.envs.sokoban.room_utils import generate_room
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+
+def test_generate_room_is_a_function_of_the_generator_state():
+    first = generate_room(dim=(7, 7), num_steps=20, num_boxes=2, rng=np.random.default_rng(5))
+    second = generate_room(dim=(7, 7), num_steps=20, num_boxes=2, rng=np.random.default_rng(5))
+    assert (first[0] == second[0]).all() and (first[1] == second[1]).all() and first[2] == second[2]
+
+
+def test_seeded_resets_are_reproducible_and_cached():
+    room_cache.configure_room_cache(max_size=2)
+    try:
+        env = SokobanEnv(dim_room=(7, 7), num_boxes=2)
+        other = SokobanEnv(dim_room=(7, 7), num_boxes=2)
+        asyncio.run(env.reset(seed=11))
+        room = env.room_state.copy()
+        # Playing the room does not change the cached copy
+        env.room_state[env.room_state == 1] = 0
+        asyncio.run(other.reset(seed=11))
+        assert (other.room_state == room).all()
+        asyncio.run(other.reset(seed=12))
+        assert not (other.room_state == room).all()
+
+        stats = room_cache.get_room_cache_stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+        # The least recently used room is evicted
+        asyncio.run(other.reset(seed=13))
+        asyncio.run(other.reset(seed=11))
+        assert room_cache.get_room_cache_stats()["misses"] == 4
+    finally:
+        room_cache.configure_room_cache()
+
+
+def test_disk_cache_is_shared(tmp_path):
+    room_cache.configure_room_cache(max_size=0, directory=str(tmp_path))
+    try:
+        room_fixed, room_state, box_mapping = room_cache.seeded_room(3, (6, 6), 1, 20)
+        assert len(list(tmp_path.glob("*.npz"))) == 1
+        cached = room_cache.seeded_room(3, (6, 6), 1, 20)
+        assert (cached[0] == room_fixed).all() and (cached[1] == room_state).all() and cached[2] == box_mapping
+        stats = room_cache.get_room_cache_stats()
+        assert (stats["disk_hits"], stats["misses"]) == (1, 1)
+    finally:
+        room_cache.configure_room_cache()
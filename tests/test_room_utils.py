@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban.room_utils import (
+    generate_rooms,
+    place_boxes_and_player,
+    reverse_playing,
+    room_topologies_generation,
+    room_topology_generation,
+)
+
+
+def _start_room(seed, dim=(7, 7), num_boxes=2):
+    rng = np.random.default_rng(seed)
+    while True:
+        room = room_topology_generation(dim, 0.35, 24, rng=rng)
+        try:
+            room = place_boxes_and_player(room, num_boxes, False, rng=rng)
+            break
+        except RuntimeError:
+            continue
+    room_structure = room.copy()
+    room_structure[room_structure == 5] = 1
+    room_state = room.copy()
+    room_state[room_state == 2] = 4
+    return room_state, room_structure
+
+
+def test_reverse_playing_returns_valid_room():
+    room_state, room_structure = _start_room(1)
+    best_room, score, box_mapping = reverse_playing(room_state.copy(), room_structure)
+    assert score > 0
+    assert best_room.shape == room_structure.shape
+    assert (best_room == 5).sum() == 1
+    # Pulled boxes are marked 3, and every box of the mapping is off its target
+    assert len(box_mapping) == (room_structure == 2).sum()
+    for target, box in box_mapping.items():
+        assert room_structure[target] == 2
+        assert best_room[box] in (3, 4)
+        assert room_structure[box] != 2
+    assert ((best_room == 0) == (room_structure == 0)).all()
+
+
+def test_reverse_playing_is_reentrant():
+    rooms = [_start_room(seed) for seed in range(4)]
+    expected = [reverse_playing(state.copy(), structure) for state, structure in rooms]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda room: reverse_playing(room[0].copy(), room[1]), rooms * 2))
+    for (best_room, score, box_mapping), (expected_room, expected_score, expected_mapping) in zip(results, expected * 2):
+        assert score == expected_score
+        assert (best_room == expected_room).all()
+        assert box_mapping == expected_mapping
+
+
+def _is_connected(floor):
+    cells = {tuple(cell) for cell in np.argwhere(floor).tolist()}
+    stack = [next(iter(cells))]
+    seen = set(stack)
+    while stack:
+        row, col = stack.pop()
+        for neighbor in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+            if neighbor in cells and neighbor not in seen:
+                seen.add(neighbor)
+                stack.append(neighbor)
+    return seen == cells
+
+
+def test_batched_topologies_match_single_generation():
+    rng = np.random.default_rng(0)
+    levels = room_topologies_generation(2000, (8, 9), 0.35, 20, rng=rng)
+    assert levels.shape == (2000, 8, 9)
+    assert not levels[:, [0, -1], :].any() and not levels[:, :, [0, -1]].any()
+    assert all(_is_connected(level) for level in levels[:50])
+    # Same distribution of floors as the one room at a time generation
+    single = np.stack([room_topology_generation((8, 9), 0.35, 20, rng=rng) for _ in range(2000)])
+    assert abs(levels.mean() - single.mean()) < 0.01
+
+    # Equal generator states give equal rooms
+    first = generate_rooms(5, (7, 7), num_steps=20, num_boxes=2, rng=np.random.default_rng(1))
+    second = generate_rooms(5, (7, 7), num_steps=20, num_boxes=2, rng=np.random.default_rng(1))
+    assert len(first) == 5
+    for (room_fixed, room_state, box_mapping), other in zip(first, second):
+        assert (room_fixed == other[0]).all() and (room_state == other[1]).all() and box_mapping == other[2]
+        assert (room_state == 5).sum() == 1 and len(box_mapping) == 2
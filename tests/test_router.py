@@ -0,0 +1,79 @@
+import sys
+import time
+import socket
+import subprocess
+
+import requests
+from fastapi.testclient import TestClient
+from verl_agent_env.router import ConsistentHashRing, EnvironmentRouter
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_node(port):
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "verl_agent_env.app:app",
+        "--port", str(port), "--log-level", "warning"
+    ])
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Node on port {port} did not start")
+
+
+def test_consistent_hash_ring_only_moves_keys_of_removed_node():
+    ring = ConsistentHashRing(["n0", "n1", "n2"])
+    before = {key: ring.get(key) for key in map(str, range(1000))}
+    ring.remove("n1")
+    after = {key: ring.get(key) for key in before}
+    assert set(after.values()) == {"n0", "n2"}
+    assert all(after[key] == node for key, node in before.items() if node != "n1")
+
+
+def test_router_keeps_affinity_and_drops_unhealthy_nodes():
+    ports = [_free_port(), _free_port()]
+    processes = [_start_node(port) for port in ports]
+    try:
+        router = EnvironmentRouter(
+            {f"n{i}": f"http://127.0.0.1:{port}" for i, port in enumerate(ports)},
+            health_interval=0.1,
+            max_failures=1
+        )
+        action = {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "test_equation", "arguments": "{\"equation\": \"2 * 3\"}"}}]
+        }
+        with TestClient(router.build_app()) as client:
+            results = client.post("/api/environment/batch-initialize", json={
+                "requests": [{"env_name": "verl_env/countdown-v0", "seed": i} for i in range(4)]
+            }).json()["results"]
+            env_ids = [result["env_id"] for result in results]
+            assert sorted(env_id.split(".")[0] for env_id in env_ids) == ["n0", "n0", "n1", "n1"]
+
+            for env_id in env_ids:
+                response = client.post(f"/api/environment/{env_id}/step", json={"action": action}).json()
+                assert response["info"]["attempts"][0]["eval"] == 6
+
+            processes[1].terminate()
+            processes[1].wait()
+            deadline = time.time() + 10
+            while router.healthy["n1"] and time.time() < deadline:
+                time.sleep(0.1)
+            assert not router.healthy["n1"]
+
+            result = client.post("/api/environment/initialize", json={"env_name": "verl_env/countdown-v0"}).json()
+            assert result["env_id"].startswith("n0.")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from verl_agent_env import serialization
+from verl_agent_env.app import app
+from verl_agent_env.serialization import FAST_JSON_MEDIA_TYPE, dumps_json, loads, negotiate
+
+
+def test_negotiate_follows_accept_order():
+    assert negotiate(None) is None
+    assert negotiate("application/json") is None
+    assert negotiate(f"application/json, {FAST_JSON_MEDIA_TYPE}") is None
+    assert negotiate(f"{FAST_JSON_MEDIA_TYPE}, application/json") == FAST_JSON_MEDIA_TYPE
+    if serialization.msgpack is not None:
+        assert negotiate("application/x-msgpack;q=1.0") == "application/x-msgpack"
+
+
+def test_dumps_json_handles_numpy_values():
+    content = {"done": np.bool_(True), "reward": np.float32(0.5), "grid": np.arange(3, dtype=np.int8)}
+    assert json.loads(dumps_json(content)) == {"done": True, "reward": 0.5, "grid": [0, 1, 2]}
+
+
+@pytest.mark.parametrize("accept", [
+    FAST_JSON_MEDIA_TYPE,
+    pytest.param("application/msgpack", marks=pytest.mark.skipif(serialization.msgpack is None, reason="msgpack is not installed")),
+])
+def test_fast_responses_match_default_responses(accept):
+    action = {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "move_right", "arguments": "{}"}}]
+    }
+    with TestClient(app) as client:
+        responses = []
+        for headers in ({}, {"accept": accept}):
+            response = client.post("/api/environment/initialize", json={"env_name": "verl_env/frozen_lake-v1", "seed": 0, "env_kwargs": {"map_size": 4}}, headers=headers)
+            env_id = loads(response.content, response.headers["content-type"])["env_id"]
+            response = client.post(f"/api/environment/{env_id}/step", json={"action": action}, headers=headers)
+            responses.append((response.headers["content-type"], loads(response.content, response.headers["content-type"])))
+            client.post(f"/api/environment/{env_id}/close")
+
+    (default_type, default_result), (fast_type, fast_result) = responses
+    assert default_type == "application/json"
+    assert fast_type == ("application/json" if accept == FAST_JSON_MEDIA_TYPE else accept)
+    assert fast_result == default_result
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+from verl_agent_env.sharded_app import ShardedEnvironmentHost, parse_shard
+
+
+def test_sharded_host_routes_calls_to_owning_shard():
+    host = ShardedEnvironmentHost(num_shards=2)
+    action = {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "test_equation", "arguments": "{\"equation\": \"1 + 2\"}"}}]
+    }
+    with TestClient(host.build_app()) as client:
+        results = client.post("/api/environment/batch-initialize", json={
+            "requests": [{"env_name": "verl_env/countdown-v0", "seed": i} for i in range(4)]
+        }).json()["results"]
+        env_ids = [result["env_id"] for result in results]
+        assert sorted(parse_shard(env_id) for env_id in env_ids) == [0, 0, 1, 1]
+
+        # Every shard only knows its own environments, so these only succeed if routed correctly
+        for env_id in env_ids:
+            response = client.post(f"/api/environment/{env_id}/step", json={"action": action}).json()
+            assert response["info"]["attempts"][0]["eval"] == 3
+
+        step_results = client.post("/api/environment/batch-step", json={
+            "steps": [{"env_id": env_id, "action": action} for env_id in env_ids + ["s7.unknown"]]
+        }).json()["results"]
+        assert [result["env_id"] for result in step_results] == env_ids + ["s7.unknown"]
+        assert all(len(result["info"]["attempts"]) == 2 for result in step_results[:4])
+        assert "not found" in step_results[4]["error"]
+
+        close_results = client.post("/api/environment/batch-close", json={"env_ids": env_ids}).json()["results"]
+        assert all("closed successfully" in result["message"] for result in close_results)
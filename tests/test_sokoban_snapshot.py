@@ -0,0 +1,71 @@
+import asyncio
+import base64
+
+import pytest
+
+from verl_agent_env.envs.sokoban.sokoban import SokobanEnv
+
+
+def _play(env, actions):
+    for index, name in enumerate(actions):
+        action = {"tool_calls": [{"id": f"call_{index}", "type": "function", "function": {"name": name}}]}
+        asyncio.run(env.step(action))
+
+
+def test_snapshot_round_trip():
+    env = SokobanEnv(dim_room=(7, 7), num_boxes=2, terminate_on_deadlock=True)
+    asyncio.run(env.reset(seed=3))
+    _play(env, ["move_up", "move_right", "move_down", "move_left", "push_up", "push_right"])
+    snapshot = env.snapshot()
+    assert len(snapshot) < 100
+
+    restored = SokobanEnv(dim_room=(5, 5), num_boxes=1, terminate_on_deadlock=True)
+    restored.restore(snapshot)
+    assert (restored.room_fixed == env.room_fixed).all()
+    assert (restored.room_state == env.room_state).all()
+    assert restored.box_mapping == {tuple(int(x) for x in k): tuple(int(x) for x in v) for k, v in env.box_mapping.items()}
+    for name in ("dim_room", "num_boxes", "player_position", "num_env_steps", "max_steps", "reward_last",
+                 "boxes_on_target", "uncovered_targets", "deadlocked", "_last_tool_call_id"):
+        assert getattr(restored, name) == getattr(env, name), name
+    assert restored.snapshot() == snapshot
+
+    with pytest.raises(ValueError):
+        restored.restore(b"SOKOBANK" + snapshot[8:])
+
+
+def test_snapshot_branches_rollouts():
+    env = SokobanEnv(dim_room=(6, 6), num_boxes=1)
+    asyncio.run(env.reset(seed=0))
+    state = env.get_state()
+    assert set(state) == {"snapshot"} and base64.b64decode(state["snapshot"])[:4] == b"SOKS"
+
+    branches = []
+    for name in ("move_up", "move_down", "move_left", "move_right"):
+        branch = SokobanEnv(dim_room=(6, 6), num_boxes=1)
+        branch.set_state(state)
+        _play(branch, [name])
+        branches.append(branch.snapshot())
+    # The branches diverge from the shared snapshot without touching it
+    _play(env, ["move_up"])
+    assert env.snapshot() == branches[0]
+
+
+def test_set_state_accepts_json_form():
+    env = SokobanEnv(dim_room=(6, 6), num_boxes=1)
+    assert env.get_state() == {"room": None}
+    asyncio.run(env.reset(seed=1))
+    _play(env, ["move_up", "move_left"])
+    state = {
+        "room": env.serialize_room(),
+        "dim_room": list(env.dim_room),
+        "num_boxes": env.num_boxes,
+        "player_position": list(env.player_position),
+        "num_env_steps": env.num_env_steps,
+        "max_steps": env.max_steps,
+        "reward_last": env.reward_last,
+        "boxes_on_target": env.boxes_on_target,
+        "last_tool_call_id": env._last_tool_call_id,
+    }
+    restored = SokobanEnv(dim_room=(6, 6), num_boxes=1)
+    restored.set_state(state)
+    assert restored.snapshot() == env.snapshot()
@@ -0,0 +1,93 @@
+import copy
+import random
+import asyncio
+
+from verl_agent_env import interface
+from verl_agent_env.envs.sokoban.sokoban import ACTION_LOOKUP, SokobanEnv
+from verl_agent_env.envs.sokoban.vec_env import step_sokoban_envs
+
+TOOL_NAMES = [ACTION_LOOKUP[action].replace(" ", "_") for action in range(1, 9)]
+
+
+def _random_action(rng, call_id):
+    if rng.random() < 0.05:
+        return {"tool_calls": []}
+    return {"tool_calls": [{"id": call_id, "type": "function", "function": {"name": rng.choice(TOOL_NAMES)}}]}
+
+
+def _same(expected, result):
+    if isinstance(expected, Exception):
+        return type(expected) is type(result) and str(expected) == str(result)
+    return expected == result
+
+
+def test_vectorized_steps_match_sokoban_env():
+    async def run():
+        rng = random.Random(0)
+        envs = []
+        for seed in range(12):
+            env = SokobanEnv(dim_room=rng.choice([(6, 6), (7, 7)]), num_boxes=rng.choice([1, 2]), max_steps=40)
+            await env.reset(seed=seed)
+            envs.append(env)
+        # A room without walls, where moves can leave the grid
+        env = SokobanEnv(dim_room=(3, 3), num_boxes=1, room_setup={
+            "room_fixed": [[1, 1, 1], [1, 2, 1], [1, 1, 1]],
+            "room_state": [[1, 1, 1], [1, 4, 1], [5, 1, 1]],
+            "box_mapping": {"(1, 1)": [1, 1]}
+        })
+        await env.reset()
+        envs.append(env)
+        twins = copy.deepcopy(envs)
+
+        for step in range(60):
+            live = [i for i, env in enumerate(envs) if env.num_env_steps < env.max_steps and env.boxes_on_target < env.num_boxes]
+            actions = [_random_action(rng, f"call_{step}") for _ in live]
+            expected = []
+            for i, action in zip(live, actions):
+                try:
+                    expected.append(await twins[i].step(action))
+                except Exception as e:
+                    expected.append(e)
+            results = step_sokoban_envs([envs[i] for i in live], actions)
+            for i, e, r in zip(live, expected, results):
+                assert _same(e, r), (step, i, e, r)
+                assert (envs[i].room_state == twins[i].room_state).all()
+                assert list(envs[i].player_position) == list(twins[i].player_position)
+                assert envs[i].num_env_steps == twins[i].num_env_steps
+                # Both engines keep the uncovered target count in step with the room
+                assert envs[i].uncovered_targets == twins[i].uncovered_targets == twins[i]._count_uncovered_targets()
+
+    asyncio.run(run())
+
+
+def test_take_steps_routes_sokoban_envs_through_batch_engine():
+    async def run():
+        env_ids = [
+            (await interface.initialize_environment("verl_env/sokoban-v0", seed=i, env_kwargs={"dim_room": [6, 6], "num_boxes": 1}))["env_id"]
+            for i in range(4)
+        ]
+        twins = [copy.deepcopy(interface.environments[env_id]) for env_id in env_ids]
+        calls = []
+        original = interface.batch_step_functions["verl_env/sokoban-v0"]
+
+        def spy(envs, actions):
+            calls.append(len(envs))
+            return original(envs, actions)
+
+        interface.batch_step_functions["verl_env/sokoban-v0"] = spy
+        try:
+            action = {"tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "move_up"}}]}
+            results = await interface.take_steps([(env_id, action) for env_id in env_ids] + [(env_ids[0], action)])
+        finally:
+            interface.batch_step_functions["verl_env/sokoban-v0"] = original
+            await interface.close_environments(env_ids)
+
+        # The repeated env_id is stepped after the batch, like two consecutive steps
+        assert calls == [4]
+        for twin, result in zip(twins, results):
+            observation, reward, done, truncated, info = await twin.step(action)
+            assert result["observation"] == observation and result["reward"] == reward and result["info"] == info
+        observation, reward, done, truncated, info = await twins[0].step(action)
+        assert results[4]["observation"] == observation
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+import asyncio
+
+import numpy as np
+
+from verl_agent_env.envs.sokoban.deadlock import dead_squares
+from verl_agent_env.envs.sokoban.sokoban import ACTION_LOOKUP, SokobanEnv
+from verl_agent_env.envs.sokoban.solver import solve
+
+# A corridor where the box needs three pushes to the right
+CORRIDOR_FIXED = np.array([
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 2, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+])
+CORRIDOR_STATE = np.array([
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 5, 4, 1, 1, 2, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+])
+
+
+def _play(env, actions):
+    async def run():
+        outcome = None
+        for action in actions:
+            tool_call = {"id": "call", "type": "function", "function": {"name": ACTION_LOOKUP[action].replace(" ", "_")}}
+            outcome = await env.step({"tool_calls": [tool_call]})
+        return outcome
+    return asyncio.run(run())
+
+
+def test_solver_finds_push_optimal_solution():
+    result = solve(CORRIDOR_FIXED, CORRIDOR_STATE)
+    assert result["status"] == "solved" and result["optimal"]
+    assert result["num_pushes"] == 3 and result["num_moves"] == 3
+    assert result["actions"] == [4, 4, 4]
+
+    # Pushing the box the wrong way is impossible, so the box on the left of the player is stuck
+    state = CORRIDOR_STATE.copy()
+    state[1, 1:3] = [4, 5]
+    assert solve(CORRIDOR_FIXED, state)["status"] == "unsolvable"
+    assert dead_squares(CORRIDOR_FIXED)[1].tolist() == [False, True, False, False, False, False, False]
+
+
+def test_solver_solutions_play_out_in_sokoban_env():
+    for seed in range(6):
+        env = SokobanEnv(dim_room=(7, 7), num_boxes=2, max_steps=1000)
+        asyncio.run(env.reset(seed=seed))
+        result = solve(env.room_fixed, env.room_state)
+        assert result["status"] == "solved"
+        # Dijkstra over pushes agrees on the push count
+        assert solve(env.room_fixed, env.room_state, weight=0)["num_pushes"] == result["num_pushes"]
+        _, _, done, _, info = _play(env, result["actions"])
+        assert done and info["all_boxes_on_target"]
+
+
+def test_solver_budget():
+    env = SokobanEnv(dim_room=(10, 10), num_boxes=4)
+    asyncio.run(env.reset(seed=2))
+    result = solve(env.room_fixed, env.room_state, max_nodes=1)
+    assert result["status"] in ("budget_exhausted", "solved")
+    if result["status"] == "budget_exhausted":
+        assert result["num_pushes"] is None and result["actions"] is None
@@ -0,0 +1,70 @@
+import copy
+import asyncio
+
+import pytest
+from verl_agent_env import interface
+from verl_agent_env.state_store import InMemoryStateStore, LocalRedisServer, RedisStateStore, SQLiteStateStore
+
+
+def _tool_call(name, arguments="{}"):
+    return {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": name, "arguments": arguments}}]
+    }
+
+
+ENV_CASES = [
+    ("verl_env/sokoban-v0", {"dim_room": [6, 6], "num_boxes": 1}, _tool_call("move_up")),
+    ("verl_env/countdown-v0", {"num_operands": 3}, _tool_call("test_equation", "{\"equation\": \"1 + 2\"}")),
+    ("verl_env/frozen_lake-v1", {"map_size": 4, "is_slippery": True}, _tool_call("move_down")),
+    ("verl_env/single_turn_chat-v0", {"chat_history": [{"role": "user", "content": "Hi"}]}, {"role": "assistant", "content": "Hello"}),
+]
+
+
+@pytest.mark.parametrize("env_name, env_kwargs, action", ENV_CASES)
+def test_environment_survives_worker_restart(env_name, env_kwargs, action):
+    async def run():
+        init_result = await interface.initialize_environment(env_name, seed=3, env_kwargs=env_kwargs)
+        env_id = init_result["env_id"]
+        await interface.take_step(env_id, action)
+        await interface.reset_environment(env_id, seed=4)
+        await interface.take_step(env_id, action)
+        twin = copy.deepcopy(interface.environments[env_id])
+        observation, reward, done, truncated, info = await twin.step(action)
+        expected = {"observation": observation, "reward": reward, "done": done, "truncated": truncated, "info": info}
+
+        # Simulate a worker restart, which loses every in-memory environment
+        interface.environments.clear()
+        restored = await interface.take_step(env_id, action)
+        await interface.close_environment(env_id)
+        return env_id, expected, restored
+
+    interface.configure_state_store(InMemoryStateStore())
+    try:
+        env_id, expected, restored = asyncio.run(run())
+        assert restored == expected
+        assert interface.state_store.get(env_id) is None
+    finally:
+        interface.configure_state_store(None)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_state_store_backends(backend, tmp_path):
+    server = None
+    if backend == "sqlite":
+        store = SQLiteStateStore(str(tmp_path / "state.db"))
+    else:
+        server = LocalRedisServer().start()
+        store = RedisStateStore(*server.address)
+    try:
+        assert store.get("missing") is None
+        store.set("env", b"\x00state")
+        store.set("env", b"\x01state")
+        assert store.get("env") == b"\x01state"
+        store.delete("env")
+        assert store.get("env") is None
+    finally:
+        store.close()
+        if server is not None:
+            server.stop()
@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+from verl_agent_env.app import app
+from verl_agent_env.sharded_app import ShardedEnvironmentHost
+
+
+def _move(direction, call_id):
+    return {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{"id": call_id, "type": "function", "function": {"name": f"move_{direction}", "arguments": "{}"}}]
+    }
+
+
+def _run_episode(client):
+    with client.websocket_connect("/api/ws") as websocket:
+        websocket.send_json({"id": 0, "op": "initialize", "env_name": "verl_env/frozen_lake-v1", "seed": 0, "env_kwargs": {"map_size": 4}})
+        env_id = websocket.receive_json()["result"]["env_id"]
+
+        # Several requests in flight on the same connection, answered by id
+        websocket.send_json({"id": 1, "op": "step", "env_id": env_id, "action": _move("right", "call_1")})
+        websocket.send_json({"id": 2, "op": "task_prompt", "env_id": env_id})
+        websocket.send_json({"id": 3, "op": "step", "env_id": "missing-env", "action": _move("right", "call_3")})
+        websocket.send_json({"id": 4, "op": "jump", "env_id": env_id})
+        responses = {response["id"]: response for response in (websocket.receive_json() for _ in range(4))}
+
+        assert responses[1]["result"]["observation"][0]["tool_call_id"] == "call_1"
+        assert isinstance(responses[2]["result"]["task_prompt"], str)
+        assert "not found" in responses[3]["error"]
+        assert "Unknown operation" in responses[4]["error"]
+
+        websocket.send_json({"id": 5, "op": "close", "env_id": env_id})
+        assert "closed successfully" in websocket.receive_json()["result"]["message"]
+
+
+def test_websocket_multiplexes_environment_operations():
+    with TestClient(app) as client:
+        _run_episode(client)
+
+
+def test_websocket_through_sharded_host():
+    with TestClient(ShardedEnvironmentHost(num_shards=2).build_app()) as client:
+        _run_episode(client)